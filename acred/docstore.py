@@ -0,0 +1,178 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Local store of analyzed documents, keyed by normalized url
+
+Analyzed docs (i.e. including `claims_content`) are stored as
+compressed json in a SQLite database, so that urls which are shared by
+many tweets are only fetched and analyzed once. Entries expire after
+`docstore_ttl_secs` and the least recently used entries are evicted
+once the store holds more than `docstore_max_docs` documents.
+
+The store is disabled unless `docstore_path` is set in the config.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import json
+import zlib
+from urllib.parse import urlparse, urlunparse
+from esiutils import hashu, cimetrics
+
+logger = logging.getLogger(__name__)
+
+default_ttl_secs = 7 * 24 * 60 * 60
+default_max_docs = 10000
+
+_lock = threading.Lock()
+_initialised_paths = set()
+
+_schema = '''CREATE TABLE IF NOT EXISTS docs (
+  url_hash TEXT PRIMARY KEY,
+  url TEXT NOT NULL,
+  collection TEXT NOT NULL,
+  stored_at REAL NOT NULL,
+  accessed_at REAL NOT NULL,
+  doc BLOB NOT NULL
+)'''
+
+
+def normalize_url(url):
+    """Normalizes a url so that trivially different urls share an entry
+
+    Lower-cases the scheme and domain, drops the `www.` prefix, the
+    fragment and any trailing slash in the path.
+
+    :param url: a url
+    :returns: the normalized url
+    :rtype: str
+    """
+    parsed = urlparse(url.strip())
+    netloc = parsed.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    path = parsed.path.rstrip('/')
+    scheme = parsed.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    return urlunparse((scheme, netloc, path, parsed.params, parsed.query, ''))
+
+
+def url_hash(url):
+    return hashu.calc_str_hash(normalize_url(url))
+
+
+def is_enabled(cfg):
+    return cfg.get('docstore_path') is not None
+
+
+def _connect(cfg):
+    path = cfg['docstore_path']
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _initialised_paths:
+        conn.execute(_schema)
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS docs_accessed ON docs (accessed_at)')
+        conn.commit()
+        _initialised_paths.add(path)
+    return conn
+
+
+def _ttl_secs(cfg):
+    return float(cfg.get('docstore_ttl_secs', default_ttl_secs))
+
+
+def encode_doc(doc):
+    return zlib.compress(json.dumps(doc).encode('utf-8'))
+
+
+def decode_doc(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def find_doc(url, collections, cfg):
+    """Finds a stored document for `url`
+
+    :param url: url of the document
+    :param collections: list of collection names where the doc may be
+      stored
+    :param cfg: config options, see module description
+    :returns: the stored document or None if not found or expired
+    :rtype: dict or None
+    """
+    if not is_enabled(cfg):
+        return None
+    now = time.time()
+    blob = None
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            row = conn.execute(
+                'SELECT collection, stored_at, doc FROM docs WHERE url_hash = ?',
+                (url_hash(url),)).fetchone()
+            if row is not None:
+                collection, stored_at, found = row
+                if collection in collections and (
+                        now - stored_at <= _ttl_secs(cfg)):
+                    blob = found
+                    conn.execute(
+                        'UPDATE docs SET accessed_at = ? WHERE url_hash = ?',
+                        (now, url_hash(url)))
+                    conn.commit()
+        finally:
+            conn.close()
+    cimetrics.count_cache('docstore', blob is not None)
+    if blob is None:
+        return None
+    return decode_doc(blob)
+
+
+def store_doc(url, doc, collection, cfg):
+    """Stores (or replaces) the document for `url`
+
+    Evicts expired and least recently used documents as needed.
+
+    :param url: url of the document
+    :param doc: a json-serializable document
+    :param collection: name of the collection for the doc
+    :param cfg: config options, see module description
+    :returns: True if the doc was stored
+    :rtype: bool
+    """
+    if not is_enabled(cfg):
+        return False
+    now = time.time()
+    try:
+        blob = encode_doc(doc)
+    except (TypeError, ValueError) as e:
+        logger.error('Cannot store doc for %s: %s' % (url, e))
+        return False
+    max_docs = int(cfg.get('docstore_max_docs', default_max_docs))
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?)',
+                (url_hash(url), url, collection, now, now, blob))
+            conn.execute('DELETE FROM docs WHERE stored_at < ?',
+                         (now - _ttl_secs(cfg),))
+            conn.execute(
+                '''DELETE FROM docs WHERE url_hash IN (
+                     SELECT url_hash FROM docs ORDER BY accessed_at DESC, rowid DESC
+                     LIMIT -1 OFFSET ?)''', (max_docs,))
+            conn.commit()
+        finally:
+            conn.close()
+    return True
+
+
+def count_docs(cfg):
+    if not is_enabled(cfg):
+        return 0
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+        finally:
+            conn.close()
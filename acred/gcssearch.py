@@ -3,18 +3,43 @@
 #
 """Provide search functionality to find Ground Credibility Signals
 """
+from acred import docstore
 
-def find_preindexed_doc_by_url(url, collections):
+# collection where acred stores the docs it analyzed itself
+analyzed_collection = 'acred-analyzed'
+
+# fields which describe the request for a doc, rather than the doc
+#  itself, so they are not stored
+request_fields = ['timings', 'mentioned_in']
+
+
+def find_preindexed_doc_by_url(url, collections, cfg={}):
     """Searches the database of pre-indexed documents by URL
 
     :param url: the url of the pre-indexed document
     :param collections: list of collection ids where we should try to
-      find the documents.
+      find the documents. Docs analyzed by acred itself are always
+      included.
+    :param cfg: config options, the search is only performed when a
+      `docstore_path` is configured. See `acred.docstore`.
     :returns: a pre-indexed document, a dict
       representing the document, extracted claims will be in field 
       'claims_content'. 
     :rtype: dict or None
     """
-    return None # FIXME: implement by reading first from exported CSVs
+    return docstore.find_doc(
+        url, list(collections) + [analyzed_collection], cfg)
 
 
+def store_analyzed_doc(url, adoc, cfg={}):
+    """Stores a doc analyzed by acred, so it can be found by url later on
+
+    :param url: the url of the analyzed document
+    :param adoc: the analyzed document. Its `request_fields`, e.g.
+      the tweet the doc was `mentioned_in`, are not stored.
+    :param cfg: config options, see `acred.docstore`
+    :returns: True if the doc was stored
+    :rtype: bool
+    """
+    doc = {k: v for k, v in adoc.items() if k not in request_fields}
+    return docstore.store_doc(url, doc, analyzed_collection, cfg)
@@ -271,6 +271,8 @@ def predict_credibility(docs, cfg):
     :param cfg: dict with needed configuration options needed to perform the
       credibility assessment, keys include:
       - `acred_factchecker_urls`: list of domains of known fact-checkers
+      - `acred_factchecker_matcher`: optional `DomainMatcher` prebuilt
+        for `acred_factchecker_urls`, see `domain_matcher.cfg_matcher`
       - `acred_search_url`: url of the claim search service
       - `acred_search_auth_user`: username to access claim search
       - `acred_search_auth_pwrd`: password to access claim search
@@ -8,8 +8,10 @@ credibility of the query sentence based on its similarity with a
 sentence in the co-inform DB.
 """
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from esiutils import isodate
-from esiutils import citimings, dictu, bot_describer, hashu
+from esiutils import citimings, dictu, bot_describer, hashu, neardup
 from acred import content, itnorm
 from acred.rating import agg
 from acred.reviewer.credibility import dbsent_credrev
@@ -49,11 +51,78 @@ def review(items, config):
     :returns: one or more Review objects for the input items
     :rtype: list of dict
     """
+    return review_with_timings(items, config)[0]
+
+
+def review_with_timings(items, config):
+    """Reviews the incoming items, collapsing near-duplicate sentences
+
+    When `qsent_dedup_threshold` is set, near-duplicate sentences (see
+    `esiutils.neardup`) are only reviewed once, via the first sentence
+    in their cluster, and the review is copied for the other sentences.
+
+    :param items: a list of items that must be `Sentence` instances.
+    :param config: a configuration map
+    :returns: a tuple with the list of Review objects for the input
+      items and a Timing. The `dedup_qsents` sub-timing includes the
+      number of `sentences`, of `representatives` reviewed and the
+      `collapse_ratio`, i.e. the fraction of sentences not reviewed
+    :rtype: tuple
+    """
     # We require a list: much faster than individual sents
     assert type(items) == list, "A list of input sentences is required"
     for item in items:
         assert content.is_sentence(item), '%s' % (item)
+    start = citimings.start()
+    threshold = config.get('qsent_dedup_threshold', None)
+    if threshold:
+        clusters = neardup.cluster([it['text'] for it in items], float(threshold))
+    else:
+        clusters = [[i] for i in range(len(items))]
+    dedup_t = citimings.timing('dedup_qsents', start)
+    dedup_t['sentences'] = len(items)
+    dedup_t['representatives'] = len(clusters)
+    dedup_t['collapse_ratio'] = (
+        1.0 - len(clusters) / len(items)) if items else 0.0
+
+    rep_reviews = review_distinct(
+        [items[cluster[0]] for cluster in clusters], config)
+    result = [None] * len(items)
+    for cluster, rep_review in zip(clusters, rep_reviews):
+        result[cluster[0]] = rep_review
+        for i in cluster[1:]:
+            result[i] = as_near_duplicate_review(
+                rep_review, items[cluster[0]], items[i])
+    return result, citimings.timing('review_qsents', start, [dedup_t])
+
+
+def as_near_duplicate_review(rep_review, rep_item, item):
+    """Copies the review of a representative sentence for a near-duplicate
+
+    :param rep_review: the review for `rep_item`
+    :param rep_item: the `Sentence` which was reviewed
+    :param item: a near-duplicate `Sentence` of `rep_item`
+    :returns: `rep_review` but reviewing `item`
+    :rtype: dict
+    """
+    return {
+        **rep_review,
+        'itemReviewed': {
+            **rep_review['itemReviewed'],
+            'text': item['text'],
+            'identifier': item.get(
+                'identifier', hashu.calc_str_hash(item['text']))
+        },
+        'text': rep_review['text'].replace(
+            '`%s`' % rep_item['text'], '`%s`' % item['text'], 1)
+    }
+
+
+def review_distinct(items, config):
+    config = dbsent_credrev.with_materialization_version(config)
     rev_worth = config.get('worthiness_review', False)
+    if rev_worth and config.get('speculative_claim_search', False):
+        return review_speculatively(items, config)
     if rev_worth:
         factual_items, nfs_items = partition_factual_sentences(items, config)
     else:
@@ -67,6 +136,42 @@ def review(items, config):
     return restore_order(items, factual_reviews + nfs_reviews)
 
 
+def review_speculatively(items, config):
+    """Reviews items, searching claims while their worthiness is reviewed
+
+    The claim search is done for all `items`, rather than only for the
+    worthy ones, so it does not need to wait for the worthinesschecker.
+    Search results for unworthy items are discarded. This reduces latency
+    at the cost of claim search capacity, so it is only used when
+    `speculative_claim_search` is enabled.
+
+    :param items: list of `Sentence` items
+    :param config: a configuration map
+    :returns: list of reviews aligned with `items`
+    :rtype: list of dict
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # run in a copy of the context to keep the current trace
+        search_future = executor.submit(
+            contextvars.copy_context().run, claimsim.find_related_sentences,
+            [it['text'] for it in items], config)
+        worth_item_revs = rev_item_worthiness(items, config)
+        claimsim_results = search_future.result()
+    assert len(claimsim_results) == len(items), '%s != %s' % (
+        len(claimsim_results), len(items))
+
+    result = []
+    for worth_item, csr in zip(worth_item_revs, claimsim_results):
+        if is_factual(worth_item):
+            result.append(claimsim_result_as_aggQSentCredReview(
+                csr, worth_item.get('worthinessReview'), config))
+        else:
+            result.append(as_non_verifiable_reviews(worth_item, config))
+    logger.info('Discarded claim search results for %d unworthy sentences' % (
+        len([it for it in worth_item_revs if not is_factual(it)])))
+    return result
+
+
 def restore_order(items, revs):
     assert len(items) == len(revs)
     text2i = {item['text']: i for i, item in enumerate(items)}
@@ -117,9 +222,7 @@ def partition_factual_sentences(items, cfg):
     """
     worth_item_revs = rev_item_worthiness(items, cfg)
     logger.info("Reviewed sentence worthiness")
-    factual_items = [it for it in worth_item_revs
-                     if dictu.get_in(it, ['worthinessReview', 'reviewRating',
-                                          'ratingValue'], 'worthy') == 'worthy']
+    factual_items = [it for it in worth_item_revs if is_factual(it)]
     nfs_items = [it for it in worth_item_revs
                      if dictu.get_in(it, ['worthinessReview', 'reviewRating',
                                           'ratingValue']) == 'unworthy']
@@ -130,6 +233,12 @@ def partition_factual_sentences(items, cfg):
 
 
 
+def is_factual(worth_item):
+    """Whether an item reviewed by `rev_item_worthiness` is worthy"""
+    return dictu.get_in(worth_item, ['worthinessReview', 'reviewRating',
+                                     'ratingValue'], 'worthy') == 'worthy'
+
+
 def rev_item_worthiness(items, cfg):
     """Process the incoming list of `items` and reviews the worthiness
 
@@ -335,7 +444,7 @@ def claimsim_result_as_claimcred(claimsim_result, cfg):
         # claim search no longer does domain credibility, so we have to do it here
         if 'domain_credibility' not in rs:
             rs['domain_credibility'] = website_credrev.calc_domain_credibility(
-                rs['domain'])
+                rs['domain'], cfg)
     
     relsents = [add_relative_credibility(rs, cfg) for rs in relsents]
     cred_dict = aggregate_credibility(relsents, cfg)
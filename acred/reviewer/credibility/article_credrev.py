@@ -7,6 +7,7 @@ import logging
 from esiutils import citimings
 from esiutils import isodate, bot_describer, dictu, hashu
 from acred.reviewer.credibility import website_credrev, aggqsent_credrev
+from acred.reviewer.credibility import domain_matcher
 from acred.reviewer.credibility import label as credlabel
 from acred import content
 from acred.rating import agg
@@ -53,12 +54,16 @@ def review(item, cfg):
     #  an embedded `ArticleCredReview`. There's no need to do both
     rev_format = cfg.get('acred_review_format', 'schema.org')
 
-    if rev_format == 'cred_assessment':
+    if type(item) is list and rev_format == 'schema.org':
+        return review_articles(item, cfg)
+    elif type(item) is list:
+        return [review(it, cfg) for it in item]
+    elif rev_format == 'cred_assessment':
         result = assess_article_cred(item, cfg)
         del result['analyzed_doc']
         return result
     elif rev_format == 'schema.org':
-        if 'content' in item and 'claims_content' in item:
+        if is_analyzed(item):
             adoc = item # looks like it's been pre-analysed
         else:
             adoc = analyzed_doc(item, cfg)
@@ -67,6 +72,26 @@ def review(item, cfg):
     else:
         raise ValueError('revewFormat %s' % rev_format)
 
+def is_analyzed(item):
+    return 'content' in item and 'claims_content' in item
+
+
+def review_articles(items, cfg):
+    """Reviews a list of `Article` items, analysing them in a single batch
+
+    :param items: list of `Article` items
+    :param cfg: a configuration map
+    :returns: list of `ArticleCredReview` for the input items
+    :rtype: list of dict
+    """
+    adocs = list(items)
+    to_analyze = [i for i, item in enumerate(items) if not is_analyzed(item)]
+    analyzed = analyzed_docs([items[i] for i in to_analyze], cfg)
+    for i, adoc in zip(to_analyze, analyzed):
+        adocs[i] = adoc
+    return [review_article(adoc, cfg) for adoc in adocs]
+
+
 def default_sub_bots(cfg):
     return [website_credrev.misinfoMeSourceCredReviewer(),
             aggqsent_credrev.default_bot_info(cfg)]
@@ -313,7 +338,7 @@ def adoc_to_domain_cred(adoc, cfg):
         return website_credrev.default_domain_crediblity(
             domain, "unknown domain")
     else:
-        return website_credrev.calc_domain_credibility(domain)
+        return website_credrev.calc_domain_credibility(domain, cfg)
 
 
 def adoc_to_website_credReview(adoc, cfg):
@@ -332,40 +357,16 @@ def website_is_socmedia_platform(webSite, cfg):
         webSite.get('url', None),
         webSite.get('name', None), cfg)
 
+default_socmedia_matcher = domain_matcher.compile_matcher(
+    ('http://twitter.com', 'http://facebook.com', 'http://instagram.com'))
+
+
 def is_socmedia_platform(url, domain, cfg):
-    url_nl = content.domain_from_url(url)
-    fc_urls = cfg.get('acred_socmedia_urls', ['http://twitter.com',
-                                              'http://facebook.com',
-                                              'http://instagram.com'])
-    fc_netlocs = [content.domain_from_url(fc_url)
-                  for fc_url in fc_urls]
-    fc_netlocs = [nl for nl in fc_netlocs if nl is not None]
-    if url_nl is not None:
-        # match by netloc (scheme independent)
-        found = url_nl in fc_netlocs
-        if found:
-            return found
-    elif url is not None:
-        # failed to extract netloc, so try to match by prefix
-        #  this is *not* scheme independent, so may fail
-        found = False
-        for fc_url in fc_urls:
-            if url.startswith(fc_url):
-                logger.info('found match: %s starts with %s' % (
-                    url, fc_url))
-                found = True
-                break
-        logger.info('Found no match for %s in %s known factceckers ' % (
-            url, len(fc_urls)
-        ))
-        return found
-    
-    # no url provided, or no match for url, so match by domain
-    if domain is None:
-        return False
-    else:
-        return domain in fc_netlocs
-    # return False
+    return domain_matcher.matches(
+        domain_matcher.cfg_matcher(
+            cfg, 'acred_socmedia_urls', 'acred_socmedia_matcher',
+            default_socmedia_matcher),
+        url, domain)
 
 
 def assess_doc_content_cred(adoc, cfg):
@@ -612,6 +613,14 @@ def aggregate_sub_creds(sub_creds, scope_name, cfg):
         'explanation': msg
     }
 
+def preindexed_colls(cfg):
+    """Collections where pre-indexed docs are searched by url"""
+    return cfg.get(
+        'relsents_in_colls',
+        ['generic', 'pilot-se', 'pilot-gr', 'pilot-at',
+         'factcheckers', 'fc-dev'])
+
+
 def analyzed_doc(article, cfg):
     """Returns an analysed version for an input article
 
@@ -623,18 +632,16 @@ def analyzed_doc(article, cfg):
     :rtype: dict
     """
     start = citimings.start()
-    ci_colls = cfg.get(
-        'relsents_in_colls',
-        ['generic', 'pilot-se', 'pilot-gr', 'pilot-at',
-         'factcheckers', 'fc-dev'])
+    ci_colls = preindexed_colls(cfg)
     preidx_doc = gcssearch.find_preindexed_doc_by_url(
-        article['url'], ci_colls)
+        article['url'], ci_colls, cfg)
+    resolved_url = article['url']
     if preidx_doc is None:
-        fetched = url_scraper.fetch_url(article['url'])
+        fetched = url_scraper.fetch_url(article['url'], cfg)
         resolved_url = fetched['resolved_url']
         if resolved_url != article['url']:
             preidx_doc = gcssearch.find_preindexed_doc_by_url(
-                resolved_url, ci_colls)
+                resolved_url, ci_colls, cfg)
             # TODO: we may want to add the article['url'] as an alias
             #  for this, the DB schema needs to support this and we
             #  need to be able to submit new values for this list
@@ -647,6 +654,53 @@ def analyzed_doc(article, cfg):
     else:
         adoc = semalyzer.analyze_doc(article, {**cfg, 'expand_claims': True})
         analyze_subt = adoc.get('timings')
+        if 'url_error' not in adoc:
+            for url in set([article['url'], resolved_url]):
+                gcssearch.store_analyzed_doc(url, adoc, cfg)
         adoc['timings'] = citimings.timing('analyzed_doc', start, [
             preidx_t, analyze_subt])
         return adoc
+
+
+def analyzed_docs(articles, cfg):
+    """Returns analysed versions for a list of input articles
+
+    Same as calling `analyzed_doc` for each article, but the urls which
+    are not pre-indexed are fetched concurrently and the remaining
+    articles are analysed in a single batch (see
+    `semantic_analyzer.analyzer.analyze_docs`).
+
+    :param articles: list of `Article` items, see `analyzed_doc`
+    :param cfg: config options
+    :returns: list of analyzed docs, in the same order as `articles`
+    :rtype: list of dict
+    """
+    start = citimings.start()
+    ci_colls = preindexed_colls(cfg)
+    adocs = [gcssearch.find_preindexed_doc_by_url(article['url'], ci_colls, cfg)
+             for article in articles]
+    missing = [i for i, adoc in enumerate(adocs) if adoc is None]
+    fetched = url_scraper.fetch_urls([articles[i]['url'] for i in missing], cfg)
+    resolved_urls = {}
+    for i, fetch in zip(missing, fetched):
+        resolved_urls[i] = fetch['resolved_url']
+        if fetch['resolved_url'] != articles[i]['url']:
+            adocs[i] = gcssearch.find_preindexed_doc_by_url(
+                fetch['resolved_url'], ci_colls, cfg)
+    preidx_t = citimings.timing('retrieve_preindexed', start)
+    for adoc in adocs:
+        if adoc is not None:
+            adoc['timings'] = preidx_t
+    to_analyze = [i for i, adoc in enumerate(adocs) if adoc is None]
+    if len(to_analyze) == 0:
+        return adocs
+    analyzed, analyze_t = semalyzer.analyze_docs(
+        [articles[i] for i in to_analyze], {**cfg, 'expand_claims': True})
+    for i, adoc in zip(to_analyze, analyzed):
+        if 'url_error' not in adoc:
+            for url in set([articles[i]['url'], resolved_urls[i]]):
+                gcssearch.store_analyzed_doc(url, adoc, cfg)
+        adoc['timings'] = citimings.timing('analyzed_doc', start, [
+            preidx_t, analyze_t])
+        adocs[i] = adoc
+    return adocs
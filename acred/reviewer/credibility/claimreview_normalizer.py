@@ -8,13 +8,19 @@ from esiutils import isodate, bot_describer, dictu, hashu
 from acred import content
 from acred.rating import agg
 from acred.reviewer.credibility import label as credlabel
+import copy
+import json
 import logging
+import functools
 
 version = '0.1.2'
 dateCreated = '2020-06-05T13:23:00Z'
 ci_context = 'http://coinform.eu'
 logger = logging.getLogger(__name__)
 
+# `_ratings_key` -> tuple of normalised ratings, see `index_claimReviews`
+_indexed_ratings = {}
+
 content.register_acred_type('ClaimReviewNormalizer', {
     'super_types': ['SoftwareApplication', 'Bot'],
     'ident_keys': ['@type', 'name', 'dateCreated', 'softwareVersion',
@@ -81,6 +87,13 @@ def normalise(claimReview, cfg):
 
 
 def bot_info(cfg):
+    # deep copy, callers may modify nested values of the cached result
+    return copy.deepcopy(_static_bot_info())
+
+
+@functools.lru_cache(maxsize=1)
+def _static_bot_info():
+    # the bot does not depend on the cfg, so we only describe it once
     result = {
         '@context': ci_context,
         '@type': 'ClaimReviewNormalizer',
@@ -109,7 +122,54 @@ def normalised_claimReview_accuracy(claimReview):
     return agg.select_most_confident_rating(creds)
 
 
+def index_claimReviews(claimReviews):
+    """Normalises the ratings of a collection of ClaimReviews once
+
+    Subsequent calls to `normalised_claimReview_ratings` (and hence
+    `normalise`) for a ClaimReview with the same url, rating and author
+    reuse the normalised ratings instead of parsing the original rating
+    again.
+
+    :param claimReviews: list of `ClaimReview` dicts, e.g. the docs in
+      the ClaimReview DB, which does not change during the lifetime of
+      the process
+    :returns: dict from ClaimReview url to a tuple of normalised ratings
+    :rtype: dict
+    """
+    index, by_key = {}, {}
+    for cr in claimReviews:
+        if cr.get('url') is None:
+            continue
+        ratings = tuple(calc_normalised_claimReview_ratings(cr))
+        index[cr['url']] = ratings
+        by_key[_ratings_key(cr)] = ratings
+    _indexed_ratings.update(by_key)
+    logger.info('Indexed normalised ratings for %d ClaimReviews' % len(index))
+    return index
+
+
+def _ratings_key(claimReview):
+    """Key of the inputs of `calc_normalised_claimReview_ratings`
+
+    Includes the rating and author, so an incoming ClaimReview with the
+    url of an indexed one, but e.g. an updated verdict, is normalised
+    from its own rating.
+    """
+    return (claimReview.get('url'),
+            json.dumps([claimReview.get('reviewRating', {}),
+                        claimReview.get('author')], sort_keys=True))
+
+
 def normalised_claimReview_ratings(claimReview):
+    indexed = (_indexed_ratings.get(_ratings_key(claimReview))
+               if _indexed_ratings else None)
+    if indexed is not None:
+        # copies, as callers may add fields to the selected rating
+        return [dict(r) for r in indexed]
+    return calc_normalised_claimReview_ratings(claimReview)
+
+
+def calc_normalised_claimReview_ratings(claimReview):
     rating = claimReview.get('reviewRating', {})
     fromVal, from_altName = None, None
     try:
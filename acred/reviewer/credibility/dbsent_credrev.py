@@ -13,6 +13,8 @@ import logging
 from acred.reviewer.credibility import website_credrev
 from acred.reviewer.credibility import label as credlabel
 from acred.reviewer.credibility import claimreview_normalizer as crn
+from acred.reviewer.credibility import dbsent_store
+from acred.reviewer.credibility import domain_matcher
 from acred import content
 from acred.rating import agg
 from esiutils import dictu, isodate, bot_describer, hashu
@@ -86,14 +88,94 @@ def default_bot_info(cfg):
     return bot_info(default_sub_bots(cfg), cfg)
 
 
+def materialization_version(cfg):
+    """Version of the inputs of a `DBSentCredReview`
+
+    Materialized reviews (see `dbsent_store`) are only reused while this
+    version does not change, i.e. while the versions of this reviewer,
+    of the `ClaimReview` normalizer, of the domain credibility data and
+    the relevant config options stay the same.
+
+    :param cfg: configuration options
+    :returns: a hash of the inputs, or None if the domain credibility
+      data is unavailable, in which case reviews are not materialized
+    :rtype: str
+    """
+    domcred_version = website_credrev.domcred_version(cfg)
+    if domcred_version is None:
+        return None
+    return hashu.hash_dict({
+        'dbsent_credrev': version,
+        'claimreview_normalizer': crn.version,
+        'domcred': domcred_version,
+        'factchecker_website_to_qclaim_confidence_penalty_factor': float(
+            cfg.get('factchecker_website_to_qclaim_confidence_penalty_factor', 0.5)),
+        'acred_factchecker_urls': cfg.get('acred_factchecker_urls', [])
+    }, str_encoding='hexdigest')[:16]
+
+
+def with_materialization_version(cfg):
+    """Adds the current `materialization_version` to the config
+
+    Call once per request, so the version (which depends on the domain
+    credibility data) is not recalculated for each `SimilarSent`.
+
+    :param cfg: configuration options
+    :returns: a copy of `cfg` with the `dbsent_materialization_version`,
+      or `cfg` itself if the store of materialized reviews is disabled
+    :rtype: dict
+    """
+    if not dbsent_store.is_enabled(cfg):
+        return cfg
+    return {**cfg,
+            'dbsent_materialization_version': materialization_version(cfg)}
+
+
+def is_storable(dbSentCredRev):
+    """Whether a `DBSentCredReview` can be materialized
+
+    Reviews based on a fallback website credibility, because MisinfoMe
+    could not be reached, should be recalculated rather than reused.
+    """
+    return not any(ibo.get('unavailable', False)
+                   for ibo in dbSentCredRev.get('isBasedOn', []))
+
+
 def similarSent_as_DBSentCredRev(simSent, cfg):
     """Converts the `simSent` into an equivalent `DBSentCredRev`iew
 
+    When the `simSent` has a `sentence_id` and `dbsent_store_path` is
+    configured, the review is read from the store of materialized
+    reviews; if it is missing or outdated, it is calculated and stored.
+
     :param simSent: a `SimilarSent` object as produced by the claim search
-    :param cfg: configuration options
+    :param cfg: configuration options, see `with_materialization_version`
     :returns: a `DBSentCredReview`
     :rtype: dict
     """
+    sentence_id = simSent.get('sentence_id')
+    if sentence_id is None or not dbsent_store.is_enabled(cfg):
+        return calc_DBSentCredRev(simSent, cfg)
+    if 'dbsent_materialization_version' in cfg:
+        mat_version = cfg['dbsent_materialization_version']
+    else:
+        mat_version = materialization_version(cfg)
+    if mat_version is None:
+        return calc_DBSentCredRev(simSent, cfg)
+    result = dbsent_store.find_review(sentence_id, mat_version, cfg)
+    if result is None:
+        result = calc_DBSentCredRev(simSent, cfg)
+        if is_storable(result):
+            dbsent_store.store_review(sentence_id, result, mat_version, cfg)
+        return result
+    # the stored inputs are still valid, but the review is created now
+    return {**result, 'dateCreated': isodate.now_utc_timestamp()}
+
+
+def calc_DBSentCredRev(simSent, cfg):
+    """Calculates the `DBSentCredRev`iew for a `simSent`, see
+    `similarSent_as_DBSentCredRev`
+    """
     db_Sentence = similarSent_as_DB_Sentence(simSent, cfg)
     claimReview = simSent.get('claimReview')
     webSiteCred = website_credrev.similarSent_as_WebSiteCredRev(simSent, cfg)
@@ -324,34 +406,7 @@ def simSent_is_by_factchecker(relsent, cfg):
 
 
 def is_factchecker(url, domain, cfg):
-    url_nl = content.domain_from_url(url)
-    fc_urls = cfg.get('acred_factchecker_urls', [])
-    fc_netlocs = [content.domain_from_url(fc_url)
-                  for fc_url in fc_urls]
-    fc_netlocs = [nl for nl in fc_netlocs if nl is not None]
-    if url_nl is not None:
-        # match by netloc (scheme independent)
-        found = url_nl in fc_netlocs
-        if found:
-            return found
-    elif url is not None:
-        # failed to extract netloc, so try to match by prefix
-        #  this is *not* scheme independent, so may fail
-        found = False
-        for fc_url in fc_urls:
-            if url.startswith(fc_url):
-                logger.info('found match: %s starts with %s' % (
-                    url, fc_url))
-                found = True
-                break
-        logger.info('Found no match for %s in %s known factceckers ' % (
-            url, len(fc_urls)
-        ))
-        return found
-    
-    # no url provided, or no match for url, so match by domain
-    if domain is None:
-        return False
-    else:
-        return domain in fc_netlocs
-    # return False
+    return domain_matcher.matches(
+        domain_matcher.cfg_matcher(
+            cfg, 'acred_factchecker_urls', 'acred_factchecker_matcher'),
+        url, domain)
@@ -0,0 +1,151 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Local store of materialized `DBSentCredReview`s, keyed by sentence id
+
+The credibility of a sentence in the co-inform DB only depends on
+static corpus data (its `ClaimReview` and the credibility of the
+website where it was published), so it can be computed offline for
+the whole corpus, see `acredapi.materialize_dbsent`. Each stored review
+is tagged with the version of its inputs (see
+`dbsent_credrev.materialization_version`); reviews stored for a
+different version are ignored and recomputed.
+
+Reviews are stored as compressed json in a SQLite database. The store
+is disabled unless `dbsent_store_path` is set in the config.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import json
+import zlib
+from esiutils import cimetrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_initialised_paths = set()
+
+_schema = '''CREATE TABLE IF NOT EXISTS dbsent_reviews (
+  sentence_id TEXT PRIMARY KEY,
+  version TEXT NOT NULL,
+  stored_at REAL NOT NULL,
+  review BLOB NOT NULL
+)'''
+
+
+def is_enabled(cfg):
+    return cfg.get('dbsent_store_path') is not None
+
+
+def _connect(cfg):
+    path = cfg['dbsent_store_path']
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _initialised_paths:
+        conn.execute(_schema)
+        conn.commit()
+        _initialised_paths.add(path)
+    return conn
+
+
+def encode_review(review):
+    return zlib.compress(json.dumps(review).encode('utf-8'))
+
+
+def decode_review(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def find_review(sentence_id, version, cfg):
+    """Finds the stored review for a DB sentence
+
+    :param sentence_id: id of the sentence in the claim DB
+    :param version: version of the inputs of the review
+    :param cfg: config options, see module description
+    :returns: the stored `DBSentCredReview` or None if not found or
+      stored for a different version
+    :rtype: dict or None
+    """
+    if not is_enabled(cfg):
+        return None
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            row = conn.execute(
+                'SELECT review FROM dbsent_reviews WHERE sentence_id = ? AND version = ?',
+                (sentence_id, version)).fetchone()
+        finally:
+            conn.close()
+    cimetrics.count_cache('dbsent_store', row is not None)
+    if row is None:
+        return None
+    return decode_review(row[0])
+
+
+def stored_ids(version, cfg):
+    """Returns the set of sentence ids with a review stored for `version`"""
+    if not is_enabled(cfg):
+        return set()
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            rows = conn.execute(
+                'SELECT sentence_id FROM dbsent_reviews WHERE version = ?',
+                (version,)).fetchall()
+        finally:
+            conn.close()
+    return set(row[0] for row in rows)
+
+
+def store_reviews(id_reviews, version, cfg):
+    """Stores (or replaces) reviews for DB sentences
+
+    :param id_reviews: list of (sentence_id, `DBSentCredReview`) tuples
+    :param version: version of the inputs of the reviews
+    :param cfg: config options, see module description
+    :returns: number of stored reviews
+    :rtype: int
+    """
+    if not is_enabled(cfg):
+        return 0
+    now = time.time()
+    rows = []
+    for sentence_id, review in id_reviews:
+        try:
+            rows.append((sentence_id, version, now, encode_review(review)))
+        except (TypeError, ValueError) as e:
+            logger.error('Cannot store review for %s: %s' % (sentence_id, e))
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO dbsent_reviews VALUES (?, ?, ?, ?)', rows)
+            conn.commit()
+        finally:
+            conn.close()
+    return len(rows)
+
+
+def store_review(sentence_id, review, version, cfg):
+    return store_reviews([(sentence_id, review)], version, cfg) == 1
+
+
+def prune(version, cfg):
+    """Deletes the reviews stored for other versions
+
+    :returns: number of deleted reviews
+    :rtype: int
+    """
+    if not is_enabled(cfg):
+        return 0
+    with _lock:
+        conn = _connect(cfg)
+        try:
+            deleted = conn.execute(
+                'DELETE FROM dbsent_reviews WHERE version != ?',
+                (version,)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+    return deleted
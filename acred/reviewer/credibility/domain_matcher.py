@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Matches urls and domains against a list of known website urls
+
+Used to decide whether a url or domain belongs to a fact-checker
+(`acred_factchecker_urls`) or to a social media platform
+(`acred_socmedia_urls`). Rather than parsing every known url on each
+check, the known urls are compiled once into a `DomainMatcher`: a set
+of their netlocs for scheme-independent matching and a tuple of url
+prefixes for urls whose netloc cannot be extracted.
+"""
+import logging
+import functools
+from acred import content
+
+logger = logging.getLogger(__name__)
+
+
+def compile_matcher(known_urls):
+    """Compiles a list of known urls into a `DomainMatcher`
+
+    :param known_urls: list of website urls, e.g. `https://www.snopes.com/`
+    :returns: a `DomainMatcher` dict
+    :rtype: dict
+    """
+    netlocs = [content.domain_from_url(url) for url in known_urls]
+    return {
+        '@type': 'DomainMatcher',
+        'netlocs': frozenset(nl for nl in netlocs if nl is not None),
+        'url_prefixes': tuple(known_urls)
+    }
+
+
+empty_matcher = compile_matcher(())
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_matcher(known_urls):
+    return compile_matcher(known_urls)
+
+
+def matcher(known_urls):
+    """Returns the compiled `DomainMatcher` for a list of known urls
+
+    Matchers are built once and reused while the list of urls (e.g.
+    `acred_factchecker_urls` in the config) does not change.
+    """
+    return _cached_matcher(tuple(known_urls))
+
+
+def cfg_matcher(cfg, urls_key, matcher_key, default_matcher=None):
+    """Returns the `DomainMatcher` for the known urls in a config
+
+    :param cfg: config options
+    :param urls_key: key of the list of known urls, e.g.
+      `acred_factchecker_urls`
+    :param matcher_key: key of a `DomainMatcher` prebuilt for those
+      urls, e.g. `acred_factchecker_matcher`, see `acredapi.views.acred_config`
+    :param default_matcher: `DomainMatcher` used when `urls_key` is not
+      in `cfg`, by default one without known urls
+    :rtype: dict
+    """
+    if default_matcher is None:
+        default_matcher = empty_matcher
+    known_urls = cfg.get(urls_key, default_matcher['url_prefixes'])
+    dom_matcher = cfg.get(matcher_key, default_matcher)
+    # the urls may have been overridden after the matcher was built
+    if dom_matcher['url_prefixes'] is known_urls:
+        return dom_matcher
+    return matcher(known_urls)
+
+
+def matches(dom_matcher, url, domain):
+    """Checks whether a url or domain belongs to a known website
+
+    :param dom_matcher: a `DomainMatcher`, see `matcher` and `cfg_matcher`
+    :param url: a url or None
+    :param domain: a domain name or None, only checked when `url` is
+      None or its netloc is not one of the known netlocs
+    :returns: True if the netloc of `url` or the `domain` is the
+      netloc of a known website. If the netloc of `url` cannot be
+      extracted, whether `url` starts with one of the known urls
+    :rtype: bool
+    """
+    url_nl = content.domain_from_url(url)
+    if url_nl is not None:
+        # match by netloc (scheme independent)
+        if url_nl in dom_matcher['netlocs']:
+            return True
+    elif url is not None:
+        # failed to extract netloc, so try to match by prefix
+        #  this is *not* scheme independent, so may fail
+        found = url.startswith(dom_matcher['url_prefixes'])
+        if not found:
+            logger.info('Found no match for %s in %s known urls' % (
+                url, len(dom_matcher['url_prefixes'])))
+        return found
+
+    # no url provided, or no match for url, so match by domain
+    if domain is None:
+        return False
+    return domain in dom_matcher['netlocs']
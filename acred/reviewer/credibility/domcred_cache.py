@@ -0,0 +1,186 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Cache of domain credibility assessments retrieved from MisinfoMe
+
+MisinfoMe updates its source credibility data weekly, which is why the
+`MisinfoMeSourceCredReviewer` version is the start of the current
+week. Entries in this cache are tagged with that version, so they
+expire when a new week starts rather than living for the whole life
+of the process.
+
+The least recently used entries are evicted once the cache holds more
+than `domcred_cache_size` domains. When `domcred_cache_path` is set,
+entries are also persisted in a SQLite file, so they survive restarts
+and can be warmed up in bulk (see `prefetch_domcred`).
+"""
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+import collections
+from urllib.parse import urlparse
+from esiutils import isodate, cimetrics
+
+logger = logging.getLogger(__name__)
+
+default_cfg = {
+    'domcred_cache_size': 4096,
+    'domcred_cache_path': None
+}
+
+_entries = collections.OrderedDict()
+_lock = threading.Lock()
+_initialised_paths = set()
+_pruned_versions = {}  # path -> version whose predecessors were deleted
+
+_schema = '''CREATE TABLE IF NOT EXISTS domcreds (
+  domain TEXT PRIMARY KEY,
+  version TEXT NOT NULL,
+  stored_at REAL NOT NULL,
+  value TEXT NOT NULL
+)'''
+
+
+def current_version(now=None):
+    """Version of MisinfoMe data which is valid at `now`
+
+    :param now: a utc `datetime`, by default the current time
+    :returns: utc timestamp for the start of the week
+    :rtype: str
+    """
+    return isodate.start_of_week_utc_timestamp(
+        now or datetime.datetime.utcnow())
+
+
+def cache_key(domain):
+    """Normalizes a domain or website url into a cache key
+
+    `https://www.snopes.com/` and `www.snopes.com` share the key
+    `www.snopes.com`. The `www.` prefix is kept: MisinfoMe reviews
+    the exact host it is queried with (as `itemReviewed`), so
+    `snopes.com` is a different entry.
+
+    :param domain: a domain name or a url
+    :returns: the lower-cased host
+    :rtype: str
+    """
+    domain = domain.strip()
+    if '://' in domain:
+        domain = urlparse(domain).netloc
+    return domain.split('/')[0].lower()
+
+
+def _cache_size(cfg):
+    return int(cfg.get('domcred_cache_size', default_cfg['domcred_cache_size']))
+
+
+def _cache_path(cfg):
+    return cfg.get('domcred_cache_path', None) or None
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10)
+    if path not in _initialised_paths:
+        conn.execute(_schema)
+        conn.commit()
+        _initialised_paths.add(path)
+    return conn
+
+
+def _mem_put(key, version, value, cfg):
+    _entries[key] = (version, value)
+    _entries.move_to_end(key)
+    while len(_entries) > _cache_size(cfg):
+        _entries.popitem(last=False)
+
+
+def _prune_old_versions(conn, path, version):
+    if _pruned_versions.get(path) == version:
+        return
+    conn.execute('DELETE FROM domcreds WHERE version != ?', (version,))
+    _pruned_versions[path] = version
+
+
+def _load_persisted(key, version, path):
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            'SELECT value FROM domcreds WHERE domain = ? AND version = ?',
+            (key, version)).fetchone()
+    finally:
+        conn.close()
+    return None if row is None else json.loads(row[0])
+
+
+def get(domain, cfg={}):
+    """Returns the cached credibility for a domain
+
+    :param domain: a domain name or a url, see `cache_key`
+    :param cfg: config options, see `default_cfg`
+    :returns: the cached MisinfoMe response, or None if the domain is
+      not cached for the current version
+    :rtype: dict or None
+    """
+    key = cache_key(domain)
+    version = current_version()
+    value = None
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] == version:
+            _entries.move_to_end(key)
+            value = entry[1]
+        elif _cache_path(cfg) is not None:
+            value = _load_persisted(key, version, _cache_path(cfg))
+            if value is not None:
+                _mem_put(key, version, value, cfg)
+    cimetrics.count_cache('domcred', value is not None)
+    return value
+
+
+def put(domain, value, cfg={}):
+    """Caches the credibility for a domain for the current version
+
+    Persisted entries from previous versions are dropped the first
+    time an entry is stored for a new version.
+
+    :param domain: a domain name or a url, see `cache_key`
+    :param value: a json-serializable MisinfoMe response
+    :param cfg: config options, see `default_cfg`
+    :returns: None
+    """
+    key = cache_key(domain)
+    version = current_version()
+    with _lock:
+        _mem_put(key, version, value, cfg)
+        path = _cache_path(cfg)
+        if path is None:
+            return
+        conn = _connect(path)
+        try:
+            conn.execute('INSERT OR REPLACE INTO domcreds VALUES (?, ?, ?, ?)',
+                         (key, version, time.time(), json.dumps(value)))
+            _prune_old_versions(conn, path, version)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def count_persisted(cfg):
+    path = _cache_path(cfg)
+    if path is None:
+        return 0
+    with _lock:
+        conn = _connect(path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM domcreds').fetchone()[0]
+        finally:
+            conn.close()
+
+
+def clear():
+    """Clears the in-memory entries, persisted entries are kept"""
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,224 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Local snapshot of domain credibility assessments
+
+A snapshot maps domains (see `domcred_cache.cache_key`) to the
+MisinfoMe response for that domain. When `domcred_backend = snapshot`,
+`website_credrev` serves domain credibility from the snapshot instead
+of calling MisinfoMe, so reviews make no outbound calls on the hot
+path. Snapshots are refreshed in bulk with `sync`, see
+`prefetch_domcred`.
+
+Two formats are supported, based on the extension of
+`domcred_snapshot_path`:
+
+ * `.jsonl`: one `{"domain": ..., "credibility": ...}` object per line
+ * `.sqlite` or `.db`: the `domcreds` table written by `domcred_cache`,
+   so a persisted cache can be used as snapshot
+
+The snapshot is loaded in memory on first use and reloaded when the
+file changes, which is checked at most every
+`domcred_snapshot_check_secs` (or on `refresh`). A missing snapshot
+file is served as an empty snapshot without version.
+"""
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from acred.reviewer.credibility import domcred_cache
+from esiutils import hashu
+
+logger = logging.getLogger(__name__)
+
+_loaded = {}  # path -> {'checked', 'mtime', 'snapshot'}
+_lock = threading.Lock()
+
+
+def is_sqlite_path(path):
+    return os.path.splitext(path)[1] in ['.sqlite', '.db']
+
+
+def _read_jsonl(path):
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as in_f:
+        for line in in_f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            entries[domcred_cache.cache_key(entry['domain'])] = entry['credibility']
+    return entries
+
+
+def _read_sqlite(path):
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        rows = conn.execute('SELECT domain, value FROM domcreds').fetchall()
+    finally:
+        conn.close()
+    return {domain: json.loads(value) for domain, value in rows}
+
+
+def read_snapshot(path):
+    """Reads a snapshot file
+
+    :param path: path to a `.jsonl` or `.sqlite` snapshot
+    :returns: a snapshot dict with the `entries` (domain -> credibility)
+      and the `version` of the snapshot (a digest of its content)
+    :rtype: dict
+    """
+    entries = _read_sqlite(path) if is_sqlite_path(path) else _read_jsonl(path)
+    version = hashu.hash_dict(entries, str_encoding='hexdigest')[:16]
+    logger.info('Read domain credibility snapshot %s with %d domains' % (
+        path, len(entries)))
+    return {'path': path, 'version': version, 'entries': entries}
+
+
+def empty_snapshot(path):
+    return {'path': path, 'version': None, 'entries': {}}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def load(cfg):
+    """Returns the snapshot configured in `domcred_snapshot_path`
+
+    :param cfg: config options, `domcred_snapshot_check_secs` sets how
+      often the snapshot file is checked for changes
+    :returns: a snapshot dict, see `read_snapshot`, or None if no
+      snapshot is configured. The snapshot is empty, with a None
+      `version`, while the file does not exist
+    :rtype: dict
+    """
+    path = cfg.get('domcred_snapshot_path', None)
+    if not path:
+        return None
+    now = time.monotonic()
+    check_secs = cfg.get('domcred_snapshot_check_secs', 10)
+    with _lock:
+        loaded = _loaded.get(path)
+    if loaded is not None and now - loaded['checked'] < check_secs:
+        return loaded['snapshot']
+    mtime = _mtime(path)
+    with _lock:
+        loaded = _loaded.get(path)
+        if loaded is None or loaded['mtime'] != mtime:
+            if mtime is None:
+                logger.warning('Missing domain credibility snapshot %s' % path)
+                snapshot = empty_snapshot(path)
+            else:
+                snapshot = read_snapshot(path)
+        else:
+            snapshot = loaded['snapshot']
+        _loaded[path] = {'checked': now, 'mtime': mtime, 'snapshot': snapshot}
+    return snapshot
+
+
+def refresh(path):
+    """Makes the next `load` of the snapshot at `path` check its file"""
+    with _lock:
+        loaded = _loaded.get(path)
+        if loaded is not None:
+            loaded['checked'] = float('-inf')
+
+
+def lookup(domain, cfg):
+    """Looks up the credibility of a domain in the configured snapshot
+
+    :param domain: a domain name or a url
+    :param cfg: config options
+    :returns: the MisinfoMe credibility for the domain or None if the
+      domain is not in the snapshot
+    :rtype: dict or None
+    """
+    snapshot = load(cfg)
+    if snapshot is None:
+        return None
+    return snapshot['entries'].get(domcred_cache.cache_key(domain))
+
+
+def version(cfg):
+    """Version of the configured snapshot, None if there is none"""
+    snapshot = load(cfg)
+    return None if snapshot is None else snapshot['version']
+
+
+def write_snapshot(path, entries):
+    """Writes a `.jsonl` or `.sqlite` snapshot, replacing any existing one
+
+    :param path: path of the snapshot
+    :param entries: dict of domain -> credibility
+    :returns: None
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if is_sqlite_path(path):
+        week = domcred_cache.current_version()
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute(domcred_cache._schema)
+            conn.executemany(
+                'INSERT INTO domcreds VALUES (?, ?, ?, ?)',
+                [(domain, week, 0, json.dumps(value))
+                 for domain, value in sorted(entries.items())])
+            conn.commit()
+        finally:
+            conn.close()
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as out_f:
+            for domain, value in sorted(entries.items()):
+                out_f.write(json.dumps(
+                    {'domain': domain, 'credibility': value}) + '\n')
+    os.replace(tmp_path, path)
+
+
+def sync(domains, path, fetch_fn, max_workers=8):
+    """Refreshes a snapshot by fetching the credibility of `domains`
+
+    Domains which fail to fetch keep their entry from the previous
+    snapshot, if any, so an outage of MisinfoMe does not empty it.
+
+    :param domains: list of domain names or urls
+    :param path: path of the snapshot to refresh
+    :param fetch_fn: function from a domain to its credibility, e.g.
+      `website_credrev.misinfome_source_credibility`
+    :param max_workers: number of concurrent fetches
+    :returns: dict with the number of `fetched`, `kept` and `failed`
+      domains
+    :rtype: dict
+    """
+    previous = read_snapshot(path)['entries'] if os.path.exists(path) else {}
+    keys = sorted(set(domcred_cache.cache_key(d) for d in domains if d) - {''})
+
+    def fetch(domain):
+        try:
+            return domain, fetch_fn(domain)
+        except Exception as e:
+            logger.warning('Failed to fetch credibility of %s: %s' % (domain, e))
+            return domain, None
+
+    entries = {}
+    result = {'fetched': 0, 'kept': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for domain, value in executor.map(fetch, keys):
+            if value is not None:
+                entries[domain] = value
+                result['fetched'] += 1
+            elif domain in previous:
+                entries[domain] = previous[domain]
+                result['kept'] += 1
+            else:
+                result['failed'] += 1
+    write_snapshot(path, entries)
+    refresh(path)
+    return result
@@ -0,0 +1,116 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+'''Warms the domain credibility cache or refreshes a snapshot
+
+Collects the domains of the known fact-checkers (`factchecker_urls.txt`)
+and of the documents in the claim DBs and retrieves their MisinfoMe
+credibility, so reviews during the week do not wait for MisinfoMe.
+Without `-snapshot`, requires `domcred_cache_path` to be set in the
+`[acred]` section.
+
+Run from the root of the repo, e.g. at the start of each week
+
+    python -m acred.reviewer.credibility.prefetch_domcred -config acred.ini
+
+or, to refresh the snapshot used with `domcred_backend = snapshot`
+
+    python -m acred.reviewer.credibility.prefetch_domcred -snapshot data/domcred-snapshot.jsonl
+'''
+import csv
+import sys
+import logging
+import argparse
+import configparser
+from acred.reviewer.credibility import website_credrev, domcred_snapshot
+
+logger = logging.getLogger(__name__)
+
+multival_separator = ','
+
+
+def read_factchecker_domains(path):
+    with open(path, encoding='utf-8') as in_f:
+        return [line.strip() for line in in_f if line.strip()]
+
+
+def read_claim_db_domains(path):
+    """Reads the domains of the docs in a claim DB csv
+
+    :param path: path to a csv file with a `domains_ss` column
+    :returns: set of domain names
+    :rtype: set
+    """
+    csv.field_size_limit(sys.maxsize)
+    result = set()
+    with open(path, encoding='utf-8') as in_f:
+        for row in csv.DictReader(in_f):
+            for dom in (row.get('domains_ss') or '').split(multival_separator):
+                if dom.strip():
+                    result.add(dom.strip())
+    return result
+
+
+def collect_domains(config):
+    """Collects the domains to prefetch from an `acred.ini` config
+
+    :param config: a `ConfigParser` with the `acred` and `acredapi`
+      sections
+    :returns: sorted list of domains
+    :rtype: list of str
+    """
+    domains = set(read_factchecker_domains(
+        config['acred']['acred_factchecker_urls_path']))
+    for key in ['sentences_extracted_db_csv',
+                'sentences_from_ClaimReviews_db_csv']:
+        path = config['acredapi'].get(key, None)
+        if path is None:
+            continue
+        try:
+            domains.update(read_claim_db_domains(path))
+        except OSError as e:
+            logger.warning('Skipping claim DB %s: %s' % (path, e))
+    return sorted(domains)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Warm the domain credibility cache',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-config', default='acred.ini',
+                        help='Path to the acred config file')
+    parser.add_argument('-workers', type=int, default=8,
+                        help='Number of concurrent requests to MisinfoMe')
+    parser.add_argument('-snapshot',
+                        help='Path of a .jsonl or .sqlite snapshot to refresh')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    cfg = {
+        'domcred_cache_path': config['acred'].get('domcred_cache_path', None),
+        'domcred_cache_size': int(config['acred'].get(
+            'domcred_cache_size', 4096))
+    }
+    if args.snapshot:
+        domains = collect_domains(config)
+        print('Refreshing snapshot %s for %d domains' % (
+            args.snapshot, len(domains)))
+        outcome = domcred_snapshot.sync(
+            domains, args.snapshot,
+            lambda dom: website_credrev.misinfome_source_credibility(dom, cfg),
+            args.workers)
+        print('fetched %(fetched)d, kept previous %(kept)d, failed %(failed)d' % (
+            outcome))
+        sys.exit(0)
+    if cfg['domcred_cache_path'] is None:
+        sys.exit('Set domcred_cache_path in the [acred] section of %s' % (
+            args.config))
+    domains = collect_domains(config)
+    print('Prefetching credibility for %d domains' % len(domains))
+    outcome = website_credrev.prefetch_domain_credibility(
+        domains, {**cfg, 'domcred_cache_size': max(
+            cfg['domcred_cache_size'], len(domains))}, args.workers)
+    print('fetched %(fetched)d, already cached %(cached)d, failed %(failed)d' % (
+        outcome))
@@ -5,7 +5,7 @@
 Unit Tests for the aggqsent_credrev
 """
 from acred.reviewer.credibility import aggqsent_credrev
-from acred import itnorm
+from acred import itnorm, content
 import json
 
 def load_json(path):
@@ -74,3 +74,66 @@ def test_claimsim_results_as_aggQSentCredReview_02():
     assert woutWorth['text'] == 'Sentence `Coronavirus kills people` seems *not verifiable* as it ' + expectedExpl
 
     
+
+
+def test_review_collapses_near_duplicates(monkeypatch):
+    searched = []
+
+    def find_related_sentences(sents, cfg):
+        searched.extend(sents)
+        return [{'q_claim': s, 'results': []} for s in sents]
+
+    monkeypatch.setattr(aggqsent_credrev.claimsim, 'find_related_sentences',
+                        find_related_sentences)
+    # avoid requesting the sub bots to the claim search service
+    monkeypatch.setattr(aggqsent_credrev, 'default_bot_info',
+                        lambda cfg: {'@type': 'AggQSentCredReviewer'})
+    sents = [content.as_sentence(s) for s in [
+        'Vaccines cause autism in children',
+        'Taxes rose 20% last year',
+        'RT @bot: vaccines cause autism in children!!']]
+    revs, timing = aggqsent_credrev.review_with_timings(
+        sents, {'qsent_dedup_threshold': 0.9})
+    assert searched == [sents[0]['text'], sents[1]['text']]
+    assert [rev['itemReviewed']['text'] for rev in revs] == [
+        s['text'] for s in sents]
+    assert revs[2]['text'].startswith('Sentence `%s`' % sents[2]['text'])
+    assert revs[2]['reviewRating'] == revs[0]['reviewRating']
+    dedup_t = timing['sub_timings'][0]
+    assert dedup_t['phase'] == 'dedup_qsents'
+    assert dedup_t['representatives'] == 2
+    assert abs(dedup_t['collapse_ratio'] - 1 / 3) < 1e-6
+
+
+def test_review_speculative_claim_search(monkeypatch):
+    searched = []
+
+    def find_related_sentences(sents, cfg):
+        searched.extend(sents)
+        return [{'q_claim': s, 'results': []} for s in sents]
+
+    def rev_item_worthiness(items, cfg):
+        return [{**it, 'worthinessReview': {'reviewRating': {
+            'ratingValue': 'worthy' if 'Taxes' in it['text'] else 'unworthy'}}}
+                for it in items]
+
+    monkeypatch.setattr(aggqsent_credrev.claimsim, 'find_related_sentences',
+                        find_related_sentences)
+    monkeypatch.setattr(aggqsent_credrev, 'rev_item_worthiness',
+                        rev_item_worthiness)
+    monkeypatch.setattr(aggqsent_credrev, 'default_bot_info',
+                        lambda cfg: {'@type': 'AggQSentCredReviewer'})
+    sents = [content.as_sentence(s) for s in [
+        'I love this song', 'Taxes rose 20% last year']]
+    cfg = {'worthiness_review': True, 'speculative_claim_search': True}
+    revs = aggqsent_credrev.review(sents, cfg)
+    # all sentences are searched, but only worthy ones are reviewed as such
+    assert searched == [s['text'] for s in sents]
+    assert [rev['itemReviewed']['text'] for rev in revs] == searched
+    assert "doesn't seem to be a factual" in revs[0]['text']
+    assert 'has no (close) matches' in revs[1]['text']
+
+    # without speculation, only worthy sentences are searched
+    searched.clear()
+    aggqsent_credrev.review(sents, {**cfg, 'speculative_claim_search': False})
+    assert searched == [sents[1]['text']]
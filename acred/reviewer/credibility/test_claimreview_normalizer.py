@@ -161,3 +161,29 @@ def test_cr_normalise_03():
     assert author['applicationSuite'] == 'Co-inform'
     
 
+
+
+def test_index_claimReviews():
+    expected = crn.normalised_claimReview_ratings(cr_01)
+    try:
+        index = crn.index_claimReviews([cr_01, cr_02])
+        assert sorted(index.keys()) == sorted([cr_01['url'], cr_02['url']])
+        indexed = crn.normalised_claimReview_ratings(cr_01)
+        assert indexed == expected
+        indexed[0]['source'] = 'claimReview'
+        assert crn.normalised_claimReview_ratings(cr_01) == expected
+        # same url, but an updated rating
+        updated = {**cr_01, 'reviewRating': cr_02['reviewRating']}
+        assert (crn.normalised_claimReview_ratings(updated) ==
+                crn.calc_normalised_claimReview_ratings(updated))
+        assert crn.normalised_claimReview_ratings(updated) != expected
+    finally:
+        crn._indexed_ratings.clear()
+
+
+def test_bot_info_is_not_shared():
+    bot = crn.bot_info({})
+    bot['author']['name'] = 'modified'
+    bot['isBasedOn'].append('modified')
+    assert crn.bot_info({})['author']['name'] != 'modified'
+    assert crn.bot_info({})['isBasedOn'] == []
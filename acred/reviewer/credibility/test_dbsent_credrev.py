@@ -7,7 +7,7 @@ Unit Tests for the dbsent_credrev
 import pytest
 import json
 import copy
-from acred.reviewer.credibility import dbsent_credrev
+from acred.reviewer.credibility import dbsent_credrev, dbsent_store, website_credrev
 
 def read_json(path):
     with open(path, encoding='utf-8') as f:
@@ -191,3 +191,63 @@ def test_is_factchecker_01():
 def test_is_factchecker_01():
     cfg = {'acred_factchecker_urls': ['https://snopes.com/']}
     assert dbsent_credrev.is_factchecker(None, 'snopes.com', cfg)
+
+
+def test_SimilarSent_as_DBSentCredRev_materialized(tmp_path):
+    cfg = {'dbsent_store_path': str(tmp_path / 'dbsent.sqlite')}
+    simSent = {**relSent01, 'sentence_id': 'sent-01'}
+    dbscr = dbsent_credrev.similarSent_as_DBSentCredRev(simSent, cfg)
+    mat_version = dbsent_credrev.materialization_version(cfg)
+    assert dbsent_store.stored_ids(mat_version, cfg) == {'sent-01'}
+
+    # stored review is reused, even if the inputs are no longer available
+    no_inputs = {**simSent, 'claimReview': None, 'domain_credibility': {}}
+    reused = dbsent_credrev.similarSent_as_DBSentCredRev(no_inputs, cfg)
+    assert {**reused, 'dateCreated': None} == {**dbscr, 'dateCreated': None}
+
+    # but recalculated when the version of the inputs changes
+    cfg2 = {**cfg, 'acred_factchecker_urls': ['https://www.snopes.com/']}
+    assert dbsent_credrev.materialization_version(cfg2) != mat_version
+    assert dbsent_store.find_review('sent-01', mat_version, cfg2) == dbscr
+    assert dbsent_store.find_review(
+        'sent-01', dbsent_credrev.materialization_version(cfg2), cfg2) is None
+
+
+def test_SimilarSent_as_DBSentCredRev_unavailable_not_stored(tmp_path):
+    cfg = dbsent_credrev.with_materialization_version(
+        {'dbsent_store_path': str(tmp_path / 'dbsent.sqlite')})
+    domcred = website_credrev.default_domain_crediblity(
+        'example.com', website_credrev.unavailable_explanation,
+        unavailable=True)
+    simSent = {**relSent01, 'sentence_id': 'sent-01', 'claimReview': None,
+               'domain_credibility': domcred}
+    dbscr = dbsent_credrev.similarSent_as_DBSentCredRev(simSent, cfg)
+    assert not dbsent_credrev.is_storable(dbscr)
+    assert dbsent_store.stored_ids(
+        cfg['dbsent_materialization_version'], cfg) == set()
+
+
+def test_with_materialization_version(tmp_path, monkeypatch):
+    assert dbsent_credrev.with_materialization_version({}) == {}
+    cfg = dbsent_credrev.with_materialization_version(
+        {'dbsent_store_path': str(tmp_path / 'dbsent.sqlite')})
+    monkeypatch.setattr(dbsent_credrev, 'materialization_version', None)
+    # the version in the config is used, not recalculated
+    dbsent_credrev.similarSent_as_DBSentCredRev(
+        {**relSent01, 'sentence_id': 'sent-01'}, cfg)
+    assert dbsent_store.stored_ids(
+        cfg['dbsent_materialization_version'], cfg) == {'sent-01'}
+
+
+def test_SimilarSent_as_DBSentCredRev_missing_snapshot(tmp_path):
+    cfg = dbsent_credrev.with_materialization_version({
+        'dbsent_store_path': str(tmp_path / 'dbsent.sqlite'),
+        'domcred_backend': 'snapshot',
+        'domcred_snapshot_path': str(tmp_path / 'missing.jsonl')})
+    assert website_credrev.domcred_version(cfg) is None
+    assert cfg['dbsent_materialization_version'] is None
+    dbscr = dbsent_credrev.similarSent_as_DBSentCredRev(
+        {**relSent01, 'sentence_id': 'sent-01'}, cfg)
+    assert dbscr['@type'] == 'DBSentCredReview'
+    # nothing is materialized without domain credibility data
+    assert dbsent_store.stored_ids(None, cfg) == set()
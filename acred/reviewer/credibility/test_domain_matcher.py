@@ -0,0 +1,59 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the domain_matcher
+"""
+from acred.reviewer.credibility import domain_matcher
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f.readlines()]
+
+
+factchecker_urls = read_lines('factchecker_urls.txt')
+
+
+def test_matches_by_netloc():
+    m = domain_matcher.matcher(factchecker_urls)
+    assert domain_matcher.matches(m, 'https://www.snopes.com/fact-check/x/', None)
+    assert domain_matcher.matches(m, 'http://www.snopes.com/', None)
+    # other paths in the netloc of a known url also match
+    assert domain_matcher.matches(m, 'https://www.washingtonpost.com/politics/', None)
+    assert not domain_matcher.matches(m, 'https://example.com/snopes', None)
+
+
+def test_matches_by_domain():
+    m = domain_matcher.matcher(factchecker_urls)
+    assert domain_matcher.matches(m, None, 'www.snopes.com')
+    assert domain_matcher.matches(m, 'https://example.com/a', 'www.snopes.com')
+    assert not domain_matcher.matches(m, None, 'example.com')
+    assert not domain_matcher.matches(m, None, None)
+
+
+def test_matcher_is_reused():
+    assert domain_matcher.matcher(list(factchecker_urls)) is (
+        domain_matcher.matcher(list(factchecker_urls)))
+    assert domain_matcher.matcher(factchecker_urls) is not (
+        domain_matcher.matcher(factchecker_urls[1:]))
+
+
+def test_cfg_matcher(monkeypatch):
+    m = domain_matcher.matcher(factchecker_urls)
+    cfg = {'acred_factchecker_urls': m['url_prefixes'],
+           'acred_factchecker_matcher': m}
+    monkeypatch.setattr(domain_matcher, 'matcher', None)
+    # the prebuilt matcher is used as is
+    assert domain_matcher.cfg_matcher(
+        cfg, 'acred_factchecker_urls', 'acred_factchecker_matcher') is m
+    assert domain_matcher.cfg_matcher(
+        {}, 'acred_factchecker_urls', 'acred_factchecker_matcher') is (
+            domain_matcher.empty_matcher)
+    monkeypatch.undo()
+    # but not when the urls were overridden
+    overridden = {**cfg, 'acred_factchecker_urls': ['https://example.com/']}
+    m2 = domain_matcher.cfg_matcher(
+        overridden, 'acred_factchecker_urls', 'acred_factchecker_matcher')
+    assert domain_matcher.matches(m2, None, 'example.com')
+    assert not domain_matcher.matches(m2, None, 'www.snopes.com')
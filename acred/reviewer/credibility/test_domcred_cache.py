@@ -0,0 +1,110 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the domcred_cache
+"""
+import datetime
+import sqlite3
+from acred.reviewer.credibility import domcred_cache
+
+
+def test_cache_key():
+    assert domcred_cache.cache_key('https://www.Snopes.com/') == 'www.snopes.com'
+    assert domcred_cache.cache_key('www.snopes.com') == 'www.snopes.com'
+    assert domcred_cache.cache_key('snopes.com') == 'snopes.com'
+
+
+def test_current_version_is_start_of_week():
+    monday = datetime.datetime(2020, 6, 1)
+    sunday = datetime.datetime(2020, 6, 7, 23, 59)
+    next_monday = datetime.datetime(2020, 6, 8, 0, 1)
+    assert domcred_cache.current_version(monday) == (
+        domcred_cache.current_version(sunday))
+    assert domcred_cache.current_version(monday) != (
+        domcred_cache.current_version(next_monday))
+
+
+def test_lru_eviction():
+    domcred_cache.clear()
+    cfg = {'domcred_cache_size': 2}
+    try:
+        domcred_cache.put('a.com', {'v': 1}, cfg)
+        domcred_cache.put('b.com', {'v': 2}, cfg)
+        assert domcred_cache.get('a.com', cfg) == {'v': 1}
+        domcred_cache.put('c.com', {'v': 3}, cfg)
+        assert domcred_cache.get('b.com', cfg) is None
+        assert domcred_cache.get('http://a.com/', cfg) == {'v': 1}
+    finally:
+        domcred_cache.clear()
+
+
+def test_expires_with_new_version(monkeypatch):
+    domcred_cache.clear()
+    try:
+        monkeypatch.setattr(domcred_cache, 'current_version',
+                            lambda now=None: 'week1')
+        domcred_cache.put('a.com', {'v': 1}, {})
+        assert domcred_cache.get('a.com', {}) == {'v': 1}
+        monkeypatch.setattr(domcred_cache, 'current_version',
+                            lambda now=None: 'week2')
+        assert domcred_cache.get('a.com', {}) is None
+    finally:
+        domcred_cache.clear()
+
+
+def test_persisted(tmp_path):
+    cfg = {'domcred_cache_path': str(tmp_path / 'domcred.sqlite')}
+    domcred_cache.clear()
+    try:
+        domcred_cache.put('www.a.com', {'v': 1}, cfg)
+        domcred_cache.clear()
+        assert domcred_cache.get('www.a.com', {}) is None
+        assert domcred_cache.get('https://www.a.com/', cfg) == {'v': 1}
+        assert domcred_cache.get('a.com', cfg) is None
+        assert domcred_cache.count_persisted(cfg) == 1
+    finally:
+        domcred_cache.clear()
+
+
+def test_prunes_old_versions_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'domcred.sqlite')
+    cfg = {'domcred_cache_path': path}
+    domcred_cache.clear()
+    try:
+        monkeypatch.setattr(domcred_cache, 'current_version',
+                            lambda now=None: 'week1')
+        domcred_cache.put('a.com', {'v': 1}, cfg)
+        monkeypatch.setattr(domcred_cache, 'current_version',
+                            lambda now=None: 'week2')
+        domcred_cache.put('b.com', {'v': 2}, cfg)
+        assert domcred_cache.count_persisted(cfg) == 1
+        # later puts for the same version do not delete anything
+        conn = sqlite3.connect(path)
+        conn.execute('INSERT INTO domcreds VALUES (?, ?, ?, ?)',
+                     ('old.com', 'week1', 0, '{}'))
+        conn.commit()
+        conn.close()
+        domcred_cache.put('c.com', {'v': 3}, cfg)
+        assert domcred_cache.count_persisted(cfg) == 3
+    finally:
+        domcred_cache.clear()
+
+
+def test_prefetch_queries_exact_host(monkeypatch):
+    from acred.reviewer.credibility import website_credrev
+    queried = []
+
+    def fetch(domain, cfg={}):
+        queried.append(domain)
+        return {'credibility': {'itemReviewed': domain}}
+
+    domcred_cache.clear()
+    try:
+        monkeypatch.setattr(website_credrev, 'misinfome_source_credibility', fetch)
+        outcome = website_credrev.prefetch_domain_credibility(
+            ['https://www.snopes.com/about', 'snopes.com'])
+        assert outcome == {'fetched': 2, 'cached': 0, 'failed': 0}
+        assert sorted(queried) == ['snopes.com', 'www.snopes.com']
+    finally:
+        domcred_cache.clear()
@@ -0,0 +1,68 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the domcred_snapshot
+"""
+import pytest
+from acred.reviewer.credibility import domcred_snapshot, website_credrev
+
+snopes_cred = {
+    'credibility': {'value': 0.9, 'confidence': 0.8},
+    'assessments': []
+}
+
+
+@pytest.mark.parametrize('fname', ['snap.jsonl', 'snap.sqlite'])
+def test_write_and_lookup(tmp_path, fname):
+    path = str(tmp_path / fname)
+    domcred_snapshot.write_snapshot(path, {'www.snopes.com': snopes_cred})
+    cfg = {'domcred_snapshot_path': path}
+    assert domcred_snapshot.lookup('https://www.snopes.com/', cfg) == snopes_cred
+    # MisinfoMe reviews the exact host, so other hosts are not matched
+    assert domcred_snapshot.lookup('snopes.com', cfg) is None
+    assert domcred_snapshot.lookup('example.com', cfg) is None
+    assert domcred_snapshot.version(cfg) is not None
+
+
+def test_sync_keeps_previous_on_failure(tmp_path):
+    path = str(tmp_path / 'snap.jsonl')
+    domcred_snapshot.write_snapshot(path, {'www.snopes.com': snopes_cred})
+
+    def fetch(domain):
+        if domain == 'www.snopes.com':
+            raise ValueError('MisinfoMe is down')
+        return {'credibility': {'value': 0.1, 'confidence': 0.5}}
+
+    outcome = domcred_snapshot.sync(
+        ['www.snopes.com', 'http://example.com/', 'bad.org'], path, fetch)
+    assert outcome == {'fetched': 2, 'kept': 1, 'failed': 0}
+    snapshot = domcred_snapshot.read_snapshot(path)
+    assert sorted(snapshot['entries']) == ['bad.org', 'example.com', 'www.snopes.com']
+    assert snapshot['entries']['www.snopes.com'] == snopes_cred
+
+
+def test_calc_domain_credibility_from_snapshot(tmp_path):
+    path = str(tmp_path / 'snap.jsonl')
+    domcred_snapshot.write_snapshot(path, {'www.snopes.com': snopes_cred})
+    cfg = {'domcred_backend': 'snapshot', 'domcred_snapshot_path': path}
+    domcred = website_credrev.calc_domain_credibility('www.snopes.com', cfg)
+    assert domcred['credibility'] == snopes_cred['credibility']
+    assert domcred['@type'] == 'DomainCredibility'
+
+    missing = website_credrev.calc_domain_credibility('example.com', cfg)
+    assert missing['credibility']['confidence'] == 0.0
+
+
+def test_load_checks_file_periodically(tmp_path):
+    path = str(tmp_path / 'snap.jsonl')
+    cfg = {'domcred_snapshot_path': path, 'domcred_snapshot_check_secs': 60}
+    # a missing file is an empty snapshot without version
+    assert domcred_snapshot.lookup('www.snopes.com', cfg) is None
+    assert domcred_snapshot.version(cfg) is None
+    domcred_snapshot.write_snapshot(path, {'www.snopes.com': snopes_cred})
+    # the file is not checked again until check_secs have passed
+    assert domcred_snapshot.version(cfg) is None
+    domcred_snapshot.refresh(path)
+    assert domcred_snapshot.lookup('www.snopes.com', cfg) == snopes_cred
+    assert domcred_snapshot.version(cfg) is not None
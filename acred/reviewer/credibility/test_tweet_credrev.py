@@ -0,0 +1,46 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the tweet_credrev
+"""
+import pytest
+from acred import docstore
+from acred.reviewer.credibility import tweet_credrev
+
+
+def test_review_linked_docs_in_tweet_01(tmp_path, monkeypatch):
+    # only urls which are not stored yet are fetched and analysed
+    cfg = {'docstore_path': str(tmp_path / 'docs.sqlite'),
+           'relsents_in_colls': []}
+    stored = {'url': 'https://t.co/stored', 'content': 'c',
+              'claims_content': []}
+    docstore.store_doc(stored['url'], stored, 'acred-analyzed', cfg)
+    art_credrev = tweet_credrev.article_credrev
+    fetched, analyzed = [], []
+    monkeypatch.setattr(
+        art_credrev.url_scraper, 'fetch_urls',
+        lambda urls, cfg: fetched.extend(urls) or [
+            {'resolved_url': url, 'raw_content': ''} for url in urls])
+
+    def fake_analyze_docs(docs, cfg):
+        analyzed.extend(doc['url'] for doc in docs)
+        return [{**doc, 'content': 'c', 'claims_content': []}
+                for doc in docs], {}
+
+    monkeypatch.setattr(art_credrev.semalyzer, 'analyze_docs',
+                        fake_analyze_docs)
+    monkeypatch.setattr(art_credrev, 'review_article',
+                        lambda adoc, cfg: {'reviewed': adoc['url']})
+    tweet = {'urls': [{'short_url': 'https://t.co/stored'},
+                      {'short_url': 'https://t.co/new'}]}
+    doc_creds, doc_creds_t = tweet_credrev.review_linked_docs_in_tweet(
+        tweet, cfg)
+    assert fetched == ['https://t.co/new']
+    assert analyzed == ['https://t.co/new']
+    assert sorted(dc['reviewed'] for dc in doc_creds) == [
+        'https://t.co/new', 'https://t.co/stored']
+    # the analysed doc is stored, without the tweet
+    found = docstore.find_doc('https://t.co/new', ['acred-analyzed'], cfg)
+    assert found['claims_content'] == []
+    assert 'mentioned_in' not in found
@@ -197,13 +197,15 @@ def review_sents_in_tweet(tweet, cfg):
     intws = relevant_sentences['in_tweet']
     logger.info("Found %d relevant sentences in tweet" % len(intws))
     review_format = cfg.get('acred_review_format', 'schema.org')
+    sub_ts = []
     if review_format == 'cred_assessment':
         sent_reviews = aggqsent_credrev.calc_claim_cred([itw['text'] for itw in intws], cfg)
     else:
-        sent_reviews = aggqsent_credrev.review(
+        sent_reviews, review_t = aggqsent_credrev.review_with_timings(
             [content.as_sentence(itw['text'], appearance=[tweet], cfg=cfg)
              for itw in intws], cfg)
-    sents_in_tweet_t = citimings.timing('sents_in_tweet', start2)
+        sub_ts.append(review_t)
+    sents_in_tweet_t = citimings.timing('sents_in_tweet', start2, sub_ts)
     return sent_reviews, [relevant_sentences_t, sents_in_tweet_t]
 
 
@@ -228,8 +230,9 @@ def review_linked_docs_in_tweet(tweet, cfg):
              'url': url,
              'mentioned_in': tweet}
             for url in doc_urls]
-    doc_creds = [article_credrev.review(doc, cfg)
-                 for doc in docs]
+    # linked docs which are not stored yet are fetched and analysed in
+    #  a single batch
+    doc_creds = article_credrev.review(docs, cfg)
     doc_creds_t = citimings.timing(
         'sub_doc_cred', start3,
         [dc['timings'] for dc in doc_creds
@@ -6,12 +6,13 @@ Implemented via the MisinfoMe source service.
 """
 import requests
 import logging
-import functools
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from acred import content
 from acred.reviewer.credibility import label as credlabel
-from esiutils import citimings, isodate, dictu, bot_describer, hashu
+from acred.reviewer.credibility import domcred_cache, domcred_snapshot
+from esiutils import citimings, isodate, dictu, bot_describer, hashu, cimetrics
 
 
 logger = logging.getLogger(__name__)
@@ -19,6 +20,7 @@ logger = logging.getLogger(__name__)
 ci_context = 'http://coinform.eu'
 misinfome_url = 'https://socsem.kmi.open.ac.uk/misinfo'
 source_cred_url = "%s/api/credibility/sources/" % misinfome_url
+unavailable_explanation = "Unable to retrieve credibility assessment"
 
 content.register_acred_type('MisinfoMeSourceCredReviewer', {
     'super_types': ['SoftwareApplication', 'Bot'],
@@ -110,7 +112,7 @@ def from_old_DomainCredibility(dom_cred, cfg):
     ratingVal = dictu.get_in(dom_cred, ['credibility', 'value'], 0.0)
     explanation = 'based on %d review(s) by external rater(s)%s' % (
                 len(dom_cred['assessments']), example_raters_markdown(dom_cred))
-    return {
+    result = {
         '@context': 'http://coinform.eu',
         '@type': 'WebSiteCredReview',
         'additionalType': content.super_types('WebSiteCredReview'),
@@ -133,6 +135,9 @@ def from_old_DomainCredibility(dom_cred, cfg):
         'isBasedOn_assessments': dom_cred['assessments'],
         'timings': dom_cred.get('timings', {})
     }
+    if dom_cred.get('unavailable', False):
+        result['unavailable'] = True
+    return result
 
 
 def example_raters_markdown(dom_cred):
@@ -173,6 +178,8 @@ def calc_domain_credibility(domain, cfg={}):
     which produces a `WebSiteCredReview` instead.
 
     :param domain: str e.g. `www.snopes.com`
+    :param cfg: config options, `domcred_backend` selects where the
+      MisinfoMe data is read from, see `source_credibility`
     :returns: a `DomainCredibility`
     :rtype: dict
     """
@@ -184,8 +191,12 @@ def calc_domain_credibility(domain, cfg={}):
             type(domain))
         start = citimings.start()
         try:
+            srccred = source_credibility(domain, cfg)
+            if srccred is None:
+                return default_domain_crediblity(
+                    domain, "No credibility assessment in snapshot")
             return {
-                **misinfome_source_credibility(domain),
+                **srccred,
                 '@context': 'DomainCredibility',
                 '@type': 'DomainCredibility',
                 'dateCreated': isodate.now_utc_timestamp(),
@@ -194,22 +205,124 @@ def calc_domain_credibility(domain, cfg={}):
             }
         except Exception as e:
             logger.error("Failed misinfome source credibility. " + str(e))
+            cimetrics.count_upstream_error('misinfome')
             return default_domain_crediblity(
-                domain, "Unable to retrieve credibility assessment")
+                domain, unavailable_explanation, unavailable=True)
+
+
+def domcred_version(cfg={}):
+    """Version of the domain credibility data used by `source_credibility`
+
+    :param cfg: config options
+    :returns: the version of the snapshot when `domcred_backend` is
+      `snapshot` (None if the snapshot file is missing), otherwise the
+      version of the MisinfoMe data (start of the current week)
+    :rtype: str
+    """
+    if cfg.get('domcred_backend', 'misinfome') == 'snapshot':
+        snapshot_version = domcred_snapshot.version(cfg)
+        if snapshot_version is None:
+            return None
+        return 'snapshot-%s' % snapshot_version
+    return domcred_cache.current_version()
+
+
+def source_credibility(domain, cfg={}):
+    """Retrieves the MisinfoMe credibility for a domain from the configured backend
 
+    With `domcred_backend = misinfome` (the default) the MisinfoMe
+    service is called. With `domcred_backend = snapshot` the credibility
+    is read from the local snapshot in `domcred_snapshot_path`, see
+    `domcred_snapshot`; domains missing from the snapshot are only
+    requested to MisinfoMe if `domcred_snapshot_fallback` is true.
 
-@functools.lru_cache(maxsize=256)
-# @cache.memoize(timeout=500)
-def misinfome_source_credibility(domain):
+    :param domain: str e.g. `www.snopes.com`
+    :param cfg: config options
+    :returns: the MisinfoMe response or None if the domain is not in the
+      snapshot
+    :rtype: dict
+    """
+    backend = cfg.get('domcred_backend', 'misinfome')
+    if backend == 'misinfome':
+        return misinfome_source_credibility(domain, cfg)
+    if backend != 'snapshot':
+        raise ValueError('Unknown domcred_backend %s' % backend)
+    result = domcred_snapshot.lookup(domain, cfg)
+    cimetrics.count_cache('domcred_snapshot', result is not None)
+    if result is None and cfg.get('domcred_snapshot_fallback', False):
+        return misinfome_source_credibility(domain, cfg)
+    return result
+
+
+def misinfome_source_credibility(domain, cfg={}):
+    """Retrieves the MisinfoMe credibility for a domain
+
+    Responses are cached until the MisinfoMe data changes, see
+    `domcred_cache`.
+
+    :param domain: str e.g. `www.snopes.com`
+    :param cfg: config options, see `domcred_cache.default_cfg`
+    :returns: the MisinfoMe response
+    :rtype: dict
+    """
+    domain = domcred_cache.cache_key(domain)
+    cached = domcred_cache.get(domain, cfg)
+    if cached is not None:
+        return cached
     req_url = "%s?source=%s" % (source_cred_url, domain)
     resp = requests.get(req_url)
     resp.raise_for_status()
-    return resp.json()
+    result = resp.json()
+    domcred_cache.put(domain, result, cfg)
+    return result
+
+
+def prefetch_domain_credibility(domains, cfg={}, max_workers=8):
+    """Warms the domain credibility cache for a list of domains
+
+    MisinfoMe is queried with the host of each domain or url, see
+    `domcred_cache.cache_key`, which is also what reviews query.
 
+    :param domains: list of domain names or website urls
+    :param cfg: config options, see `domcred_cache.default_cfg`
+    :param max_workers: number of concurrent requests to MisinfoMe
+    :returns: dict with the number of `fetched`, `cached` and `failed`
+      domains
+    :rtype: dict
+    """
+    keys = sorted(set(domcred_cache.cache_key(d) for d in domains if d))
+    keys = [k for k in keys if k]
+    result = {'fetched': 0, 'cached': 0, 'failed': 0}
+
+    def prefetch(domain):
+        if domcred_cache.get(domain, cfg) is not None:
+            return 'cached'
+        try:
+            misinfome_source_credibility(domain, cfg)
+            return 'fetched'
+        except Exception as e:
+            logger.warning('Failed to prefetch credibility of %s: %s' % (
+                domain, e))
+            return 'failed'
 
-def default_domain_crediblity(domain, explanation):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for outcome in executor.map(prefetch, keys):
+            result[outcome] += 1
+    return result
+
+
+def default_domain_crediblity(domain, explanation, unavailable=False):
+    """Zero-confidence `DomainCredibility` for when there is no assessment
+
+    :param domain: the domain which could not be assessed
+    :param explanation: why there is no assessment
+    :param unavailable: whether MisinfoMe could not be reached, in
+      which case the result is marked as `unavailable` so reviews based
+      on it are not persisted
+    :rtype: dict
+    """
     start = citimings.start()
-    return {
+    result = {
         "credibility": {
             '@context': ci_context,
             '@type': 'DomainCredibility',
@@ -221,4 +334,7 @@ def default_domain_crediblity(domain, explanation):
         },
         "assessments": []
     }
+    if unavailable:
+        result['unavailable'] = True
+    return result
 
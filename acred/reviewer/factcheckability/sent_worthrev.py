@@ -4,7 +4,7 @@
 """Check-worthiness reviewer for a sentence (or a list of sentences) based on a trained model
 """
 import logging
-from esiutils import citimings, hashu, dictu, isodate
+from esiutils import citimings, hashu, dictu, isodate, cimetrics, citrace
 from acred import content
 import requests
 
@@ -51,7 +51,7 @@ def review(item, config):
 def checkWorthinessReviewer(config):
     worthinesschecker_url = config['worthinesschecker_url']
     url = worthinesschecker_url + "/worthiness_predictor"
-    resp = requests.get(url, verify=False)
+    resp = requests.get(url, verify=False, headers=citrace.headers())
     logger.info("Response from %s %s" % (url, resp))
     return resp.json()
 
@@ -60,8 +60,11 @@ def predict_sentworthiness(items, config):
     worthinesschecker_url = config['worthinesschecker_url']
     url = worthinesschecker_url + "/predict_worthiness"
     req = {'sentences': [it['text'] for it in items]}
-    resp = requests.post(url, json=req, verify=False)
+    resp = requests.post(url, json=req, verify=False,
+                         headers=citrace.headers())
     logger.info("Response from %s %s" % (url, resp))
+    if not resp.ok:
+        cimetrics.count_upstream_error('worthinesschecker')
     resp.raise_for_status()
     jresp = resp.json()
     predictions = map_predictions(jresp.get('worthiness_checked_sentences'))
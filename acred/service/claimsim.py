@@ -9,7 +9,7 @@ similarity and stance detection for a batch.
 """
 import requests
 import logging
-from esiutils import dictu
+from esiutils import dictu, cimetrics, citrace
 
 
 logger = logging.getLogger(__name__)
@@ -49,11 +49,13 @@ def find_related_sentences(sents, cfg):
     logger.info("Finding related sentences from %s" % claim_search_url)
     resp = requests.post(claim_search_url,
                          json=req,
-                         verify=search_verify, auth=auth)
+                         verify=search_verify, auth=auth,
+                         headers=citrace.headers())
     try:
         resp.raise_for_status()
     except requests.exceptions.HTTPError as e:
         logger.error('Failed to find related sentences: ' + str(e))
+        cimetrics.count_upstream_error('claim_search')
         return []
 
     respd = resp.json()
@@ -0,0 +1,57 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in docstore
+"""
+import pytest
+from acred import docstore, gcssearch
+
+
+def test_normalize_url_01():
+    assert docstore.normalize_url('http://www.Example.com/a/b/#frag') == \
+        'https://example.com/a/b'
+    assert docstore.url_hash('https://example.com/a?x=1') != \
+        docstore.url_hash('https://example.com/a?x=2')
+
+
+def test_store_and_find_doc_01(tmp_path):
+    cfg = {'docstore_path': str(tmp_path / 'docs.sqlite')}
+    doc = {'url': 'http://example.com/a', 'claims_content': ['a claim']}
+    assert docstore.store_doc(doc['url'], doc, 'coll1', cfg)
+    assert docstore.find_doc('https://www.example.com/a/', ['coll1'], cfg) == doc
+    # not in requested collections
+    assert docstore.find_doc(doc['url'], ['coll2'], cfg) is None
+    assert docstore.find_doc('http://example.com/b', ['coll1'], cfg) is None
+
+
+def test_find_doc_expired_01(tmp_path):
+    cfg = {'docstore_path': str(tmp_path / 'docs.sqlite'),
+           'docstore_ttl_secs': -1}
+    docstore.store_doc('http://example.com/a', {'a': 1}, 'coll1', cfg)
+    assert docstore.find_doc('http://example.com/a', ['coll1'], cfg) is None
+
+
+def test_store_doc_evicts_01(tmp_path):
+    cfg = {'docstore_path': str(tmp_path / 'docs.sqlite'),
+           'docstore_max_docs': 3}
+    for i in range(5):
+        docstore.store_doc('http://example.com/%d' % i, {'i': i}, 'coll1', cfg)
+    assert docstore.count_docs(cfg) == 3
+    assert docstore.find_doc('http://example.com/0', ['coll1'], cfg) is None
+    assert docstore.find_doc('http://example.com/4', ['coll1'], cfg) == {'i': 4}
+
+
+def test_disabled_01():
+    assert docstore.store_doc('http://example.com/a', {}, 'coll1', {}) is False
+    assert docstore.find_doc('http://example.com/a', ['coll1'], {}) is None
+
+
+def test_store_analyzed_doc_01(tmp_path):
+    # the tweet which mentioned the doc is not shared with other requests
+    cfg = {'docstore_path': str(tmp_path / 'docs.sqlite')}
+    adoc = {'url': 'http://example.com/a', 'claims_content': ['a claim'],
+            'mentioned_in': {'@type': 'Tweet', 'text': 'look'},
+            'timings': {}}
+    assert gcssearch.store_analyzed_doc(adoc['url'], adoc, cfg)
+    assert gcssearch.find_preindexed_doc_by_url(adoc['url'], [], cfg) == {
+        'url': 'http://example.com/a', 'claims_content': ['a claim']}
@@ -105,7 +105,7 @@ app = Flask(__name__)
 app.config.from_object(__name__)
 cache = Cache(app,
               # TODO: read cache from config
-              config={'CACHE_TYPE': 'simple'})
+              config={'CACHE_TYPE': 'SimpleCache'})
 
 
 
@@ -7,6 +7,8 @@ Provides functionality to search and predict claim credibility based on a
 """
 import logging
 import time
+import re
+import unicodedata
 import requests
 import json
 from acredapi import config, cache
@@ -14,13 +16,22 @@ import numpy as np
 from acredapi.InvalidUsage import InvalidUsage
 from acred import content
 from acred.reviewer.credibility import website_credrev
-from esiutils import citimings, isodate, dictu
+from acred.reviewer.credibility import claimreview_normalizer as crn
+from esiutils import citimings, isodate, dictu, cimetrics, citrace, hashu, bot_describer
 
 
 # Setup
 logger = logging.getLogger(__name__)
 ci_context = 'http://coinform.eu'
 
+content.register_acred_type('ExactSentMatchReviewer', {
+    'super_types': ['SoftwareApplication', 'Bot'],
+    'ident_keys': ['@type', 'name', 'dateCreated', 'softwareVersion',
+                   'isBasedOn', 'launchConfiguration'],
+    'route_template': '/bot/{@type}/{softwareVersion}/{identifier}',
+    'itemref_keys': ['author']
+})
+
 
 def stub_claim_cred_pred(claim):
     return {
@@ -87,15 +98,18 @@ def search_semantic_vecspace(q_claims, topn=10):
     req = {'query_sentences': q_claims,
            'topn' : topn,
            'provenance': True}
-    resp = requests.post(url, json=req, verify=False)
+    resp = requests.post(url, json=req, verify=False,
+                         headers=citrace.headers())
     logger.info("Response from %s %s" % (url, resp))
+    if not resp.ok:
+        cimetrics.count_upstream_error('claimneuralindex')
     jresp = resp.json()
     return jresp['similarities'], jresp['claim_ids'], jresp.get('author')
 
 
 def simReviewer():
     url = neural_index_url + '/sim_reviewer'
-    resp = requests.get(url, verify=False)
+    resp = requests.get(url, verify=False, headers=citrace.headers())
     logger.info("Response from %s %s" % (url, resp))
     jresp = resp.json()
     return jresp
@@ -104,8 +118,11 @@ def simReviewer():
 def predict_stances(qclaim_doc_bodies):
     url = stance_pred_url + '/predict_stance'
     req = qclaim_doc_bodies
-    resp = requests.post(url, json=req, verify=False)
+    resp = requests.post(url, json=req, verify=False,
+                         headers=citrace.headers())
     logger.info("Response from %s %s" % (url, resp))
+    if not resp.ok:
+        cimetrics.count_upstream_error('stance')
     jresp = resp.json()
     return jresp['labels'], jresp['confidences'], dictu.get_in(
         jresp, ['meta', 'model_info'])
@@ -113,7 +130,7 @@ def predict_stances(qclaim_doc_bodies):
 
 def stancePredictor():
     url = stance_pred_url + '/stance_predictor'
-    resp = requests.get(url, verify=False)
+    resp = requests.get(url, verify=False, headers=citrace.headers())
     logger.info("Response from %s %s" % (url, resp))
     jresp = resp.json()
     return jresp
@@ -137,7 +154,7 @@ def do_add_stance_labels(claim_sim_results, sim_threshold=0.7, max_len=128):
             logger.warning('Skip stance_pred: q_claim is too large %d ' % (
                 len(q_claim_toks)))
             continue
-        bods, rs_targets = [], []
+        bods, bod_ids, rs_targets = [], [], []
         for rs in cresult['results']:
             if rs['similarity'] < sim_threshold:
                 continue
@@ -149,12 +166,15 @@ def do_add_stance_labels(claim_sim_results, sim_threshold=0.7, max_len=128):
             sent = rs.get('sentence', None)
             if sent is not None:
                 bods.append(sent)
+                # lets the stance predictor reuse the indexed encoding
+                bod_ids.append(rs.get('sentence_id'))
                 rs_targets.append({'rs': rs,
                                    'field': 'sent_stance'})
         if len(bods) > 0:
             stance_reqs.append({
                 'qclaim': q_claim,
                 'doc_bodies': bods,
+                'doc_ids': bod_ids,
                 'rs_targets': rs_targets})
 
     if len(stance_reqs) == 0:
@@ -163,7 +183,7 @@ def do_add_stance_labels(claim_sim_results, sim_threshold=0.7, max_len=128):
 
     labels, confs, stanceRev = predict_stances(
         # don't send the rs_targets to server
-        [dictu.select_keys(sr, ['qclaim', 'doc_bodies'])
+        [dictu.select_keys(sr, ['qclaim', 'doc_bodies', 'doc_ids'])
          for sr in stance_reqs])
 
     for csr in claim_sim_results:
@@ -256,12 +276,113 @@ def search_claim_bots():
             'timings': timing,
             'params': {}}}    
 
+def exact_match_key(sentence):
+    """Normalises a sentence into a key for the exact-match index
+
+    Ignores case, punctuation and whitespace differences, so verbatim
+    copies of a DB sentence (e.g. in retweets) share the same key.
+
+    :param sentence: a sentence
+    :returns: a hash of the normalised sentence
+    :rtype: str
+    """
+    norm = unicodedata.normalize('NFKC', sentence).casefold()
+    norm = ' '.join(re.sub(r'[\W_]+', ' ', norm).split())
+    return hashu.calc_str_hash(norm)
+
+
+def build_exact_match_index(dbs):
+    """Indexes the DB sentences by their `exact_match_key`
+
+    :param dbs: list of `InMemoryClaimDB`s
+    :returns: dict from exact-match key to list of sentence ids
+    :rtype: dict
+    """
+    start = citimings.start()
+    index = {}
+    for db in dbs:
+        for doc in db['docs']:
+            text = doc.get('content_t')
+            if text:
+                index.setdefault(exact_match_key(text), []).append(doc['id'])
+    logger.info('Indexed %d exact-match keys in %sms' % (
+        len(index), citimings.timing('build_exact_match_index', start)['total_ms']))
+    return index
+
+
+def exactMatchReviewer():
+    result = {
+        '@context': ci_context,
+        '@type': 'ExactSentMatchReviewer',
+        'additionalType': content.super_types('ExactSentMatchReviewer'),
+        'name': 'ESI Exact Sentence Match Reviewer',
+        'description': 'Finds sentences in the Co-inform DB which are the same as the query sentence, ignoring case, punctuation and whitespace. Matching sentences have similarity 1.0 and agree with the query sentence.',
+        'author': bot_describer.esiLab_organization(),
+        'dateCreated': '2020-10-19T10:00:00Z',
+        'applicationSuite': 'Co-inform',
+        'softwareVersion': '0.1.0',
+        'isBasedOn': [],
+        'launchConfiguration': {}
+    }
+    return {
+        **result,
+        'identifier': hashu.hash_dict(dictu.select_keys(
+            result, content.ident_keys(result)))
+    }
+
+
+def find_exact_matches(q_claims):
+    """Finds the DB sentences which exactly match the query claims
+
+    :param q_claims: list of query sentences
+    :returns: dict from the index of a query claim in `q_claims` to the
+      ids of the DB sentences that match it. Claims without exact
+      matches are not included
+    :rtype: dict
+    """
+    result = {}
+    for i, q_claim in enumerate(q_claims):
+        ids = exact_match_index.get(exact_match_key(q_claim))
+        if ids:
+            result[i] = ids
+    return result
+
+
+def exact_match_result(q_claim, sent_ids):
+    """Builds a `SemanticClaimSimilarityResult` for exactly matching sentences
+
+    Exact matches are not sent to the neural index nor to the stance
+    predictor, as they have similarity 1.0 and agree with `q_claim`.
+    """
+    start = citimings.start()
+    q_resp = {'response': {'docs': find_in_dbs(
+        dbs=[preCrawled_sents_db, claimReviewed_sents_db], q_ids=sent_ids)}}
+    relsents, sub_ts = q_resp_to_related_sent(
+        q_resp, {sent_id: 1.0 for sent_id in sent_ids})
+    for rs in relsents:
+        rs['sent_stance'] = 'agree'
+        rs['sent_stance_confidence'] = 1.0
+    reviewer = exactMatchReviewer()
+    return {
+        '@context': ci_context,
+        '@type': 'SemanticClaimSimilarityResult',
+        'dateCreated': isodate.now_utc_timestamp(),
+        'q_claim': q_claim,
+        'simReviewer': reviewer,
+        'stanceReviewer': reviewer,
+        'results': relsents}, citimings.timing('build_result', start, sub_ts)
+
+
 @cache.memoize(timeout=500)
 def search_claim(q_claim):
     """finds similar claims or sentences in a claim database
 
     Finding similar claims or sentences in the co-inform claim database # noqa: E501
 
+    Claims which exactly match a DB sentence (see `exact_match_key`) are
+    resolved via the exact-match index; only the remaining claims are
+    sent to the neural index.
+
     :param q_claim: This should be an English sentence or claim. Multiple sentences are not allowed.
     :type q_claim: str
     :rtype: dict
@@ -273,26 +394,38 @@ def search_claim(q_claim):
     if q_claim is None:
         raise InvalidUsage("Claim is mandatory")
     start = citimings.start()
+    exact_matches = find_exact_matches(q_claims)
+    exact_match_t = citimings.timing('exact_match', start)
+    for i in range(len(q_claims)):
+        cimetrics.count_cache('exact_match', i in exact_matches)
+    sem_idxs = [i for i in range(len(q_claims)) if i not in exact_matches]
+    sem_claims = [q_claims[i] for i in sem_idxs]
+
+    start2 = citimings.start()
     logger.info('Searching semantic vector space for %s claim(s)' % len(
-        q_claims))
+        sem_claims))
     topn = 5
-    preds, claim_ids, simReviewer = search_semantic_vecspace(q_claims, topn=topn)
-    search_semspace_t = citimings.timing('search_semantic_vecspace', start)
+    if len(sem_claims) > 0:
+        preds, claim_ids, simReviewer = search_semantic_vecspace(
+            sem_claims, topn=topn)
+    else:
+        preds, claim_ids, simReviewer = [], [], None
+    search_semspace_t = citimings.timing('search_semantic_vecspace', start2)
 
     assert len(preds) == len(claim_ids)
-    assert len(q_claims) == len(preds)
-    q_resp, claim_retrieve_t = retrieve_result_claims(claim_ids, q_claims, topn)
+    assert len(sem_claims) == len(preds)
+    q_resp, claim_retrieve_t = retrieve_result_claims(claim_ids, sem_claims, topn)
 
     start3 = citimings.start()
-    results, sub_build_ts = [], []
-    for i in range(len(q_claims)):
+    sem_results, sub_build_ts = [], []
+    for i in range(len(sem_claims)):
         start4 = citimings.start()
         claim_id2pred = {idx: float(pred) for idx, pred in zip(
             claim_ids[i], preds[i])}
         relsents, sub_ts = q_resp_to_related_sent(
             q_resp, claim_id2pred)
-        qclaim = q_claims[i]
-        results.append({
+        qclaim = sem_claims[i]
+        sem_results.append({
             '@context': ci_context,
             '@type': 'SemanticClaimSimilarityResult',
             'dateCreated': isodate.now_utc_timestamp(),
@@ -300,14 +433,19 @@ def search_claim(q_claim):
             'simReviewer': simReviewer,
             'results': relsents})
         sub_build_ts.append(citimings.timing('build_result', start4, sub_ts))
+    results_by_idx = dict(zip(sem_idxs, sem_results))
+    for i, sent_ids in exact_matches.items():
+        results_by_idx[i], build_t = exact_match_result(q_claims[i], sent_ids)
+        sub_build_ts.append(build_t)
     result_build_t = citimings.timing('build_results', start3, sub_build_ts)
 
-    results, stance_pred_t = add_stance_detection(
-        results, sim_threshold=stance_min_sim_threshold)
+    sem_results, stance_pred_t = add_stance_detection(
+        sem_results, sim_threshold=stance_min_sim_threshold)
+    results = [results_by_idx[i] for i in range(len(q_claims))]
 
     timing = citimings.timing(
         'search_claim', start,
-        [search_semspace_t, claim_retrieve_t,
+        [exact_match_t, search_semspace_t, claim_retrieve_t,
          result_build_t, stance_pred_t])
     return {
         'results': results,
@@ -359,6 +497,7 @@ def as_related_sent_or_claimReview(db_claim_doc, claimid2pred):
         '@context': ci_context,
         '@type': 'SimilarSent',
         'sentence': db_claim_doc['content_t'],
+        'sentence_id': db_claim_doc['id'],
         'similarity': claimid2pred.get(db_claim_doc['id'], 0.5),
         'doc_url': None if len(doc_urls) == 0 else doc_urls[0],
         'appearance': doc_urls,
@@ -408,6 +547,8 @@ def read_claimReview_db_from_jsonl(path):
         db['docs'] = [json.loads(json_str) for json_str in jsonl_file]
     db['url2doc_index'] = {doc['url']: idx
                            for idx, doc in enumerate(db['docs'])}
+    # ratings are normalised once here, rather than on every request
+    db['url2normalised_ratings'] = crn.index_claimReviews(db['docs'])
     return db
 
 def lookup_claimReview_url(url, claimReview_db):
@@ -421,7 +562,7 @@ def lookup_claimReview_url(url, claimReview_db):
     assert type(claimReview_db) is dict, '%s' % (type(claimReview_db))
     assert claimReview_db.get('@type') == 'InMemoryClaimReviewDB'
     idx = claimReview_db.get('url2doc_index', {}).get(url, None)
-    if idx:
+    if idx is not None:
         return claimReview_db['docs'][idx]
     else:
         return None
@@ -432,3 +573,4 @@ stance_min_sim_threshold = float(config['acredapi'].get('stance_min_sim_threshol
 claimReview_db = read_claimReview_db_from_jsonl(config['acredapi']['claimReview_db_jsonl'])
 preCrawled_sents_db = read_sents_db_from_csv(config['acredapi']['sentences_extracted_db_csv'])
 claimReviewed_sents_db = read_sents_db_from_csv(config['acredapi']['sentences_from_ClaimReviews_db_csv'])
+exact_match_index = build_exact_match_index([preCrawled_sents_db, claimReviewed_sents_db])
@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+'''Materializes the `DBSentCredReview` for every sentence in the claim DBs
+
+Reviews are stored in `dbsent_store_path` (see
+`acred.reviewer.credibility.dbsent_store`), so claim search results only
+need a lookup at request time. Sentences which already have a review
+for the current `dbsent_credrev.materialization_version` are skipped,
+so run this job again after updating the `ClaimReview` normalizer or
+the domain credibility snapshot.
+
+Run from the root of the repo, e.g.
+
+    ACRED_config_file=acred.ini python -m acredapi.materialize_dbsent
+'''
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from acredapi import claim, views
+from acred.reviewer.credibility import dbsent_credrev, dbsent_store
+
+
+def claim_dbs():
+    return [claim.claimReviewed_sents_db, claim.preCrawled_sents_db]
+
+
+def materialize(dbs, cfg, force=False, workers=4, batch_size=500):
+    """Calculates and stores the reviews for the sentences in `dbs`
+
+    :param dbs: list of `InMemoryClaimDB`s
+    :param cfg: acred config, must include `dbsent_store_path`
+    :param force: recalculate reviews even if they are up to date
+    :param workers: number of sentences reviewed in parallel
+    :param batch_size: number of reviews per write to the store
+    :returns: dict with the number of `stored` and `skipped` sentences and
+      the `pruned` reviews for older versions
+    :rtype: dict
+    """
+    assert dbsent_store.is_enabled(cfg), 'Missing dbsent_store_path'
+    mat_version = dbsent_credrev.materialization_version(cfg)
+    if mat_version is None:
+        print('Domain credibility snapshot not available, nothing to materialize')
+        return {'stored': 0, 'skipped': 0, 'pruned': 0}
+    done = set() if force else dbsent_store.stored_ids(mat_version, cfg)
+    docs = [doc for db in dbs for doc in db['docs'] if doc['id'] not in done]
+
+    def review(doc):
+        simSent, _ = claim.as_related_sent_or_claimReview(doc, {})
+        return doc['id'], dbsent_credrev.calc_DBSentCredRev(simSent, cfg)
+
+    stored = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(0, len(docs), batch_size):
+            # reviews without domain credibility are calculated on request
+            batch = [(doc_id, rev)
+                     for doc_id, rev in executor.map(review, docs[i:i + batch_size])
+                     if dbsent_credrev.is_storable(rev)]
+            stored += dbsent_store.store_reviews(batch, mat_version, cfg)
+            print('Stored %d of %d reviews' % (stored, len(docs)))
+    return {
+        'stored': stored,
+        'skipped': len(done),
+        'pruned': dbsent_store.prune(mat_version, cfg)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Materialize the credibility reviews of the claim DB sentences',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-force', action='store_true',
+                        help='Recalculate reviews even if they are up to date')
+    parser.add_argument('-workers', type=int, default=4,
+                        help='Number of sentences reviewed in parallel')
+    args = parser.parse_args()
+
+    cfg = views.acred_config()
+    if not dbsent_store.is_enabled(cfg):
+        sys.exit('Set dbsent_store_path in the [acred] section of the config')
+    start = time.time()
+    outcome = materialize(claim_dbs(), cfg, args.force, args.workers)
+    print('stored %(stored)d, up to date %(skipped)d, pruned %(pruned)d' % (
+        outcome) + ' in %.1fs' % (time.time() - start))
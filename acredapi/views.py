@@ -5,16 +5,20 @@
 API Views for serving user requests with examples
 """
 import logging
+import os
 import subprocess
-from flask import jsonify, request
+import functools
+from flask import jsonify, request, make_response, send_from_directory
 import werkzeug
 from werkzeug.datastructures import MultiDict
 from acredapi import app, config, claim
-from esiutils import citimings, dictu
+from esiutils import citimings, dictu, health, cimetrics, citrace, ciprofile
+from esiutils import cfgu
 from acredapi.InvalidUsage import InvalidUsage
 from acredapi.ServerError import ServerError
 from acred import predictor as credpred
 from acred import itnorm
+from acred.reviewer.credibility import domain_matcher
 import time
 import requests
 from semantic_analyzer import analyzer
@@ -23,6 +27,7 @@ from semantic_analyzer import analyzer
 # Setup
 logger = logging.getLogger(__name__)
 app_name = config['acredapi']['app_name']
+profile_settings = ciprofile.settings(config['acredapi'])
 
 
 # http://localhost:5000/test unauthenticated response of "Hello World"
@@ -34,13 +39,30 @@ def app_test():
     return jsonify(response)
 
 
+def system_uptime():
+    """Describes the system uptime and load, similar to the `uptime` command
+
+    Reads `/proc/uptime` instead of spawning a process per request.
+    """
+    with open('/proc/uptime') as in_f:
+        secs = int(float(in_f.read().split()[0]))
+    days, rem = divmod(secs, 24 * 60 * 60)
+    hours, rem = divmod(rem, 60 * 60)
+    load = ', '.join('%.2f' % l for l in os.getloadavg())
+    return 'up %d days, %2d:%02d, load average: %s' % (
+        days, hours, rem // 60, load)
+
+
 # System Uptime
 @app.route('/' + app_name + '/api/v1/uptime')
 def app_uptime():
-    """ Runs a system command to get the uptime"""
-    p = subprocess.Popen('uptime', stdout=subprocess.PIPE,
-                         universal_newlines=True)
-    uptime = p.stdout.readlines()[0].strip()
+    """ Reports the system uptime"""
+    try:
+        uptime = system_uptime()
+    except OSError:  # no /proc, e.g. on windows or mac
+        p = subprocess.Popen('uptime', stdout=subprocess.PIPE,
+                             universal_newlines=True)
+        uptime = p.stdout.readlines()[0].strip()
     response = {"message": uptime, "status": "200"}
     return jsonify(response)
 
@@ -67,6 +89,60 @@ def parse_bool(strval):
     raise ValueError("Not a boolean str: " + strval)
 
 
+def profile_requested():
+    req_json = request.get_json(silent=True)
+    val = request.args.get('profile', None)
+    if val is None and type(req_json) is dict:
+        val = req_json.get('profile', None)
+    return val is not None and str(val).strip().lower() == 'true'
+
+
+def profiled(name):
+    """Decorator for review views which can run under the sampling profiler
+
+    Requests with `profile=true` are profiled, but only when they carry
+    the admin token (see `ciprofile.is_admin`). Besides, 1 in every
+    `profile_sample_every` requests is profiled automatically. Profiles
+    are stored in `profile_dir`; the file name is returned in the
+    `X-Acred-Profile` response header and can be retrieved via the
+    admin profiles endpoint.
+
+    :param name: name of the view, used as prefix of the profile files
+    """
+    def decorator(view_fn):
+        @functools.wraps(view_fn)
+        def wrapper(*args, **kwargs):
+            on_demand = profile_requested()
+            if on_demand and not ciprofile.is_admin(request.headers,
+                                                    profile_settings):
+                raise InvalidUsage('profile=true requires an admin token',
+                                   status_code=403)
+            if not on_demand and not ciprofile.should_sample(profile_settings):
+                return view_fn(*args, **kwargs)
+            sampler = ciprofile.start_sampler(profile_settings['interval_ms'])
+            try:
+                resp = make_response(view_fn(*args, **kwargs))
+            finally:
+                profile = ciprofile.stop_sampler(sampler)
+            try:
+                fname = ciprofile.store(profile, name, profile_settings['dir'])
+                resp.headers['X-Acred-Profile'] = fname
+            except Exception as e:
+                logger.error('Failed to store profile: %s' % e)
+            return resp
+        return wrapper
+    return decorator
+
+
+@app.route('/' + app_name + '/api/v1/admin/profiles/<fname>', methods=['GET'])
+def admin_profile(fname):
+    """Returns a stored profile as folded stacks, admin token required"""
+    if not ciprofile.is_admin(request.headers, profile_settings):
+        raise InvalidUsage('admin token required', status_code=403)
+    return send_from_directory(os.path.abspath(profile_settings['dir']),
+                               fname, mimetype='text/plain')
+
+
 @app.route('/' + app_name + '/api/v1/claim/search', methods=['GET'])
 def claim_search():
     try:
@@ -94,6 +170,7 @@ def internal_claim_search():
         # else
         logger.info('Searching for claims related to %d sents: "%s"' % (
             len(q_claims), q_claims))
+        cimetrics.observe_batch_size('claim_internal_search', len(q_claims))
         return jsonify(claim.search_claim(q_claims))
     except InvalidUsage as e:
         raise e
@@ -105,6 +182,7 @@ def internal_claim_search():
            methods=['GET'])
 @app.route('/' + app_name + '/api/v1/claim/predict/credibility',
            methods=['GET'])
+@profiled('claim')
 def claim_predict_credibility():
     try:
         claims = request.args.getlist('claim', None)
@@ -136,6 +214,7 @@ def claim_predict_credibility():
 
 @app.route('/' + app_name + '/api/v1/acred/reviewer/credibility/website',
            methods=['GET'])
+@profiled('website')
 def acred_website_credibility():
     try:
         urls = request.args.getlist('url', None)
@@ -150,6 +229,7 @@ def acred_website_credibility():
 
 @app.route('/' + app_name + '/api/v1/acred/reviewer/credibility/webpage',
            methods=['GET', 'POST'])
+@profiled('webpage')
 def acred_webpage_credibility():
     try:
         req_json = request.get_json() or {}
@@ -185,20 +265,36 @@ def merge_mdict_params(a, b):
     return result
 
 
+_read_lines_cache = {}
+
+
 def read_lines(path):
-    with open(path, encoding='utf-8') as f:
-        lines = f.readlines()
-    return [line.strip() for line in lines]
+    """Reads the stripped lines of a file, cached until the file changes
+
+    :returns: the lines as a tuple, as the result is shared between calls
+    :rtype: tuple of str
+    """
+    mtime = os.stat(path).st_mtime
+    cached = _read_lines_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='utf-8') as f:
+            lines = f.readlines()
+        cached = (mtime, tuple(line.strip() for line in lines))
+        _read_lines_cache[path] = cached
+    return cached[1]
 
 
 def acred_config():
     sect = config['acred']
+    # built once per file version, rather than on each fact-checker check
+    factchecker_matcher = domain_matcher.matcher(
+        read_lines(sect['acred_factchecker_urls_path']))
     return {
-        'acred_factchecker_urls': read_lines(
-            sect['acred_factchecker_urls_path']),
+        'acred_factchecker_urls': factchecker_matcher['url_prefixes'],
+        'acred_factchecker_matcher': factchecker_matcher,
         'acred_pred_claim_search_url': sect['acred_pred_claim_search_url'],
-        'acred_search_auth_user': sect['acred_search_auth_user'],
-        'acred_search_auth_pwrd': sect['acred_search_auth_pwrd'],
+        'acred_search_auth_user': sect.get('acred_search_auth_user', None),
+        'acred_search_auth_pwrd': sect.get('acred_search_auth_pwrd', None),
         'acred_search_verify': bool(sect.get(
             'acred_search_verify', True)),
         'acred_review_format': sect.get('review_format', 'cred_assessment'),
@@ -213,14 +309,36 @@ def acred_config():
         'translation_service_key': sect.get('translation_service_key', None),
         'relsents_in_colls': [
             it.strip() for it in sect['relsents_in_colls'].split(',')],
-        'relsents_search_auth_user': sect['relsents_search_auth_user'],
-        'relsents_search_auth_pwrd': sect['relsents_search_auth_pwrd'],
+        'relsents_search_auth_user': sect.get(
+            'relsents_search_auth_user', 'testuser'),
+        'relsents_search_auth_pwrd': sect.get(
+            'relsents_search_auth_pwrd', 'testpass'),
         'relsents_search_url': sect['relsents_search_url'],
         'relsents_search_verify': bool(sect['relsents_search_verify']),
         'sentence_similarity_unrelated_factor': float(sect.get('sentence_similarity_unrelated_factor', 0.8)),
         'sentence_similarity_discuss_factor': float(sect.get('sentence_similarity_discuss_factor', 0.9)),
         'worthiness_review': bool(sect['worthiness_review']),
-        'worthinesschecker_url': sect.get('worthinesschecker_url', None)
+        'worthinesschecker_url': sect.get('worthinesschecker_url', None),
+        'url_fetch_timeout': float(sect.get('url_fetch_timeout', 1.5)),
+        'url_fetch_max_workers': int(sect.get('url_fetch_max_workers', 8)),
+        'url_fetch_per_domain': int(sect.get('url_fetch_per_domain', 2)),
+        'url_fetch_max_bytes': int(sect.get('url_fetch_max_bytes', 2097152)),
+        'url_fetch_error_ttl': float(sect.get('url_fetch_error_ttl', 60)),
+        'docstore_path': sect.get('docstore_path', None),
+        'docstore_ttl_secs': float(sect.get('docstore_ttl_secs', 604800)),
+        'docstore_max_docs': int(sect.get('docstore_max_docs', 10000)),
+        'domcred_cache_size': int(sect.get('domcred_cache_size', 4096)),
+        'domcred_cache_path': sect.get('domcred_cache_path', None),
+        'domcred_backend': sect.get('domcred_backend', 'misinfome'),
+        'domcred_snapshot_path': sect.get('domcred_snapshot_path', None),
+        'domcred_snapshot_fallback': cfgu.get_bool(
+            sect, 'domcred_snapshot_fallback'),
+        'domcred_snapshot_check_secs': float(
+            sect.get('domcred_snapshot_check_secs', 10)),
+        'dbsent_store_path': sect.get('dbsent_store_path', None),
+        'qsent_dedup_threshold': float(sect.get('qsent_dedup_threshold', 0)),
+        'speculative_claim_search': cfgu.get_bool(
+            sect, 'speculative_claim_search')
     }
 
 
@@ -264,6 +382,7 @@ def backward_compatible_tweetcred_predictions(preds):
            methods=['POST'])
 @app.route('/' + app_name + '/api/v1/tweet/claim/credibility',
            methods=['POST'])
+@profiled('tweet')
 def tweet_predict_credibility():
     try:
         logger.info("Received request " + str(request) +
@@ -314,3 +433,15 @@ def handle_server_error(error):
     response = jsonify(error.to_dict())
     response.status_code = error.status_code
     return response
+
+
+health.register_routes(app, app_name)
+cimetrics.configure(app_name, config['acredapi'])
+cimetrics.register_routes(app, app_name)
+citrace.configure(app_name, config['acredapi'])
+citrace.register_hooks(app, app_name)
+health.warmup('acred_config', acred_config)
+health.warmup('claim_dbs', lambda: claim.find_in_dbs(
+    [claim.preCrawled_sents_db, claim.claimReviewed_sents_db],
+    [doc['id'] for doc in claim.claimReviewed_sents_db['docs'][:1]]))
+health.mark_ready()
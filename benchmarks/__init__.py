@@ -0,0 +1,9 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Offline load tests and benchmarks for acred
+
+See `bench_e2e` for the end-to-end load test of the services running
+on tiny models (booted by `stack`), and `mixes/` for recorded request
+mixes.
+"""
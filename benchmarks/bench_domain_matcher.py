@@ -0,0 +1,104 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+'''Microbenchmark of the fact-checker domain matching
+
+Compares the previous check, which parsed every url in
+`factchecker_urls.txt` on each call, with the compiled
+`domain_matcher`, and reports the cost of compiling a matcher.
+
+Run from the root of the repo, e.g.
+
+    python -m benchmarks.bench_domain_matcher -repeat 2000
+'''
+import argparse
+import time
+from acred import content
+from acred.reviewer.credibility import domain_matcher
+
+
+def is_factchecker_linear(url, domain, fc_urls):
+    """The check as done before compiling the known urls"""
+    url_nl = content.domain_from_url(url)
+    fc_netlocs = [content.domain_from_url(fc_url) for fc_url in fc_urls]
+    fc_netlocs = [nl for nl in fc_netlocs if nl is not None]
+    if url_nl is not None:
+        if url_nl in fc_netlocs:
+            return True
+    elif url is not None:
+        return any(url.startswith(fc_url) for fc_url in fc_urls)
+    if domain is None:
+        return False
+    return domain in fc_netlocs
+
+
+def is_factchecker_compiled(url, domain, cfg):
+    """The check with the matcher prebuilt by `acred_config`"""
+    return domain_matcher.matches(
+        domain_matcher.cfg_matcher(
+            cfg, 'acred_factchecker_urls', 'acred_factchecker_matcher'),
+        url, domain)
+
+
+def sample_checks(fc_urls):
+    """(url, domain) pairs as seen for SimilarSents and WebSites"""
+    checks = []
+    for fc_url in fc_urls:
+        nl = content.domain_from_url(fc_url)
+        checks.append(('%s2020/01/some-article' % fc_url, nl))
+        checks.append(('https://news%s.example.com/a' % len(checks), nl))
+        checks.append((None, nl))
+    return checks
+
+
+def time_us(fn, checks, known, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        for url, domain in checks:
+            fn(url, domain, known)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(checks))
+
+
+def run(fc_urls_path='factchecker_urls.txt', repeat=200):
+    with open(fc_urls_path, encoding='utf-8') as in_f:
+        fc_urls = [line.strip() for line in in_f if line.strip()]
+    checks = sample_checks(fc_urls)
+    fc_matcher = domain_matcher.matcher(fc_urls)
+    cfg = {'acred_factchecker_urls': fc_matcher['url_prefixes'],
+           'acred_factchecker_matcher': fc_matcher}
+    for url, domain in checks:
+        assert is_factchecker_linear(url, domain, fc_urls) == (
+            is_factchecker_compiled(url, domain, cfg)), (url, domain)
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        domain_matcher.compile_matcher(fc_urls)
+    build_us = (time.perf_counter() - start) * 1e6 / repeat
+    return {
+        'known_urls': len(fc_urls),
+        'checks': len(checks),
+        'build_us': build_us,
+        'linear_us_per_check': time_us(
+            is_factchecker_linear, checks, fc_urls, repeat),
+        'compiled_us_per_check': time_us(
+            is_factchecker_compiled, checks, cfg, repeat)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark fact-checker domain matching',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-factcheckerUrls', default='factchecker_urls.txt',
+                        help='Path to the list of fact-checker urls')
+    parser.add_argument('-repeat', type=int, default=200,
+                        help='Times each check is repeated')
+    args = parser.parse_args()
+
+    result = run(args.factcheckerUrls, args.repeat)
+    print('Compiled matcher for %d urls in %.1fus' % (
+        result['known_urls'], result['build_us']))
+    print('%d checks: linear %.2fus/check, compiled %.2fus/check (%.0fx)' % (
+        result['checks'], result['linear_us_per_check'],
+        result['compiled_us_per_check'],
+        result['linear_us_per_check'] / result['compiled_us_per_check']))
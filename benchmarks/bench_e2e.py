@@ -0,0 +1,271 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+'''End-to-end load test of acredapi and its model services
+
+Boots acredapi, claimencoder, claimneuralindex and worthinesschecker
+on tiny random models, with stand-ins for MisinfoMe, translation and
+the linked web pages (see `benchmarks.stack`), then replays a recorded
+mix of claim, tweet and article requests at a given concurrency.
+Reports throughput, latency percentiles per kind of request and the
+per-phase breakdown recorded by the `cimetrics` of acredapi.
+
+Run from the root of the repo, e.g.
+
+    python -m benchmarks.bench_e2e -concurrency 4 -requests 200 -out bench.json
+
+Pass `-baseline` with a previous report to fail (exit code 1) when the
+p95 latency regresses by more than `-maxRegression`.
+'''
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+default_mix = os.path.join(os.path.dirname(__file__), 'mixes', 'default.jsonl')
+
+review_routes = {
+    'claim': ('GET', '/api/v1/acred/reviewer/credibility/claim'),
+    'tweet': ('POST', '/api/v1/acred/reviewer/credibility/tweet'),
+    'article': ('POST', '/api/v1/acred/reviewer/credibility/webpage')
+}
+
+
+def read_mix(path, pages_url):
+    """Reads a request mix, one `{kind, weight, request}` json per line
+
+    :param path: path to a jsonl file
+    :param pages_url: base url of the stand-in web pages, replaces the
+      `{pages}` placeholder in requests
+    :returns: list of mix entries
+    :rtype: list of dict
+    """
+    mix = []
+    with open(path, 'r', encoding='utf-8') as in_f:
+        for line in in_f:
+            if not line.strip():
+                continue
+            entry = json.loads(line.replace('{pages}', pages_url))
+            assert entry['kind'] in review_routes, entry['kind']
+            mix.append({'weight': 1, **entry})
+    return mix
+
+
+def sample_requests(mix, n, seed=0, kinds=None):
+    """Samples `n` requests from the mix according to their weights"""
+    if kinds is not None:
+        mix = [e for e in mix if e['kind'] in kinds]
+    weights = np.array([e['weight'] for e in mix], dtype=np.float64)
+    idxs = np.random.RandomState(seed).choice(
+        len(mix), size=n, p=weights / weights.sum())
+    return [mix[i] for i in idxs]
+
+
+def send(session, acred_url, entry, timeout):
+    method, route = review_routes[entry['kind']]
+    req = entry['request']
+    start = time.perf_counter()
+    if entry['kind'] == 'claim':
+        resp = session.get(acred_url + route, timeout=timeout, params={
+            'claim': req['claim'], 'reviewFormat': 'schema.org'})
+    else:
+        resp = session.post(acred_url + route, timeout=timeout,
+                            json={'reviewFormat': 'schema.org', **req})
+    return {'kind': entry['kind'], 'ok': resp.ok,
+            'status': resp.status_code,
+            'ms': (time.perf_counter() - start) * 1000}
+
+
+def replay(acred_url, entries, concurrency, timeout=60):
+    """Sends the requests from `concurrency` client threads
+
+    :returns: tuple with the list of outcomes and the elapsed seconds
+    :rtype: tuple
+    """
+    local = threading.local()
+
+    def do_send(entry):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        try:
+            return send(local.session, acred_url, entry, timeout)
+        except Exception as e:
+            return {'kind': entry['kind'], 'ok': False, 'status': str(e),
+                    'ms': timeout * 1000}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(do_send, entries))
+    return outcomes, time.perf_counter() - start
+
+
+def latency_summary(latencies):
+    if len(latencies) == 0:
+        return {'n': 0}
+    arr = np.array(latencies)
+    return {
+        'n': len(latencies),
+        'mean_ms': float(arr.mean()),
+        **{'p%d_ms' % p: float(np.percentile(arr, p)) for p in [50, 90, 95, 99]},
+        'max_ms': float(arr.max())
+    }
+
+
+phase_line_re = re.compile(
+    r'^acred_phase_duration_ms_(sum|count)\{(.*)\} (\S+)$')
+
+
+def phase_totals(metrics_text):
+    """Reads the phase histograms from a `/metrics` response
+
+    :param metrics_text: metrics in the Prometheus text format, see
+      `esiutils.cimetrics.as_prometheus_text`
+    :returns: dict from phase to a dict with its `count` and `total_ms`
+    :rtype: dict
+    """
+    result = {}
+    for line in metrics_text.splitlines():
+        match = phase_line_re.match(line)
+        if match is None:
+            continue
+        stat, labels, value = match.groups()
+        phase = re.search(r'phase="((?:[^"\\]|\\.)*)"', labels).group(1)
+        key = 'count' if stat == 'count' else 'total_ms'
+        result.setdefault(phase, {'count': 0, 'total_ms': 0.0})[key] += float(value)
+    return result
+
+
+def read_phase_totals(acred_url):
+    resp = requests.get(acred_url + '/metrics', timeout=10)
+    resp.raise_for_status()
+    return phase_totals(resp.text)
+
+
+def phase_breakdown(before, after):
+    """Time spent per phase between two `phase_totals`"""
+    result = {}
+    for phase, totals in after.items():
+        prev = before.get(phase, {'count': 0, 'total_ms': 0.0})
+        count = int(totals['count'] - prev['count'])
+        if count <= 0:
+            continue
+        total_ms = totals['total_ms'] - prev['total_ms']
+        result[phase] = {'count': count, 'total_ms': total_ms,
+                         'mean_ms': total_ms / count}
+    return dict(sorted(result.items(), key=lambda kv: -kv[1]['total_ms']))
+
+
+def build_report(outcomes, elapsed_secs, concurrency, phases={}):
+    ok = [o for o in outcomes if o['ok']]
+    return {
+        'concurrency': concurrency,
+        'requests': len(outcomes),
+        'errors': len(outcomes) - len(ok),
+        'error_statuses': sorted(set(str(o['status']) for o in outcomes
+                                     if not o['ok'])),
+        'elapsed_secs': elapsed_secs,
+        'throughput_rps': len(outcomes) / elapsed_secs if elapsed_secs else 0,
+        'latency': latency_summary([o['ms'] for o in ok]),
+        'latency_by_kind': {
+            kind: latency_summary([o['ms'] for o in ok if o['kind'] == kind])
+            for kind in sorted(set(o['kind'] for o in outcomes))},
+        'phases': phases
+    }
+
+
+def regressions(report, baseline, max_regression):
+    """Lists the kinds of request whose p95 latency regressed"""
+    result = []
+    for kind, lat in report['latency_by_kind'].items():
+        base = baseline.get('latency_by_kind', {}).get(kind, {})
+        if 'p95_ms' in base and 'p95_ms' in lat and (
+                lat['p95_ms'] > base['p95_ms'] * (1 + max_regression)):
+            result.append('%s p95 %.1fms vs baseline %.1fms' % (
+                kind, lat['p95_ms'], base['p95_ms']))
+    return result
+
+
+def print_report(report):
+    print('%d requests (%d errors) in %.1fs: %.2f req/s at concurrency %d' % (
+        report['requests'], report['errors'], report['elapsed_secs'],
+        report['throughput_rps'], report['concurrency']))
+    for kind, lat in [('all', report['latency'])] + list(
+            report['latency_by_kind'].items()):
+        if lat['n'] == 0:
+            continue
+        print('  %-8s n=%-5d p50=%8.1fms p90=%8.1fms p95=%8.1fms p99=%8.1fms' % (
+            kind, lat['n'], lat['p50_ms'], lat['p90_ms'], lat['p95_ms'],
+            lat['p99_ms']))
+    print('Top phases by total time:')
+    for phase, ph in list(report['phases'].items())[:15]:
+        print('  %-40s count=%-6d total=%10.0fms mean=%8.2fms' % (
+            phase, ph['count'], ph['total_ms'], ph['mean_ms']))
+
+
+def run(mix_path=default_mix, n_requests=50, concurrency=4, warmup=5,
+        kinds=None, n_claims=200, seed=0, work_dir=None):
+    """Boots the stack and replays requests from a mix
+
+    :returns: the benchmark report
+    :rtype: dict
+    """
+    from benchmarks import stack as bench_stack
+    work_dir = work_dir or tempfile.mkdtemp(prefix='acred-bench-')
+    stack = bench_stack.start_stack(work_dir, n_claims=n_claims)
+    try:
+        mix = read_mix(mix_path, stack['urls']['external'])
+        acred_url = stack['urls']['acredapi']
+        replay(acred_url, sample_requests(mix, warmup, seed + 1, kinds), 1)
+        before = read_phase_totals(acred_url)
+        outcomes, elapsed = replay(
+            acred_url, sample_requests(mix, n_requests, seed, kinds),
+            concurrency)
+        phases = phase_breakdown(before, read_phase_totals(acred_url))
+        return build_report(outcomes, elapsed, concurrency, phases)
+    finally:
+        bench_stack.stop_stack(stack)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Load test acredapi and its model services on tiny models',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-mix', default=default_mix,
+                        help='Path to a jsonl file with the request mix')
+    parser.add_argument('-requests', type=int, default=50,
+                        help='Number of requests to replay')
+    parser.add_argument('-concurrency', type=int, default=4,
+                        help='Number of concurrent clients')
+    parser.add_argument('-warmup', type=int, default=5,
+                        help='Requests sent before measuring')
+    parser.add_argument('-kinds', nargs='*', default=None,
+                        help='Only replay these kinds of request, e.g. claim')
+    parser.add_argument('-claims', type=int, default=200,
+                        help='Number of claims in each generated collection')
+    parser.add_argument('-seed', type=int, default=0)
+    parser.add_argument('-out', help='Path of the json report')
+    parser.add_argument('-baseline', help='Path of a previous json report')
+    parser.add_argument('-maxRegression', type=float, default=0.25,
+                        help='Tolerated relative increase of p95 latencies')
+    args = parser.parse_args()
+
+    report = run(args.mix, args.requests, args.concurrency, args.warmup,
+                 args.kinds, args.claims, args.seed)
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as out_f:
+            json.dump(report, out_f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as in_f:
+            regressed = regressions(report, json.load(in_f), args.maxRegression)
+        for msg in regressed:
+            print('REGRESSION %s' % msg)
+        if regressed:
+            sys.exit(1)
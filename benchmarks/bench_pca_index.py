@@ -0,0 +1,138 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+'''Benchmark of the PCA-reduced claim index against exact search
+
+Reports, for each number of reduced dims, the recall at top-n of the
+reduced index with full-dimension re-ranking (`esiutils.pcaindex`)
+with respect to exact search over all dims, and the speedup per query.
+
+Queries are searched in batches of `-batch` vectors, as claim search
+requests usually only have a few query sentences. By default, a
+synthetic corpus is used whose variance decays as a power law over the
+dims, as for sentence embeddings. Pass the claim embeddings tsv to
+benchmark on the real index, e.g.
+
+    python -m benchmarks.bench_pca_index \\
+      -embeddings ../../../models/coinform/claim-embeddings/claim_embs.tsv
+'''
+import argparse
+import time
+import numpy as np
+from esiutils import pcaindex
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def synthetic_vectors(n, dim=768, decay=1.0, seed=42):
+    """Vectors whose variance per (rotated) dim decays as a power law"""
+    rng = np.random.RandomState(seed)
+    scales = 1.0 / np.arange(1, dim + 1) ** (decay / 2)
+    rotation, _ = np.linalg.qr(rng.randn(dim, dim))
+    offset = 3 * scales[0] * rng.randn(dim) / np.sqrt(dim)
+    vecs = (rng.randn(n, dim) * scales) @ rotation.T + offset
+    return normalize(vecs).astype(np.float32)
+
+
+def read_tsv_vectors(path, sep='\t'):
+    with open(path, 'r', encoding='utf-8') as in_f:
+        vectors = [np.array(line.split(sep)[1:], dtype=np.float32)
+                   for line in in_f]
+    return normalize(np.vstack(vectors)).astype(np.float32)
+
+
+def sample_queries(vectors, n_queries, seed=42):
+    """Perturbed corpus vectors, as claims are usually paraphrased"""
+    rng = np.random.RandomState(seed)
+    idxs = rng.choice(vectors.shape[0], n_queries, replace=False)
+    noise = rng.randn(n_queries, vectors.shape[1]).astype(np.float32)
+    return normalize(vectors[idxs] + 0.5 * normalize(noise)).astype(np.float32)
+
+
+def exact_search(vectors, qvecs, topn):
+    sims = qvecs @ vectors.T
+    top = np.argpartition(-sims, topn - 1, axis=1)[:, :topn]
+    order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def ms_per_query(search_fn, qvecs, batch_size, repeat):
+    """Average latency per query and the concatenated search results"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        result = np.vstack([search_fn(qvecs[b:b + batch_size])
+                            for b in range(0, qvecs.shape[0], batch_size)])
+    return (time.perf_counter() - start) * 1000 / (
+        repeat * qvecs.shape[0]), result
+
+
+def recall(expected_ids, found_ids):
+    hits = [len(set(e) & set(f)) for e, f in zip(expected_ids, found_ids)]
+    return sum(hits) / float(expected_ids.size)
+
+
+def run(vectors=None, dims=(128, 192, 256), n_queries=100, topn=5,
+        n_candidates=100, batch_size=1, repeat=3):
+    if vectors is None:
+        vectors = synthetic_vectors(20000)
+    qvecs = sample_queries(vectors, n_queries)
+    full_ms, expected = ms_per_query(
+        lambda qs: exact_search(vectors, qs, topn), qvecs, batch_size, repeat)
+    results = []
+    for n_dims in dims:
+        start = time.perf_counter()
+        pca_index = pcaindex.build(vectors, n_dims)
+        build_s = time.perf_counter() - start
+        pca_ms, found = ms_per_query(
+            lambda qs: pcaindex.search(pca_index, vectors, qs, topn,
+                                       n_candidates)[1],
+            qvecs, batch_size, repeat)
+        results.append({
+            'dims': n_dims,
+            'explained_variance_ratio': pca_index['explained_variance_ratio'],
+            'build_s': build_s,
+            'recall': recall(expected, found),
+            'ms_per_query': pca_ms,
+            'speedup': full_ms / pca_ms
+        })
+    return {
+        'n_vectors': vectors.shape[0],
+        'dim': vectors.shape[1],
+        'topn': topn,
+        'batch_size': batch_size,
+        'full_ms_per_query': full_ms,
+        'reduced': results
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the PCA-reduced claim index',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-embeddings', default=None,
+                        help='Path to a tsv with a label and a vector per line, '
+                        'by default a synthetic corpus is used')
+    parser.add_argument('-dims', type=int, nargs='+', default=[128, 192, 256],
+                        help='Numbers of reduced dims to benchmark')
+    parser.add_argument('-queries', type=int, default=100,
+                        help='Number of query vectors')
+    parser.add_argument('-topn', type=int, default=5,
+                        help='Number of results per query')
+    parser.add_argument('-candidates', type=int, default=100,
+                        help='Candidates re-ranked with the full vectors')
+    parser.add_argument('-batch', type=int, default=1,
+                        help='Number of query vectors searched at once')
+    args = parser.parse_args()
+
+    vectors = read_tsv_vectors(args.embeddings) if args.embeddings else None
+    result = run(vectors, args.dims, args.queries, args.topn, args.candidates,
+                 args.batch)
+    print('%d vectors of %d dims, exact search %.2fms/query' % (
+        result['n_vectors'], result['dim'], result['full_ms_per_query']))
+    for r in result['reduced']:
+        print(('%(dims)4d dims (%(explained_variance_ratio).2f var): ' % r) +
+              ('recall@%d %.3f, %.2fms/query (%.1fx), built in %.1fs' % (
+                  result['topn'], r['recall'], r['ms_per_query'],
+                  r['speedup'], r['build_s'])))
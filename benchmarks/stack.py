@@ -0,0 +1,330 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Boots the acred services locally for benchmarking
+
+The claimencoder, claimneuralindex (which also hosts the stance
+predictor), worthinesschecker and acredapi are started with
+`runsrv.py`, i.e. the same code as in production, but on the tiny
+random models of `benchmarks.tinymodels` and the generated claim
+database and domain credibility snapshot of `benchmarks.standins`. The
+translation service and the linked web pages are served by stand-ins
+in this process.
+
+The three model services can also be started as a single
+`modelserver`, see `start_modelserver`.
+
+Each service runs in its own process, configured by an `acred.ini`
+generated in the work folder and passed via its `ACRED_*config_file`
+environment variable. So the environment of the calling process is
+not modified and `start_stack` can be called more than once. Service
+logs are written to the work folder.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import subprocess
+import configparser
+from urllib.parse import urlparse
+import requests
+from benchmarks import standins, tinymodels
+
+logger = logging.getLogger(__name__)
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# env var with the config file read by each service
+config_envs = {
+    'claimencoder': 'ACRED_claimencoder_config_file',
+    'claimneuralindex': 'ACRED_claimneuralindex_config_file',
+    'worthinesschecker': 'ACRED_worthinesschecker_config_file',
+    'acredapi': 'ACRED_config_file'
+}
+
+acredapi_name = 'test'
+
+# services hosted by `runsrv.py -service modelserver`
+modelserver_services = ['claimencoder', 'claimneuralindex', 'worthinesschecker']
+
+
+def free_port(host='127.0.0.1'):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def service_url(service, port, host='127.0.0.1'):
+    app_name = acredapi_name if service == 'acredapi' else service
+    return 'http://%s:%d/%s' % (host, port, app_name)
+
+
+def write_acred_ini(path, work_dir, ports, urls, db_paths, model_dirs,
+                    snapshot_path,
+                    base_ini=os.path.join(repo_dir, 'acred.ini')):
+    """Writes the `acred.ini` shared by the benchmarked services
+
+    :param path: path of the config file to write
+    :param work_dir: folder for logs, evaluation records and other
+      files written by the services
+    :param ports: dict from service name to its port
+    :param urls: dict from service name to its base url, also including
+      the `external` stand-ins
+    :param db_paths: claim database paths, see `standins.generate_claim_db`
+    :param model_dirs: folders of the tiny models, see `tinymodels.save_all`
+    :param snapshot_path: path of the domain credibility snapshot
+    :param base_ini: config with the defaults for all other options
+    :returns: `path`
+    """
+    config = configparser.ConfigParser()
+    config.read(base_ini)
+    eval_cache_dir = os.path.join(work_dir, 'evalcache')
+    # the startup self-evaluations find no data and are skipped or fail
+    missing_data = os.path.join(work_dir, 'no-eval-data')
+    for service in config_envs.keys():
+        config[service].update({
+            'port': str(ports[service]),
+            'logfile': os.path.join(work_dir, '%s.log' % service),
+            'metrics': 'true',
+            'preload': 'false'})
+    config['acredapi'].update({
+        'app_name': acredapi_name,
+        'debug': '0',
+        'https': '0',
+        'sentences_extracted_db_csv': db_paths['fromPrecrawled'],
+        'sentences_from_ClaimReviews_db_csv': db_paths['fromClaimReviews'],
+        'claimReview_db_jsonl': db_paths['claimReviews'],
+        'neuralindex_url': urls['claimneuralindex'],
+        'stance_pred_url': urls['claimneuralindex']})
+    config['acred'].update({
+        'acred_pred_claim_search_url': urls['acredapi'] + '/api/v1/claim/internal-search',
+        'relsents_search_url': urls['acredapi'] + '/api/v1/search',
+        'translation_service_url': urls['external'] + '/translate',
+        'worthinesschecker_url': urls['worthinesschecker'],
+        'domcred_backend': 'snapshot',
+        'domcred_snapshot_path': snapshot_path,
+        'domcred_snapshot_fallback': 'false'})
+    for key in ['docstore_path', 'domcred_cache_path', 'dbsent_store_path']:
+        config['acred'].pop(key, None)
+    config['claimencoder'].update({
+        'semantic_encoder_dir': model_dirs['encoder'],
+        'inference_backend': 'torch',
+        'stsb_dev_path': missing_data,
+        'eval_cache_dir': eval_cache_dir})
+    config['claimneuralindex'].update({
+        'claim_embeddings_path': os.path.join(work_dir, 'claim_embs.tsv'),
+        'semencoder_url': urls['claimencoder'],
+        'pca_dims': '0',
+        'index_format': 'numpy'})
+    config['claimneuralindex'].pop('claim_embeddings_mmap_dir', None)
+    config['stance'].update({
+        'fnc1_model_path': model_dirs['stance'],
+        'inference_backend': 'torch',
+        'fnc_test_bodies_path': missing_data,
+        'fnc_test_stances_path': missing_data,
+        'cascade': 'false',
+        'eval_cache_dir': eval_cache_dir})
+    config['worthinesschecker'].update({
+        'check_worthiness_model_path': model_dirs['worthiness'],
+        'inference_backend': 'torch',
+        'clef19_test_worth_path': missing_data,
+        'eval_cache_dir': eval_cache_dir})
+    with open(path, 'w', encoding='utf-8') as out_f:
+        config.write(out_f)
+    return path
+
+
+def launch(service, ini_path, work_dir):
+    """Starts `runsrv.py -service <service>` in a new process
+
+    :returns: the `subprocess.Popen` of the service
+    """
+    services = modelserver_services if service == 'modelserver' else [service]
+    env = {**os.environ, **{config_envs[s]: ini_path for s in services}}
+    with open(os.path.join(work_dir, '%s.out' % service), 'wb') as out_f:
+        return subprocess.Popen(
+            [sys.executable, 'runsrv.py', '-service', service],
+            cwd=repo_dir, env=env, stdout=out_f, stderr=subprocess.STDOUT)
+
+
+def wait_ready(service, proc, url, work_dir, timeout=300):
+    """Waits until `url/health/ready` answers 200
+
+    :raises RuntimeError: if the service exits or is not ready in time
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            with open(os.path.join(work_dir, '%s.out' % service),
+                      encoding='utf-8', errors='replace') as in_f:
+                tail = in_f.read()[-2000:]
+            raise RuntimeError('%s exited with code %s:\n%s' % (
+                service, proc.returncode, tail))
+        try:
+            if requests.get(url + '/health/ready', timeout=5).status_code == 200:
+                logger.info('%s is ready at %s' % (service, url))
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('%s not ready after %ss, see logs in %s' % (
+        service, timeout, work_dir))
+
+
+def write_claim_embeddings(path, encoder_url, db, batch_size=64):
+    """Encodes the claim database with the encoder service into a tsv"""
+    session = requests.Session()
+    with open(path, 'w', encoding='utf-8') as out_f:
+        for b in range(0, len(db['sentences']), batch_size):
+            resp = session.post(encoder_url + '/encode_sents', json={
+                'sentences': db['sentences'][b:b + batch_size]})
+            resp.raise_for_status()
+            for claim_id, vec in zip(db['ids'][b:b + batch_size],
+                                     resp.json()['semantic_encodings']):
+                out_f.write('\t'.join([claim_id] + [str(v) for v in vec]) + '\n')
+    return path
+
+
+def write_random_claim_embeddings(path, db, dim, seed=42):
+    """Writes random claim embeddings, for when no encoder service is up"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as out_f:
+        for claim_id in db['ids']:
+            vec = [rng.uniform(-1, 1) for i in range(dim)]
+            out_f.write('\t'.join([claim_id] + [str(v) for v in vec]) + '\n')
+    return path
+
+
+def write_cheap_stance_model(path, dim):
+    """Writes an untrained `cheapstance` model for encodings of `dim`
+
+    All its predictions have a low confidence, so the stance cascade
+    escalates every pair after encoding it.
+    """
+    stances = list(tinymodels.stance2i.keys())
+    n_features = 4 * dim + 1
+    with open(path, 'w', encoding='utf-8') as out_f:
+        json.dump({'@type': 'CheapStanceModel', 'stances': stances,
+                   'n_features': n_features,
+                   'coef': [[0.0] * n_features for s in stances],
+                   'intercept': [0.0] * len(stances)}, out_f)
+    return path
+
+
+def start_modelserver(work_dir, n_claims=20, cascade=True, timeout=300):
+    """Boots the model services as a single `modelserver`
+
+    The `semencoder_url` points at the modelserver itself, as in
+    production, so requests to the encoder only succeed once the
+    modelserver calls it in-process.
+
+    :param work_dir: folder for the generated models, data, config and logs
+    :param n_claims: number of claims in each generated collection
+    :param cascade: whether to enable the stance cascade
+    :param timeout: seconds to wait for the modelserver to be ready
+    :returns: dict with the base `urls` of the hosted services and the
+      modelserver in `procs`, see `start_stack`
+    :rtype: dict
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    db = standins.generate_claim_db(os.path.join(work_dir, 'db'), n_claims)
+    port = free_port()
+    ports = {service: port for service in config_envs.keys()}
+    urls = {service: service_url(service, port)
+            for service in config_envs.keys()}
+    urls['external'] = 'http://127.0.0.1:%d' % free_port()
+    ini_path = write_acred_ini(
+        os.path.join(work_dir, 'acred.ini'), work_dir, ports, urls, db,
+        tinymodels.save_all(os.path.join(work_dir, 'models')),
+        os.path.join(work_dir, 'domcred-snapshot.jsonl'))
+    config = configparser.ConfigParser()
+    config.read(ini_path)
+    config['modelserver'].update({'port': str(port), 'metrics': 'true'})
+    write_random_claim_embeddings(
+        config['claimneuralindex']['claim_embeddings_path'], db,
+        tinymodels.hidden_size)
+    if cascade:
+        config['stance'].update({
+            'cascade': 'true',
+            'cascade_model_path': write_cheap_stance_model(
+                os.path.join(work_dir, 'cheap-stance.json'),
+                tinymodels.hidden_size)})
+    with open(ini_path, 'w', encoding='utf-8') as out_f:
+        config.write(out_f)
+
+    stack = {'urls': urls, 'procs': {}, 'db': db, 'work_dir': work_dir,
+             'servers': {}}
+    stack['procs']['modelserver'] = launch('modelserver', ini_path, work_dir)
+    try:
+        wait_ready('modelserver', stack['procs']['modelserver'],
+                   urls['claimencoder'], work_dir, timeout)
+    except Exception:
+        stop_stack(stack)
+        raise
+    return stack
+
+
+def start_stack(work_dir, n_claims=200, timeout=300):
+    """Boots acredapi, its model services and the stand-ins
+
+    :param work_dir: folder for the generated models, data, config and logs
+    :param n_claims: number of claims in each generated collection
+    :param timeout: seconds to wait for each service to be ready
+    :returns: dict with the base `urls` of the services, their `procs`,
+      the stand-in `servers` and the `db` paths, see
+      `standins.generate_claim_db`
+    :rtype: dict
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    db = standins.generate_claim_db(os.path.join(work_dir, 'db'), n_claims)
+    external_url, external_server = standins.serve(
+        standins.external_app(db['sentences']))
+    ports = {service: free_port() for service in config_envs.keys()}
+    urls = {service: service_url(service, port)
+            for service, port in ports.items()}
+    urls['external'] = external_url
+    snapshot_path = standins.write_domcred_snapshot(
+        os.path.join(work_dir, 'domcred-snapshot.jsonl'),
+        standins.fact_checkers + standins.publishers +
+        ['twitter.com', urlparse(external_url).netloc])
+    ini_path = write_acred_ini(
+        os.path.join(work_dir, 'acred.ini'), work_dir, ports, urls, db,
+        tinymodels.save_all(os.path.join(work_dir, 'models')), snapshot_path)
+
+    stack = {'urls': urls, 'procs': {}, 'db': db, 'work_dir': work_dir,
+             'servers': {'external': external_server}}
+
+    def boot(services):
+        for service in services:
+            stack['procs'][service] = launch(service, ini_path, work_dir)
+        for service in services:
+            wait_ready(service, stack['procs'][service], urls[service],
+                       work_dir, timeout)
+
+    try:
+        boot(['claimencoder'])
+        # the neural index searches claim embeddings of the tiny encoder
+        write_claim_embeddings(
+            os.path.join(work_dir, 'claim_embs.tsv'), urls['claimencoder'], db)
+        boot(['claimneuralindex', 'worthinesschecker'])
+        boot(['acredapi'])
+    except Exception:
+        stop_stack(stack)
+        raise
+    return stack
+
+
+def stop_stack(stack, timeout=10):
+    for proc in stack['procs'].values():
+        proc.terminate()
+    for proc in stack['procs'].values():
+        try:
+            proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    for server in stack['servers'].values():
+        server.shutdown()
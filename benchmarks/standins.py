@@ -0,0 +1,167 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Local stand-ins for the external services and data acredapi uses
+
+ - a small claim database, generated in the formats read by acredapi
+ - a snapshot of domain credibility, read instead of calling MisinfoMe
+   (see `acred.reviewer.credibility.domcred_snapshot`)
+ - the translation service and the web pages linked from tweets and
+   articles, served from this process
+
+The acred services themselves are booted by `benchmarks.stack`.
+"""
+import os
+import csv
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+from werkzeug.serving import make_server
+from flask import Flask, jsonify, request
+from acred.reviewer.credibility import domcred_snapshot
+
+logger = logging.getLogger(__name__)
+
+topics = [
+    ('vaccines', ['vaccine', 'vaccines', 'autism', 'measles', 'children']),
+    ('climate', ['climate', 'temperature', 'ice', 'warming', 'emissions']),
+    ('elections', ['election', 'votes', 'ballots', 'fraud', 'president']),
+    ('economy', ['taxes', 'unemployment', 'billion', 'budget', 'inflation']),
+    ('health', ['virus', 'hospital', 'masks', 'cure', 'patients'])
+]
+
+fact_checkers = ['snopes.com', 'politifact.com', 'fullfact.org',
+                 'africacheck.org', 'factcheck.org']
+publishers = ['bbc.co.uk', 'nytimes.com', 'example-news.com',
+              'dailyclicks.net', 'truthnews.info']
+ratings = [('True', 5), ('Mostly True', 4), ('Half True', 3),
+           ('Mostly False', 2), ('False', 1)]
+
+
+def str_seed(s):
+    return int(hashlib.md5(s.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def domain_credibility(domain):
+    """Deterministic MisinfoMe-like credibility for a domain"""
+    return {
+        'itemReviewed': domain,
+        'credibility': {'value': str_seed(domain) / 0xffffffff * 2 - 1,
+                        'confidence': 0.8},
+        'assessments': []}
+
+
+def write_domcred_snapshot(path, domains):
+    """Writes a domain credibility snapshot for `domains`
+
+    :param path: path of the `.jsonl` snapshot
+    :param domains: list of domain names
+    :returns: `path`
+    """
+    domcred_snapshot.write_snapshot(
+        path, {domain: domain_credibility(domain) for domain in domains})
+    return path
+
+
+def generate_claim_db(out_dir, n_claims=200, seed=42):
+    """Generates a small claim database in the formats read by acredapi
+
+    :param out_dir: folder where the csv and jsonl files are written
+    :param n_claims: number of claims per collection
+    :param seed: seed for the random generator
+    :returns: dict with the paths to the `claimReviews`, `fromClaimReviews`
+      and `fromPrecrawled` files and the list of `sentences`
+    :rtype: dict
+    """
+    rnd = np.random.RandomState(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    crs, rows = [], {'fromClaimReviews': [], 'fromPrecrawled': []}
+    for coll, rows_c in rows.items():
+        for i in range(n_claims):
+            topic, words = topics[i % len(topics)]
+            picked = [words[j] for j in rnd.choice(len(words), 3, replace=False)]
+            sent = 'Report %d says %s %s are linked to %s in %d cases' % (
+                i, picked[0], picked[1], picked[2], rnd.randint(10, 1000))
+            if coll == 'fromClaimReviews':
+                domain = fact_checkers[i % len(fact_checkers)]
+                cr_url = 'https://%s/fact-check/%s-%d' % (domain, topic, i)
+                alt_name, val = ratings[i % len(ratings)]
+                crs.append({
+                    '@context': 'http://schema.org',
+                    '@type': 'ClaimReview',
+                    'url': cr_url,
+                    'claimReviewed': sent,
+                    'author': {'@type': 'Organization',
+                               'url': 'https://%s' % domain},
+                    'datePublished': '2020-0%d-1%d' % (1 + i % 9, i % 10),
+                    'reviewRating': {'@type': 'Rating',
+                                     'ratingValue': val,
+                                     'bestRating': 5, 'worstRating': 1,
+                                     'alternateName': alt_name}})
+            else:
+                domain = publishers[i % len(publishers)]
+                cr_url = ''
+            rows_c.append({
+                'id': '%s-%d' % (coll, i),
+                'content_t': sent,
+                'urls_ss': 'https://%s/article/%s-%d' % (domain, topic, i),
+                'domains_ss': domain,
+                'lang_s': 'en',
+                'schema_org_cr_url': cr_url})
+    paths = {'claimReviews': os.path.join(out_dir, 'claimReviews.jsonl')}
+    with open(paths['claimReviews'], 'w', encoding='utf-8') as out_f:
+        for cr in crs:
+            out_f.write(json.dumps(cr) + '\n')
+    for coll, rows_c in rows.items():
+        paths[coll] = os.path.join(out_dir, '%s.csv' % coll)
+        with open(paths[coll], 'w', encoding='utf-8', newline='') as out_f:
+            writer = csv.DictWriter(out_f, fieldnames=list(rows_c[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows_c)
+    paths['sentences'] = [r['content_t'] for rows_c in rows.values()
+                          for r in rows_c]
+    paths['ids'] = [r['id'] for rows_c in rows.values() for r in rows_c]
+    return paths
+
+
+def external_app(sentences):
+    """Stand-in for the translation service and web pages
+
+    Pages are served at `/pages/<n>.html`, each with a title and a few
+    of the claim `sentences` so that articles match the claim database.
+    """
+    app = Flask('standin_external')
+
+    @app.route('/translate', methods=['POST'])
+    def translate():
+        inputs = request.get_json()['inputs']
+        return jsonify({'outputs': [{'output': s} for s in inputs]})
+
+    @app.route('/pages/<int:n>.html', methods=['GET'])
+    def page(n):
+        sents = [sentences[(n * 7 + i) % len(sentences)] for i in range(5)]
+        paras = ''.join('<p>%s. It was widely shared online.</p>' % s
+                        for s in sents)
+        return ('<html><head><title>Story %d</title>'
+                '<meta property="og:title" content="Story %d"></head>'
+                '<body><article><h1>Story %d</h1>%s</article></body></html>' % (
+                    n, n, n, paras))
+
+    return app
+
+
+def serve(app, host='127.0.0.1'):
+    """Serves a flask app from a daemon thread on a free port
+
+    :param app: the flask app
+    :param host: interface to bind
+    :returns: tuple with the base url and the server, which can be
+      stopped via `shutdown`
+    :rtype: tuple
+    """
+    server = make_server(host, 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name='serve-%s' % app.name).start()
+    return 'http://%s:%d' % (host, server.server_port), server
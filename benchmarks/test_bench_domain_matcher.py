@@ -0,0 +1,12 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Smoke test of the domain matcher microbenchmark
+"""
+from benchmarks import bench_domain_matcher
+
+
+def test_run():
+    result = bench_domain_matcher.run(repeat=1)
+    assert result['known_urls'] > 100
+    assert result['compiled_us_per_check'] > 0
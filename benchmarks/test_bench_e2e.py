@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests of the end-to-end benchmark and its stand-ins
+"""
+import os
+import json
+import configparser
+import pytest
+from esiutils import cimetrics
+from acred.reviewer.credibility import domcred_snapshot
+from benchmarks import bench_e2e, standins, stack
+
+
+def test_read_mix():
+    mix = bench_e2e.read_mix(bench_e2e.default_mix, 'http://pages')
+    assert set(e['kind'] for e in mix) == {'claim', 'tweet', 'article'}
+    assert all('{pages}' not in str(e) for e in mix)
+    entries = bench_e2e.sample_requests(mix, 10, kinds=['claim'])
+    assert len(entries) == 10
+    assert all(e['kind'] == 'claim' for e in entries)
+
+
+def test_phase_breakdown():
+    cimetrics.reset()
+    cimetrics.enable('testsrv')
+    try:
+        cimetrics.observe_phase('search', 10)
+        before = bench_e2e.phase_totals(cimetrics.as_prometheus_text())
+        cimetrics.observe_phase('search', 4)
+        cimetrics.observe_phase('search', 2)
+        cimetrics.observe_phase('stance', 1)
+        after = bench_e2e.phase_totals(cimetrics.as_prometheus_text())
+    finally:
+        cimetrics.disable()
+        cimetrics.reset()
+    assert before == {'search': {'count': 1, 'total_ms': 10.0}}
+    assert bench_e2e.phase_breakdown(before, after) == {
+        'search': {'count': 2, 'total_ms': 6.0, 'mean_ms': 3.0},
+        'stance': {'count': 1, 'total_ms': 1.0, 'mean_ms': 1.0}}
+
+
+def test_standins(tmp_path):
+    db = standins.generate_claim_db(str(tmp_path / 'db'), n_claims=10)
+    assert len(db['sentences']) == len(db['ids']) == 20
+    path = standins.write_domcred_snapshot(
+        str(tmp_path / 'snapshot.jsonl'), ['bbc.co.uk', '127.0.0.1:8000'])
+    cfg = {'domcred_snapshot_path': path}
+    assert domcred_snapshot.lookup('bbc.co.uk', cfg) == \
+        standins.domain_credibility('bbc.co.uk')
+    assert domcred_snapshot.lookup('127.0.0.1:8000', cfg) is not None
+    client = standins.external_app(db['sentences']).test_client()
+    page = client.get('/pages/3.html').get_data(as_text=True)
+    assert db['sentences'][21 % 20] in page
+    resp = client.post('/translate', json={'inputs': ['a', 'b']})
+    assert resp.get_json() == {'outputs': [{'output': 'a'}, {'output': 'b'}]}
+
+
+def test_write_acred_ini(tmp_path):
+    ports = {service: 9000 + i for i, service in enumerate(stack.config_envs)}
+    urls = {service: stack.service_url(service, port)
+            for service, port in ports.items()}
+    urls['external'] = 'http://127.0.0.1:9100'
+    db = standins.generate_claim_db(str(tmp_path / 'db'), n_claims=2)
+    models = {'encoder': 'enc', 'stance': 'stance', 'worthiness': 'worth'}
+    path = stack.write_acred_ini(
+        str(tmp_path / 'acred.ini'), str(tmp_path), ports, urls, db, models,
+        'snapshot.jsonl')
+    config = configparser.ConfigParser()
+    config.read(path)
+    assert config['claimneuralindex']['port'] == str(ports['claimneuralindex'])
+    assert config['claimneuralindex']['semencoder_url'] == urls['claimencoder']
+    assert config['acredapi']['neuralindex_url'] == urls['claimneuralindex']
+    assert config['acred']['relsents_search_url'].startswith(urls['acredapi'])
+    assert config['acred']['domcred_backend'] == 'snapshot'
+    assert config['stance']['fnc1_model_path'] == 'stance'
+    # logs are kept out of the repo
+    for service in stack.config_envs:
+        assert config[service]['logfile'].startswith(str(tmp_path))
+
+
+def test_tinymodels(tmp_path):
+    pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+    from benchmarks import tinymodels
+    dirs = tinymodels.save_all(str(tmp_path))
+    tokenizer = transformers.RobertaTokenizer.from_pretrained(dirs['stance'])
+    assert len(tokenizer.encode('Vaccines cause autism')) > 0
+    model = transformers.RobertaForSequenceClassification.from_pretrained(
+        dirs['worthiness'])
+    assert model.config.num_labels == 2
+    with open(os.path.join(dirs['encoder'], 'sem_encoder.json')) as in_f:
+        assert json.load(in_f)['seq_len'] == tinymodels.seq_len
+
+
+def test_e2e_benchmark(tmp_path):
+    # boots the real services, so it needs the full model dependencies
+    pytest.importorskip('torch')
+    pytest.importorskip('transformers')
+    env_before = dict(os.environ)
+    # with this seed, claims, tweets and articles are all replayed
+    report = bench_e2e.run(n_requests=9, concurrency=3, warmup=3,
+                           n_claims=20, seed=3, work_dir=str(tmp_path))
+    assert dict(os.environ) == env_before
+    assert report['requests'] == 9
+    assert report['errors'] == 0, report['error_statuses']
+    assert report['latency']['p50_ms'] <= report['latency']['p99_ms']
+    assert set(report['latency_by_kind'].keys()) == {
+        'claim', 'tweet', 'article'}
+    assert 'search_claim_bots' in report['phases']
+    assert bench_e2e.regressions(report, report, 0.1) == []
@@ -0,0 +1,14 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Smoke test of the PCA-reduced index benchmark
+"""
+from benchmarks import bench_pca_index
+
+
+def test_run():
+    vectors = bench_pca_index.synthetic_vectors(2000, dim=64)
+    result = bench_pca_index.run(vectors, dims=(16,), n_queries=10, repeat=1)
+    assert result['dim'] == 64
+    assert result['reduced'][0]['recall'] > 0.8
+    assert result['reduced'][0]['ms_per_query'] > 0
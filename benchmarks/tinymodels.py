@@ -0,0 +1,147 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tiny randomly initialised RoBERTa models for benchmarking
+
+Writes a semantic encoder, a FNC-1 stance classifier and a
+check-worthiness classifier in the same folder layout as the real
+saved models, so the claimencoder, claimneuralindex and
+worthinesschecker services load them with their usual code. The models
+have a couple of narrow layers and a byte-level vocabulary without BPE
+merges, so they are created and loaded in seconds on a laptop. Their
+predictions are meaningless, but each request runs the same
+tokenisation, forward passes and post-processing as in production.
+
+Requires torch and transformers.
+"""
+import os
+import json
+
+seq_len = 32
+hidden_size = 32
+
+special_tokens = ['<s>', '<pad>', '</s>', '<unk>']
+
+stance2i = {'agree': 0, 'disagree': 1, 'discuss': 2, 'unrelated': 3}
+worth2i = {'NCS': 0, 'CFS': 1}
+
+
+def bytes_to_unicode():
+    """Printable unicode chars for each byte, as in the GPT-2 tokenizer"""
+    bs = (list(range(ord('!'), ord('~') + 1)) +
+          list(range(ord('¡'), ord('¬') + 1)) +
+          list(range(ord('®'), ord('ÿ') + 1)))
+    cs = bs[:]
+    n = 0
+    for b in range(2**8):
+        if b not in bs:
+            bs.append(b)
+            cs.append(2**8 + n)
+            n += 1
+    return dict(zip(bs, [chr(c) for c in cs]))
+
+
+def write_json(path, value):
+    with open(path, 'w', encoding='utf-8') as out_f:
+        json.dump(value, out_f, indent=2)
+
+
+def write_tokenizer(out_dir):
+    """Writes the files of a byte-level RoBERTa tokenizer without merges
+
+    :returns: the size of the vocabulary
+    :rtype: int
+    """
+    tokens = special_tokens + sorted(set(bytes_to_unicode().values())) + ['<mask>']
+    write_json(os.path.join(out_dir, 'vocab.json'),
+               {tok: i for i, tok in enumerate(tokens)})
+    with open(os.path.join(out_dir, 'merges.txt'), 'w', encoding='utf-8') as out_f:
+        out_f.write('#version: 0.2\n')
+    return len(tokens)
+
+
+def tiny_config(vocab_size, num_labels=2):
+    from transformers import RobertaConfig
+    config = RobertaConfig()
+    # set as attributes, the constructor args differ between versions
+    config.vocab_size = vocab_size
+    config.hidden_size = hidden_size
+    config.num_hidden_layers = 2
+    config.num_attention_heads = 2
+    config.intermediate_size = 64
+    # roberta positions start after the padding index
+    config.max_position_embeddings = seq_len + 8
+    config.type_vocab_size = 1
+    config.num_labels = num_labels
+    return config
+
+
+def save_model(model, out_dir):
+    """Saves the config and the weights as `pytorch_model.bin`"""
+    import torch
+    model.config.save_pretrained(out_dir)
+    torch.save(model.state_dict(), os.path.join(out_dir, 'pytorch_model.bin'))
+
+
+def save_encoder(out_dir, seed=42):
+    """Saves a tiny semantic encoder, see `claim_encoder.load_finetuned_semencoder`"""
+    import torch
+    from transformers import RobertaModel
+    os.makedirs(out_dir, exist_ok=True)
+    torch.manual_seed(seed)
+    save_model(RobertaModel(tiny_config(write_tokenizer(out_dir))), out_dir)
+    write_json(os.path.join(out_dir, 'sem_encoder.json'), {
+        'class': 'RoBERTa_Finetuned_Encoder',
+        'pooling_strategy': 'pooled',
+        'seq_len': seq_len,
+        'powerfun_min_val': 0.8,
+        'powerfun_k': 20.0})
+    return out_dir
+
+
+def save_classifier(out_dir, label2i, meta_fname, label_key, favoured=None,
+                    seed=42):
+    """Saves a tiny sequence classifier with its metadata json
+
+    :param out_dir: folder of the saved model
+    :param label2i: dict from labels to their index in the logits
+    :param meta_fname: name of the metadata file, e.g. `fnc1-classifier.json`
+    :param label_key: key of `label2i` in the metadata
+    :param favoured: optional label which the classifier predicts most
+      of the time
+    :returns: `out_dir`
+    """
+    import torch
+    from transformers import RobertaForSequenceClassification
+    os.makedirs(out_dir, exist_ok=True)
+    torch.manual_seed(seed)
+    model = RobertaForSequenceClassification(
+        tiny_config(write_tokenizer(out_dir), num_labels=len(label2i)))
+    if favoured is not None:
+        with torch.no_grad():
+            model.classifier.out_proj.bias[label2i[favoured]] += 2.0
+    save_model(model, out_dir)
+    write_json(os.path.join(out_dir, meta_fname), {
+        label_key: label2i,
+        'seq_len': seq_len})
+    return out_dir
+
+
+def save_all(out_dir):
+    """Saves the tiny models needed by the acred model services
+
+    :param out_dir: folder where a sub folder is created for each model
+    :returns: dict with the folders of the `encoder`, `stance` and
+      `worthiness` models
+    :rtype: dict
+    """
+    return {
+        'encoder': save_encoder(os.path.join(out_dir, 'semantic_encoder')),
+        'stance': save_classifier(
+            os.path.join(out_dir, 'stance'), stance2i,
+            'fnc1-classifier.json', 'stance2i'),
+        # most sentences are check-worthy, as for the real model on tweets
+        'worthiness': save_classifier(
+            os.path.join(out_dir, 'worthiness'), worth2i,
+            'checkworthiness-classifier.json', 'label2i', favoured='CFS')
+    }
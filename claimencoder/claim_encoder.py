@@ -12,6 +12,7 @@ import json
 import copy
 import logging
 from claimencoder import config, sts_b_eval
+from esiutils import forksafe, evalcache, health, ortsession
 
 
 logger = logging.getLogger(__name__)
@@ -131,6 +132,8 @@ class RoBERTa_Finetuned_Encoder(torch.nn.Module):
     self.bert_model = bert_model
     self.pooling_strategy = pooling_strategy
     self.seq_len = seq_len
+    # optional ONNX Runtime session used instead of bert_model in encode
+    self.ort_session = None
 
     # power func parameters
     self.min_val = powerfun_min_val # for roberta-base pooled 0.993 
@@ -261,6 +264,10 @@ class RoBERTa_Finetuned_Encoder(torch.nn.Module):
       input_ids, att_masks = tokenize_batch(
           sentences, {"tokenizer": self.tokenizer,
                       "model": self.bert_model}, max_len=self.seq_len)
+      if self.ort_session is not None:
+        # the exported graph already applies the pooling strategy
+        return torch.from_numpy(ortsession.run(
+            self.ort_session, input_ids=input_ids.cpu().numpy()))
       #model_out = self.bert_model(input_ids, attention_mask=att_masks)
       logger.info("Encoding batch of token ids %s %s with model %s" % (
           str(type(input_ids)), input_ids.shape, str(type(self.bert_model))))
@@ -273,7 +280,7 @@ class RoBERTa_Finetuned_Encoder(torch.nn.Module):
       raise e
 
 
-def load_finetuned_semencoder(dir_path):
+def load_finetuned_semencoder(dir_path, backend_cfg=None):
   semenc_config = {}
   with open(os.path.join(dir_path, 'sem_encoder.json')) as in_f:
     semenc_config = json.load(in_f)
@@ -289,18 +296,40 @@ def load_finetuned_semencoder(dir_path):
         powerfun_k=semenc_config['powerfun_k'])
   else:
     ValueError("Unsupported class %s" % semenc_config['class'])
+  result.ort_session = ortsession.load_session(dir_path, backend_cfg)
   return result
 
 
 sem_encoder_path = config['claimencoder']['semantic_encoder_dir']
 logger.info("Loading semantic encoder from %s" % sem_encoder_path)
-semantic_encoder = load_finetuned_semencoder(sem_encoder_path)
+semantic_encoder = load_finetuned_semencoder(
+    sem_encoder_path, config['claimencoder'])
+# when enabled, the encoder is loaded read-only so it can be shared
+#  by uwsgi workers forked from the master, see wsgi/README.md
+preload = forksafe.preload_enabled(config['claimencoder'])
+if preload:
+  forksafe.freeze_torch_model(semantic_encoder)
 
 def test_sentence_encoder():
     logger.info("Encoding a sentence" )
     _test_embs = semantic_encoder.encode(['Test sentence to encode'])
     logger.info('Encoded sentence %s %s' % (str(type(_test_embs)), _test_embs.shape))
 
-test_sentence_encoder()  # Fail fast if there's something wrong with the encoder
-
-eval_result = sts_b_eval.eval_sts_dev(semantic_encoder, config['claimencoder'])
+def eval_sentence_encoder():
+    global eval_result
+    # Fail fast if there's something wrong with the encoder, also warms it up
+    if not health.warmup('encode_sents', test_sentence_encoder):
+      raise RuntimeError('Failed to encode a test sentence')
+    health.mark_ready('claimencoder')
+    enc_cfg = config['claimencoder']
+    eval_result = evalcache.cached_eval(
+        'stsb_dev_encoder',
+        evalcache.model_digest([
+            os.path.join(sem_encoder_path, fname)
+            for fname in ['pytorch_model.bin', 'config.json', 'sem_encoder.json']]),
+        {k: v for k, v in enc_cfg.items() if k.startswith('stsb')},
+        lambda: sts_b_eval.eval_sts_dev(semantic_encoder, enc_cfg),
+        **evalcache.cache_settings(enc_cfg))
+
+eval_result = None
+health.run_warmups(eval_sentence_encoder, after_fork=preload)
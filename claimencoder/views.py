@@ -9,6 +9,7 @@ import werkzeug
 from flask import json, jsonify, request, make_response
 from claimencoder.claim_encoder import semantic_encoder
 from claimencoder import app, config
+from esiutils import health, cimetrics, citrace, scheduler
 import numpy as np
 
 logger = logging.getLogger(__name__)
@@ -50,7 +51,8 @@ def encode_sents():
         assert type(sentences) == list
         assert len(sentences) > 0
         logger.info('Encoding %d sentences' % len(sentences))
-        vecs = semantic_encoder.encode(sentences)
+        cimetrics.observe_batch_size('encode_sents', len(sentences))
+        vecs = scheduler.run('encoder', lambda: semantic_encoder.encode(sentences))
         logger.info("Converting tensor to list")
         vecs = vecs.detach().tolist()
         assert len(vecs) == len(sentences)
@@ -76,7 +78,7 @@ def compare_sents():
         assert type(sentences) == list
         assert len(sentences) > 0
         logger.info('Encoding %d sentences' % len(sentences))
-        vecs = semantic_encoder.encode(sentences)
+        vecs = scheduler.run('encoder', lambda: semantic_encoder.encode(sentences))
         logger.info("Converting tensor to list")
         vecs = vecs.detach().tolist()
         assert len(vecs) == len(sentences)
@@ -126,3 +128,10 @@ def cosim2predscore():
         resp = jsonify({"error": str(e)})
         resp.status_code = 500
         return resp
+
+
+health.register_routes(app, app_name)
+cimetrics.configure(app_name, config['claimencoder'])
+cimetrics.register_routes(app, app_name)
+citrace.configure(app_name, config['claimencoder'])
+citrace.register_hooks(app, app_name)
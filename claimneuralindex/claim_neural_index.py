@@ -13,11 +13,20 @@ import logging
 import time
 import requests
 import math
-from esiutils import bot_describer, dictu, isodate, hashu
+import json
+import threading
+import collections
+from esiutils import bot_describer, dictu, isodate, hashu, citrace, pcaindex
+from esiutils import cimetrics
 
 
 logger = logging.getLogger(__name__)
 
+# encodings of recent query sentences, reused for stance prediction
+query_vecs_cache_size = 1024
+_query_vecs = collections.OrderedDict()
+_query_vecs_lock = threading.Lock()
+
 
 try:
     import faiss
@@ -96,6 +105,10 @@ def search_vector_space(vec_space, query_vec, topn=10, index_format=None):
         topn_sims, topn_labels = search_topn_numpy_index(vec_space, qvec, topn)
     elif index_format == 'faiss':
         topn_sims, topn_labels = search_topn_faiss_index(vec_space, qvec, topn)
+    elif index_format == 'pca':
+        topn_sims, topn_labels = search_topn_pca_index(vec_space, qvec, topn)
+    else:
+        raise ValueError('Unsupported index_format %s' % index_format)
 
     return topn_sims, topn_labels
 
@@ -202,6 +215,33 @@ def search_topn_numpy_index(vec_space, qvec, topn):
     return topn_sims, topn_labels
 
 
+def search_topn_pca_index(vec_space, qvec, topn):
+    """
+    For input query vectors return similar sentences from the reduced index
+
+    Candidates are found in the PCA-reduced space and re-ranked using the
+    full vectors, see `esiutils.pcaindex`
+
+    :param vec_space: dictionary that contain a field with the `pca_index`
+    :type vec_space: dict
+    :param qvec: matrix of query embeddings
+    :type qvec: numpy array
+    :param topn: number of similar candidates for each query
+    :type topn: int
+    :return: set of similar vectors found `topn_sims` and their labels
+      `topn_labels`
+    :rtype: lists
+    """
+    pca_index = vec_space.get('pca_index', None)
+    if pca_index is None:
+        raise Exception('PCA index is not available, set pca_dims')
+    topn_sims, top_ids = pcaindex.search(
+        pca_index, vec_space['vectors'], normalize(qvec), topn,
+        n_candidates=vec_space.get('pca_candidates', 100))
+    topn_labels = np.take(np.array(vec_space['labels']), top_ids)
+    return topn_sims, topn_labels
+
+
 def search_semantic_vecspace(vec_space, qsentences,
                              topn=10, index_format=None):
     """Search the `vec_space` for embeddings semantically similar to `qsentences`
@@ -218,6 +258,7 @@ def search_semantic_vecspace(vec_space, qsentences,
     """
     logger.info("Encoding %d sentences" % len(qsentences))
     q_vecs = vec_space['sentence_encoder_fn'](qsentences)
+    cache_query_vectors(qsentences, q_vecs)
     logger.info("Converting list to numpy")
     q_vecs = np.array(q_vecs)  # shape (num_sents, emb_dim)
     logger.info("Search vector space for nearest neighbors")
@@ -230,11 +271,48 @@ def search_semantic_vecspace(vec_space, qsentences,
     return q_preds, q_labels.tolist(), sim_reviewer(vec_space, index_format)
 
 
+def cache_query_vectors(qsentences, q_vecs):
+    """Remembers the encodings of the most recent query sentences"""
+    with _query_vecs_lock:
+        for sent, vec in zip(qsentences, q_vecs):
+            _query_vecs[sent] = vec
+            _query_vecs.move_to_end(sent)
+        while len(_query_vecs) > query_vecs_cache_size:
+            _query_vecs.popitem(last=False)
+
+
+def known_vectors(vec_space, texts, labels):
+    """Finds the encodings of texts which are already available
+
+    :param vec_space: a vector space dict, see `load_tsv_vector_space`
+    :param texts: list of str
+    :param labels: list, aligned with `texts`, of the label of each text
+      in the `vec_space` or None
+    :returns: dict from text to its encoding, either of a recent query
+      sentence (see `search_semantic_vecspace`) or the vector of its
+      label in the index
+    :rtype: dict
+    """
+    result = {}
+    with _query_vecs_lock:
+        for text in set(texts):
+            if text in _query_vecs:
+                result[text] = _query_vecs[text]
+    for text in set(texts):
+        cimetrics.count_cache('query_vecs', text in result)
+    label2idx = vec_space['label2idx']
+    for text, label in zip(texts, labels):
+        if text not in result and label in label2idx:
+            result[text] = vec_space['vectors'][label2idx[label]]
+    return result
+
+
 def semantic_sent_encoder(sem_encoder_url):
     def encoder_fn(sentences):
         url = sem_encoder_url + '/encode_sents'
         req = {'sentences': sentences}
-        resp = requests.post(url, json=req, verify=False)
+        resp = requests.post(url, json=req, verify=False,
+                             headers=citrace.headers())
         logger.info("Response from %s %s" % (url, resp))
         return resp.json()['semantic_encodings']
     return encoder_fn
@@ -244,7 +322,7 @@ def semantic_cosim2preds(sem_encoder_url):
     def cosim2pred_fn(cosims):
         url = sem_encoder_url + '/cosim_to_pred_score'
         req = {'cosims': cosims}
-        resp = requests.post(url, json=req)
+        resp = requests.post(url, json=req, headers=citrace.headers())
         logger.info("Response from %s %s" % (url, resp))
         return resp.json()['similarity_scores']
     return cosim2pred_fn
@@ -253,7 +331,7 @@ def semantic_cosim2preds(sem_encoder_url):
 def semantic_sent_encoder_info(semencoder_url):
     def fn():
         url = semencoder_url + '/encoder_info'
-        resp = requests.get(url, verify=False)
+        resp = requests.get(url, verify=False, headers=citrace.headers())
         logger.info("Response from %s %s" % (url, resp))
         return resp.json()['semanticEncoder']
     return fn
@@ -280,19 +358,14 @@ def vec_space_encoder_from_web_service_url(semencoder_url):
     }
 
 
-def load_tsv_vector_space(tsv_vecs_path, sep='\t'):
-    """load the word embeddings file and create a vecspace dict
-    that stores vectors with their correlated information and
-    indices useful for searching the spece.
+def read_tsv_vectors(tsv_vecs_path, sep='\t'):
+    """Reads a tsv file with a label and a vector per line
 
-    :param tsv_vecs_path: path to upload the stored embeddings
-    :type tsv_vecs_path: str
+    :param tsv_vecs_path: path to the stored embeddings
     :param sep: separator of the embeddings file
-    :type sep: str
-    :return: dictionary that contains the embeddings `labels`, the numpy array
-    of word `vectors`, the created `faiss_index`, the `source` path
-    of the embeddings and the number of embeddings dimensions `dim`
-    :rtype: dict
+    :returns: tuple with the list of labels and a matrix of l2 normalized
+      vectors
+    :rtype: tuple
     """
     labels = []
     vectors = []
@@ -316,21 +389,96 @@ def load_tsv_vector_space(tsv_vecs_path, sep='\t'):
         if len(labels_set) != len(labels):
             logger.warn("Repeated labels, %d vs %d" % (
                 len(labels), len(labels_set)))
-        ndims = vectors.shape[1]
-        assert ndims == ndims, '%d != %d' % (ndims, ndims)
     logger.info('Loaded %d vectors in %ds' % (
         len(labels), (time.time() - start)))
-    nvectors = normalize(vectors)
+    return labels, normalize(vectors).astype(np.float32)
+
+
+def read_mmap_vectors(tsv_vecs_path, tsv_digest, mmap_dir, sep='\t'):
+    """Reads the vectors in a tsv file via a memory-mapped `.npy` cache
+
+    The first time, the tsv is parsed and its normalized vectors are
+    stored in `mmap_dir` using the digest of the tsv as file name.
+    Afterwards, the vectors are memory-mapped read-only, which is much
+    faster and lets all processes on the host share the same pages.
+
+    :param tsv_vecs_path: path to the stored embeddings
+    :param tsv_digest: sha256 digest of the tsv file
+    :param mmap_dir: folder where to store the `.npy` and labels files
+    :param sep: separator of the embeddings file
+    :returns: tuple with the list of labels and a read-only matrix of
+      l2 normalized vectors
+    :rtype: tuple
+    """
+    fname = tsv_digest
+    npy_path = os.path.join(mmap_dir, '%s.npy' % fname)
+    labels_path = os.path.join(mmap_dir, '%s.labels.json' % fname)
+    if not (os.path.exists(npy_path) and os.path.exists(labels_path)):
+        labels, vectors = read_tsv_vectors(tsv_vecs_path, sep=sep)
+        os.makedirs(mmap_dir, exist_ok=True)
+        # write to tmp files first, other processes may be reading
+        np.save(npy_path + '.tmp.npy', vectors)
+        with open(labels_path + '.tmp', 'w', encoding='utf-8') as out_f:
+            json.dump(labels, out_f)
+        os.replace(npy_path + '.tmp.npy', npy_path)
+        os.replace(labels_path + '.tmp', labels_path)
+    logger.info('Memory-mapping vectors from %s' % npy_path)
+    with open(labels_path, 'r', encoding='utf-8') as in_f:
+        labels = json.load(in_f)
+    return labels, np.load(npy_path, mmap_mode='r')
+
+
+def load_tsv_vector_space(tsv_vecs_path, sep='\t', mmap_dir=None,
+                          pca_dims=0, pca_candidates=100):
+    """load the word embeddings file and create a vecspace dict
+    that stores vectors with their correlated information and
+    indices useful for searching the spece.
+
+    :param tsv_vecs_path: path to upload the stored embeddings
+    :type tsv_vecs_path: str
+    :param sep: separator of the embeddings file
+    :type sep: str
+    :param mmap_dir: optional folder to cache the vectors as a `.npy`
+      file, which is then memory-mapped read-only. See `read_mmap_vectors`
+    :type mmap_dir: str
+    :param pca_dims: if positive, also build (or load) a PCA-reduced
+      index with this number of dims, stored in `mmap_dir` or next to
+      the tsv. See `search_topn_pca_index`
+    :type pca_dims: int
+    :param pca_candidates: number of candidates found in the reduced
+      index which are re-ranked with the full vectors
+    :type pca_candidates: int
+    :return: dictionary that contains the embeddings `labels` (and
+    `label2idx`, their index), the numpy array of word `vectors`, the created `faiss_index`, the `source` path
+    of the embeddings and the number of embeddings dimensions `dim`
+    :rtype: dict
+    """
+    tsv_digest = hashu.sha256_file(tsv_vecs_path)
+    if mmap_dir:
+        labels, nvectors = read_mmap_vectors(
+            tsv_vecs_path, tsv_digest, mmap_dir, sep=sep)
+    else:
+        labels, nvectors = read_tsv_vectors(tsv_vecs_path, sep=sep)
+    ndims = nvectors.shape[1]
+    pca_index = None
+    if pca_dims > 0:
+        pca_index = pcaindex.load_or_build(
+            nvectors, pca_dims,
+            mmap_dir or os.path.dirname(os.path.abspath(tsv_vecs_path)),
+            tsv_digest)
     return {'labels': labels,
+            'label2idx': {label: i for i, label in enumerate(labels)},
             'vectors': nvectors,
             'faiss_index': create_faiss_index(nvectors, ndims),
+            'pca_index': pca_index,
+            'pca_candidates': pca_candidates,
             'source': tsv_vecs_path,
             'dim': ndims,
             'dataset_info': {
                 '@context': 'http://schema.org',
                 '@type': 'Dataset',
                 'name': 'Co-inform Sentence embeddings',
-                'identifier': hashu.sha256_file(tsv_vecs_path),
+                'identifier': tsv_digest,
                 'description': 'Dataset of %d sentence embeddings extracted from claim reviews and articles collected as part of the Co-inform project' % len(labels),
                 'dateCreated': isodate.as_utc_timestamp(os.path.getctime(tsv_vecs_path)),
                 'dateModified': isodate.as_utc_timestamp(os.path.getmtime(tsv_vecs_path)),
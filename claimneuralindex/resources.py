@@ -1,12 +1,19 @@
 # This file is used to load all the resources required by this module
 # ideally this should be done only once
 from claimneuralindex import config, claim_neural_index
-from stance import stancepred, fnc1
+from stance import stancepred, cheapstance, fnc1
+from esiutils import forksafe, evalcache, health, scheduler
+import numpy as np
 import logging
+import os
 
 
 logger = logging.getLogger(__name__)
 
+# when enabled, resources are loaded read-only so they can be shared
+#  by uwsgi workers forked from the master, see wsgi/README.md
+preload = forksafe.preload_enabled(config['claimneuralindex'])
+
 ## First load the indexed vector space needed for finding semantically
 ## similar sentences
 # e.g. 'http://localhost:8070/'
@@ -16,12 +23,20 @@ claim_embeddings = config['claimneuralindex']['claim_embeddings_path']
 # searchable vec space: a dict that can be used by
 #  claim_neural_index.search_vector_space
 vec_space = {
-    **claim_neural_index.load_tsv_vector_space(claim_embeddings),
+    **claim_neural_index.load_tsv_vector_space(
+        claim_embeddings,
+        mmap_dir=config['claimneuralindex'].get('claim_embeddings_mmap_dir'),
+        pca_dims=int(config['claimneuralindex'].get('pca_dims', 0)),
+        pca_candidates=int(config['claimneuralindex'].get(
+            'pca_rerank_candidates', 100))),
     **claim_neural_index.vec_space_encoder_from_web_service_url(
         sem_encoder_url)
 }
 
 
+# index used for searches which do not specify one: numpy, faiss or pca
+default_index_format = config['claimneuralindex'].get('index_format', 'numpy')
+
 ## Next, load the stance detector. For now this also provided by the
 ##  claimneuralindex. In the future we may consider moving it to its own
 ##  project/docker container
@@ -29,7 +44,77 @@ vec_space = {
 saved_fnc1_model_path = config['stance']['fnc1_model_path']
 logger.info('Loading saved stance detection model from %s' % (
     saved_fnc1_model_path))
-stance_tokmodmeta = stancepred.load_saved_fnc1_model(saved_fnc1_model_path)
+stance_tokmodmeta = stancepred.load_saved_fnc1_model(
+    saved_fnc1_model_path, config['stance'])
 logger.info('Stance detection model loaded %s' % (
     stance_tokmodmeta['model_meta']))
-fnc1.test_model(stance_tokmodmeta, config['stance'])
+if preload:
+    forksafe.freeze_torch_model(stance_tokmodmeta['model'])
+
+# optional cheap first stage: only uncertain pairs are sent to RoBERTa
+stance_cascade = cheapstance.load_cascade(
+    config['stance'], vec_space['sentence_encoder_fn'])
+if stance_cascade is not None:
+    logger.info('Stance cascade enabled with %s, min_conf %s' % (
+        stance_cascade['model_path'], stance_cascade['min_conf']))
+
+
+def predict_stances(claim_bod_pairs, body_ids=None):
+    """Predicts stances, via the cascade if enabled
+
+    :param claim_bod_pairs: list of (claim, body) str tuples
+    :param body_ids: optional list, aligned with `claim_bod_pairs`, of
+      the ids of the bodies in the claim index. The cascade reuses their
+      indexed vectors and those of recently searched claims rather than
+      encoding them again
+    :returns: a triple with the labels, the confidences and the number
+      of pairs predicted by the RoBERTa model
+    :rtype: tuple
+    """
+    def predict_fn(pairs):
+        return scheduler.run('stance', lambda: stancepred.predict_stances(
+            stance_tokmodmeta, pairs))
+
+    if stance_cascade is None:
+        labels, confs = predict_fn(claim_bod_pairs)
+        return labels, confs, len(claim_bod_pairs)
+    claims = [claim for claim, _ in claim_bod_pairs]
+    bodies = [body for _, body in claim_bod_pairs]
+    text2vec = claim_neural_index.known_vectors(
+        vec_space, claims + bodies,
+        [None] * len(claims) + list(body_ids or [None] * len(bodies)))
+    # only the escalated pairs need a turn of the scheduler
+    return stancepred.predict_stances_cascade(
+        stance_tokmodmeta, stance_cascade, claim_bod_pairs, predict_fn,
+        text2vec)
+
+
+def test_stance_model():
+    stance_cfg = config['stance']
+    model_paths = [os.path.join(saved_fnc1_model_path, fname)
+                   for fname in ['pytorch_model.bin', 'config.json',
+                                 'fnc1-classifier.json']]
+    eval_cfg = {k: v for k, v in stance_cfg.items() if k.startswith('fnc_test')}
+    if stance_cascade is not None:
+        model_paths.append(stance_cascade['model_path'])
+        eval_cfg['cascade_min_conf'] = stance_cascade['min_conf']
+    evalcache.cached_eval(
+        'fnc1_stance',
+        evalcache.model_digest(model_paths),
+        eval_cfg,
+        lambda: fnc1.test_model(stance_tokmodmeta, stance_cfg,
+                                cascade=stance_cascade),
+        **evalcache.cache_settings(stance_cfg))
+
+
+def warmup():
+    qvec = np.ones(vec_space['dim'], dtype=np.float32)
+    health.warmup('search_vector_space', lambda: claim_neural_index.search_vector_space(
+        vec_space, qvec, topn=5))
+    health.warmup('predict_stance', lambda: predict_stances(
+        [('A claim to warm up.', 'A body to warm up.')]))
+    health.mark_ready('claimneuralindex')
+    test_stance_model()
+
+
+health.run_warmups(warmup, after_fork=preload)
@@ -10,8 +10,7 @@ import werkzeug
 from flask import jsonify, request
 from claimneuralindex import claim_neural_index
 from claimneuralindex import app, config, resources
-from stance import stancepred
-from esiutils import citimings
+from esiutils import citimings, health, cimetrics, citrace
 
 
 logger = logging.getLogger(__name__)
@@ -41,7 +40,8 @@ def search_sem_vecspace():
         qsentences = req_json['query_sentences']
         topn = req_json.get('topn', 10)
         prov = req_json.get('provenance') in ['True', True, 'true', 'yes']
-        index_format = req_json.get('index_format', 'numpy')
+        index_format = req_json.get('index_format',
+                                    resources.default_index_format)
         assert type(qsentences) == list
         if len(qsentences) == 0:
             raise werkzeug.exceptions.BadRequest('Missing query_sentences')
@@ -51,6 +51,7 @@ def search_sem_vecspace():
 
         logger.info('Neural semantic search for %d query sentences topn=%d' % (
             len(qsentences), topn))
+        cimetrics.observe_batch_size('search_semantic_vecspace', len(qsentences))
         q_preds, q_labels, simReviewer = claim_neural_index.search_semantic_vecspace(
             resources.vec_space,
             qsentences, topn, index_format)
@@ -77,12 +78,14 @@ def search_sem_vecspace():
         return resp
 
 
-def validate_stance_pred_q(qclaim, doc_bodies):
+def validate_stance_pred_q(qclaim, doc_bodies, doc_ids=None):
     assert type(qclaim) == str
     assert type(doc_bodies) == list
     if len(doc_bodies) == 0:
         raise werkzeug.exceptions.BadRequest('Missing doc_bodies')
     assert len(doc_bodies) > 0
+    if doc_ids is not None and len(doc_ids) != len(doc_bodies):
+        raise werkzeug.exceptions.BadRequest('doc_ids must be aligned with doc_bodies')
 
 
 @app.route('/' + app_name + '/stance_predictor', methods=['GET'])
@@ -105,20 +108,19 @@ def predict_stance():
     try:
         start = citimings.start()
         req_json = request.get_json()
-        inputs = []
-        if type(req_json) == list:
-            for claim_bods in req_json:
-                qclaim = claim_bods['qclaim']
-                doc_bodies = claim_bods['doc_bodies']
-                validate_stance_pred_q(qclaim, doc_bodies)
-                inputs.extend([(qclaim, docbod) for docbod in doc_bodies])
-        else:  # assume single input
-            qclaim = req_json['qclaim']
-            doc_bodies = req_json['doc_bodies']
-            validate_stance_pred_q(qclaim, doc_bodies)
+        inputs, body_ids = [], []
+        # assume single input if not a list
+        for claim_bods in (req_json if type(req_json) == list else [req_json]):
+            qclaim = claim_bods['qclaim']
+            doc_bodies = claim_bods['doc_bodies']
+            # optional ids of the bodies in the claim index
+            doc_ids = claim_bods.get('doc_ids')
+            validate_stance_pred_q(qclaim, doc_bodies, doc_ids)
             inputs.extend([(qclaim, docbod) for docbod in doc_bodies])
+            body_ids.extend(doc_ids or [None] * len(doc_bodies))
 
         tokmodmeta = resources.stance_tokmodmeta
+        cimetrics.observe_batch_size('predict_stance', len(inputs))
         if len(inputs) == 0:
             return jsonify({'labels': [],
                             'confidences': [],
@@ -128,14 +130,15 @@ def predict_stance():
                                     'predict_stance', start),
                                 'n_pairs': len(inputs)
                             }})
-        labels, confs = stancepred.predict_stances(tokmodmeta, inputs)
+        labels, confs, n_escalated = resources.predict_stances(inputs, body_ids)
         return jsonify({
             'labels': labels,
             'confidences': confs,
             'meta': {
                 'model_info': tokmodmeta['model_info'],
                 'timings': citimings.timing('predict_stance', start),
-                'n_pairs': len(inputs)
+                'n_pairs': len(inputs),
+                'n_escalated': n_escalated
             }
         })
     except werkzeug.exceptions.BadRequest as e:
@@ -146,3 +149,10 @@ def predict_stance():
         resp = jsonify({"error": str(e)})
         resp.status_code = 500
         return resp
+
+
+health.register_routes(app, app_name)
+cimetrics.configure(app_name, config['claimneuralindex'])
+cimetrics.register_routes(app, app_name)
+citrace.configure(app_name, config['claimneuralindex'])
+citrace.register_hooks(app, app_name)
@@ -0,0 +1,103 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Coalesces concurrent prediction requests into shared batches
+
+Model servers handle each HTTP request in its own thread, so concurrent
+requests would each run a forward pass for a handful of items. A
+batcher lets those threads share forward passes: only one thread (the
+leader) calls the prediction function at a time and, when it does, it
+takes the items of all the requests queued so far. Threads whose items
+were predicted by another leader just collect their results.
+
+No background thread is needed, so batchers can be created before uwsgi
+forks its workers. When the model is idle, a request is predicted right
+away unless `max_wait_ms` is set to give concurrent requests a chance
+to join the batch.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def create(predict_fn, max_batch_size=256, max_wait_ms=0):
+    """Creates a batcher for `predict_fn`
+
+    :param predict_fn: function that maps a list of items onto a tuple
+      of aligned lists, e.g. the labels and confidences for a list of
+      sentences
+    :param max_batch_size: maximum number of items per call to
+      `predict_fn`. Requests are never split, so a single large request
+      may exceed it
+    :param max_wait_ms: milliseconds a leader waits for other requests
+      to join its batch
+    :returns: a batcher dict to pass to `submit`
+    :rtype: dict
+    """
+    return {
+        'predict_fn': predict_fn,
+        'max_batch_size': max_batch_size,
+        'max_wait_ms': max_wait_ms,
+        'pending': [],
+        'lock': threading.Lock(),
+        'run_lock': threading.Lock(),
+        'n_calls': 0
+    }
+
+
+def _take_batch(batcher):
+    batch, n_items = [], 0
+    with batcher['lock']:
+        pending = batcher['pending']
+        while pending and (not batch or n_items + len(
+                pending[0]['items']) <= batcher['max_batch_size']):
+            entry = pending.pop(0)
+            batch.append(entry)
+            n_items += len(entry['items'])
+    return batch
+
+
+def _run_batch(batcher, batch):
+    items = [item for entry in batch for item in entry['items']]
+    try:
+        results = batcher['predict_fn'](items)
+        batcher['n_calls'] += 1
+        offset = 0
+        for entry in batch:
+            end = offset + len(entry['items'])
+            entry['result'] = tuple(r[offset:end] for r in results)
+            offset = end
+    except Exception as e:
+        for entry in batch:
+            entry['error'] = e
+    finally:
+        for entry in batch:
+            entry['done'] = True
+
+
+def submit(batcher, items):
+    """Predicts `items`, possibly in a batch shared with other threads
+
+    :param batcher: a batcher as returned by `create`
+    :param items: list of items to predict
+    :returns: the result of `predict_fn` for just `items`
+    :rtype: tuple
+    """
+    entry = {'items': items, 'done': False, 'result': None, 'error': None}
+    with batcher['lock']:
+        batcher['pending'].append(entry)
+    while not entry['done']:
+        with batcher['run_lock']:
+            if entry['done']:  # predicted by another leader
+                break
+            if batcher['max_wait_ms'] > 0:
+                time.sleep(batcher['max_wait_ms'] / 1000.0)
+            batch = _take_batch(batcher)
+            if len(batch) > 1:
+                logger.debug('Coalesced %d requests' % len(batch))
+            _run_batch(batcher, batch)
+    if entry['error'] is not None:
+        raise entry['error']
+    return entry['result']
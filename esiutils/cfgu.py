@@ -0,0 +1,33 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Utility methods for reading values from config sections
+
+Config sections are those of `acred.ini` (a `configparser.SectionProxy`,
+where all values are str) or plain dicts, e.g. in tests.
+"""
+
+true_vals = ['1', 'true', 'yes', 'on']
+false_vals = ['0', 'false', 'no', 'off', '']
+
+
+def get_bool(cfg_section, key, default=False):
+    """Reads a boolean option from a config section
+
+    :param cfg_section: a section of the `acred.ini` config, or a dict
+    :param key: name of the option
+    :param default: value when the option is missing
+    :returns: the value of the option
+    :rtype: bool
+    """
+    val = cfg_section.get(key, None)
+    if val is None:
+        return default
+    if type(val) is bool:
+        return val
+    val = str(val).strip().lower()
+    if val in true_vals:
+        return True
+    if val in false_vals:
+        return False
+    raise ValueError('Not a boolean value for %s: %s' % (key, val))
@@ -0,0 +1,232 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Utility for aggregating timings and counters across requests
+
+Every phase reported via `citimings.timing` is recorded in a histogram
+labelled by phase and service, so we can inspect e.g. the p99 of each
+phase across traffic. Modules can also increment counters (cache hits,
+upstream errors) and observe batch sizes.
+
+Metrics are disabled by default, in which case recording is a single
+boolean check. Services enable them via `enable` (or `configure`, with
+the `metrics` option of their config section) and expose them in the
+Prometheus text format via `register_routes`.
+
+Metrics are kept in memory per process. When a service runs under
+uwsgi with several workers, each `/metrics` response only reports the
+requests handled by the worker which answered it, so scrape each worker
+or sum the series of all workers.
+
+The `service` label is that of the flask app handling the request (see
+`register_routes`), so services sharing a process, e.g. the
+`modelserver` of `runsrv.py`, still report their metrics apart.
+"""
+import threading
+import contextvars
+from esiutils import cfgu
+
+enabled = False
+service = 'acred'
+
+# bucket upper bounds for timings in milliseconds
+ms_buckets = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+              1000, 2500, 5000, 10000, 30000, 60000]
+# bucket upper bounds for batch sizes
+size_buckets = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> {'buckets', 'counts', 'sum', 'count'}
+_counters = {}  # (name, labels) -> value
+# service label of the request being handled, overrides `service`
+_request_service = contextvars.ContextVar('cimetrics_service', default=None)
+
+
+def enable(service_name):
+    """Enables recording of metrics for this process
+
+    :param service_name: value of the `service` label of all metrics
+    :returns: None
+    """
+    global enabled, service
+    service = service_name
+    enabled = True
+
+
+def configure(service_name, cfg_section={}):
+    """Enables metrics if the config section sets `metrics = true`
+
+    :param service_name: value of the `service` label of all metrics
+    :param cfg_section: a section of the `acred.ini` config, or a dict
+    :returns: None
+    """
+    if cfgu.get_bool(cfg_section, 'metrics'):
+        enable(service_name)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _labels_key(labels):
+    return tuple(sorted({'service': _request_service.get() or service,
+                         **labels}.items()))
+
+
+def observe(name, value, labels={}, buckets=ms_buckets):
+    """Records `value` in histogram `name`"""
+    if not enabled:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {'buckets': buckets, 'counts': [0] * len(buckets),
+                    'sum': 0, 'count': 0}
+            _histograms[key] = hist
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist['counts'][i] += 1
+                break
+        hist['sum'] += value
+        hist['count'] += 1
+
+
+def observe_phase(phase, total_ms):
+    """Records the duration of a `citimings` phase"""
+    if not enabled:
+        return
+    observe('acred_phase_duration_ms', total_ms, {'phase': phase})
+
+
+def observe_batch_size(batch, size):
+    """Records the number of items in a batch, e.g. sentences to encode"""
+    if not enabled:
+        return
+    observe('acred_batch_size', size, {'batch': batch}, buckets=size_buckets)
+
+
+def inc(name, labels={}, value=1):
+    """Increments counter `name`"""
+    if not enabled:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def count_cache(cache, hit):
+    """Counts a hit or miss in `cache`"""
+    if not enabled:
+        return
+    inc('acred_cache_requests_total',
+        {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def count_upstream_error(upstream):
+    """Counts a failed call to an upstream service, e.g. `claimneuralindex`"""
+    if not enabled:
+        return
+    inc('acred_upstream_errors_total', {'upstream': upstream})
+
+
+def histograms(name):
+    """Returns the recorded histograms named `name`
+
+    :returns: list of dicts with the `labels`, `buckets`, `counts`,
+      `sum` and `count` of each histogram
+    :rtype: list of dict
+    """
+    with _lock:
+        return [{'labels': dict(labels), 'buckets': list(h['buckets']),
+                 'counts': list(h['counts']), 'sum': h['sum'],
+                 'count': h['count']}
+                for (hname, labels), h in _histograms.items()
+                if hname == name]
+
+
+def _fmt_labels(labels):
+    return ','.join('%s="%s"' % (k, str(v).replace('"', '\\"'))
+                    for k, v in labels)
+
+
+def _fmt_num(v):
+    return ('%f' % v).rstrip('0').rstrip('.') if type(v) is float else str(v)
+
+
+def as_prometheus_text():
+    """Returns all metrics in the Prometheus text exposition format
+
+    :rtype: str
+    """
+    with _lock:
+        hists = {k: {**h, 'counts': list(h['counts'])}
+                 for k, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    typed = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            lines.append('# TYPE %s counter' % name)
+            typed.add(name)
+        lines.append('%s{%s} %s' % (name, _fmt_labels(labels), _fmt_num(value)))
+    for (name, labels), hist in sorted(hists.items()):
+        if name not in typed:
+            lines.append('# TYPE %s histogram' % name)
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(hist['buckets'], hist['counts']):
+            cumulative += count
+            lines.append('%s_bucket{%s} %d' % (
+                name, _fmt_labels(labels + (('le', _fmt_num(float(bound))),)),
+                cumulative))
+        lines.append('%s_bucket{%s} %d' % (
+            name, _fmt_labels(labels + (('le', '+Inf'),)), hist['count']))
+        lines.append('%s_sum{%s} %s' % (
+            name, _fmt_labels(labels), _fmt_num(float(hist['sum']))))
+        lines.append('%s_count{%s} %d' % (
+            name, _fmt_labels(labels), hist['count']))
+    return '\n'.join(lines) + '\n'
+
+
+def register_routes(app, app_name):
+    """Adds a `/metrics` endpoint to a flask `app`
+
+    Metrics recorded while `app` handles a request are labelled with
+    `service=app_name`.
+
+    :param app: the flask app
+    :param app_name: name of the app, the route is registered both at
+      the root and under `/<app_name>`
+    :returns: None
+    """
+    from flask import Response, g
+
+    @app.before_request
+    def cimetrics_begin():
+        g.cimetrics_token = _request_service.set(app_name)
+
+    @app.teardown_request
+    def cimetrics_end(exc):
+        token = g.pop('cimetrics_token', None)
+        if token is not None:
+            try:
+                _request_service.reset(token)
+            except ValueError:  # token created in a different context
+                _request_service.set(None)
+
+    def metrics():
+        return Response(as_prometheus_text(),
+                        mimetype='text/plain; version=0.0.4')
+
+    for prefix in ['', '/' + app_name]:
+        app.add_url_rule(prefix + '/metrics', 'metrics', metrics,
+                         methods=['GET'])
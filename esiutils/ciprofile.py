@@ -0,0 +1,162 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Utility for profiling individual requests
+
+`timings` tell us which phase of a review was slow, but not where the
+time went inside it. This module implements a low-overhead sampling
+profiler: a background thread periodically captures the stack of the
+thread handling the request and counts how often each stack is seen.
+
+Profiles are stored in the *folded stacks* format (one
+`frame;frame;frame count` line per distinct stack) which can be
+rendered by `flamegraph.pl` or loaded in speedscope.
+"""
+import os
+import sys
+import hmac
+import time
+import logging
+import itertools
+import threading
+from esiutils import isodate
+
+logger = logging.getLogger(__name__)
+
+_request_counter = itertools.count(1)
+
+
+def settings(cfg_section):
+    """Reads the profiling settings from a config section
+
+    :param cfg_section: a section of the `acred.ini` config, or a dict.
+      Relevant keys are `profile_admin_token`, `profile_sample_every`,
+      `profile_dir` and `profile_interval_ms`
+    :returns: dict with the profiling settings
+    :rtype: dict
+    """
+    return {
+        'admin_token': cfg_section.get('profile_admin_token', None) or None,
+        'sample_every': int(cfg_section.get('profile_sample_every', 0)),
+        'dir': cfg_section.get('profile_dir', 'data/profiles'),
+        'interval_ms': float(cfg_section.get('profile_interval_ms', 5))
+    }
+
+
+def is_admin(headers, prof_settings):
+    """Checks whether a request carries the admin token for profiling
+
+    :param headers: the request headers
+    :param prof_settings: see `settings`
+    :returns: False when no admin token is configured or the request
+      does not provide it in the `X-Admin-Token` header
+    :rtype: bool
+    """
+    token = prof_settings.get('admin_token')
+    if token is None:
+        return False
+    provided = headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(provided.encode('utf-8'), token.encode('utf-8'))
+
+
+def should_sample(prof_settings):
+    """True for 1 in every `sample_every` calls, never if it is 0"""
+    every = prof_settings.get('sample_every', 0)
+    if every <= 0:
+        return False
+    return next(_request_counter) % every == 0
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return '%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename),
+                           code.co_firstlineno)
+
+
+def folded_stack(frame):
+    """Converts a frame into a `;`-separated stack, outermost frame first"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _sample_loop(state):
+    interval = state['interval_ms'] / 1000.0
+    counts = state['counts']
+    while not state['stop'].wait(interval):
+        frame = sys._current_frames().get(state['thread_id'])
+        if frame is None:
+            continue
+        stack = folded_stack(frame)
+        counts[stack] = counts.get(stack, 0) + 1
+
+
+def start_sampler(interval_ms=5, thread_id=None):
+    """Starts sampling the stack of a thread
+
+    :param interval_ms: milliseconds between samples
+    :param thread_id: ident of the sampled thread, by default the
+      calling thread
+    :returns: sampler state to pass to `stop_sampler`
+    :rtype: dict
+    """
+    state = {
+        'thread_id': thread_id or threading.get_ident(),
+        'interval_ms': interval_ms,
+        'counts': {},
+        'stop': threading.Event(),
+        'start': time.perf_counter()
+    }
+    state['thread'] = threading.Thread(
+        target=_sample_loop, args=(state,), name='ciprofile-sampler',
+        daemon=True)
+    state['thread'].start()
+    return state
+
+
+def stop_sampler(state):
+    """Stops a sampler and returns the collected profile
+
+    :param state: value returned by `start_sampler`
+    :returns: a Profile dict with the folded stacks and their counts
+    :rtype: dict
+    """
+    state['stop'].set()
+    state['thread'].join()
+    return {
+        '@type': 'Profile',
+        'format': 'folded',
+        'dateCreated': isodate.now_utc_timestamp(),
+        'sampleIntervalMs': state['interval_ms'],
+        'elapsedMs': int((time.perf_counter() - state['start']) * 1000),
+        'samples': sum(state['counts'].values()),
+        'stacks': dict(state['counts'])
+    }
+
+
+def as_folded_text(profile):
+    """Formats a Profile dict as folded stacks lines"""
+    return ''.join('%s %d\n' % (stack, count)
+                   for stack, count in sorted(profile['stacks'].items()))
+
+
+def store(profile, name, out_dir):
+    """Writes a profile as a `.folded` file
+
+    :param profile: a Profile dict, see `stop_sampler`
+    :param name: name of the profiled request, e.g. `tweet`
+    :param out_dir: folder where profiles are stored
+    :returns: the name of the written file
+    :rtype: str
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    fname = '%s-%s-%d.folded' % (
+        name, time.strftime('%Y%m%dT%H%M%S'), time.perf_counter_ns())
+    with open(os.path.join(out_dir, fname), 'w', encoding='utf-8') as out_f:
+        out_f.write(as_folded_text(profile))
+    logger.info('Stored profile %s with %d samples' % (
+        fname, profile['samples']))
+    return fname
@@ -3,8 +3,17 @@
 #
 """
 Utility for measuring and reporting timings
+
+Timings are measured with the monotonic `time.perf_counter_ns` clock.
+Reported `total_ms` values are whole milliseconds, kept for existing
+clients, and `total_ns` values have nanosecond resolution. Phase
+metrics (see `cimetrics`) record fractional milliseconds and, when
+tracing is enabled (see `citrace`), each timing is also recorded as a
+span.
 """
+import time
 from datetime import datetime
+from esiutils import cimetrics, citrace
 
 
 esi_context = 'http://expertsystem.com'
@@ -14,33 +23,47 @@ def start():
     """Start a timings measurement
     To be used in combination with `timings`
 
-    :returns: a datetime
-    :rtype: datetime
+    :returns: a `time.perf_counter_ns` value
+    :rtype: int
     """
-    return datetime.now()
+    return time.perf_counter_ns()
+
+
+def _nanos_from(start, end_ns=None):
+    if isinstance(start, datetime):  # starts taken with `datetime.now()`
+        dt = datetime.now() - start
+        secs = (dt.days * 24 * 60 * 60 + dt.seconds)
+        return (secs * 1000000 + dt.microseconds) * 1000
+    end_ns = time.perf_counter_ns() if end_ns is None else end_ns
+    return end_ns - start
 
 
-def _millis_from(start):
-    dt = datetime.now() - start
-    secs = (dt.days * 24 * 60 * 60 + dt.seconds)
-    ms = secs * 1000 + dt.microseconds / 1000.0
-    return int(ms)
+def _millis_from(start, end_ns=None):
+    return _nanos_from(start, end_ns) // 1000000
 
 
 def timing(phase, start, subts=[]):
     """Create a Timing dict for phase with the time it took since start
 
     :param phase: Name of the phase for this Timing
-    :param start: datetime when this timing started
+    :param start: value returned by `start` when this timing started
     :param subts: any sub Timing dicts, provides further information
       about subphases and their timings
     :returns: a Timing dict
     :rtype: dict
     """
+    end_ns = time.perf_counter_ns()
+    total_ns = _nanos_from(start, end_ns)
+    total_ms = total_ns // 1000000
+    # sub-ms phases would all be recorded as 0 in whole ms
+    cimetrics.observe_phase(phase, total_ns / 1e6)
+    if citrace.enabled and type(start) is int:
+        citrace.record_span(phase, start, end_ns)
     return {
         '@context': esi_context,
         '@type': 'Timing',
         'phase': phase,
-        'total_ms': _millis_from(start),
+        'total_ms': total_ms,
+        'total_ns': total_ns,
         'sub_timings': subts
     }
@@ -0,0 +1,320 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Utility for following a request across the acred services
+
+Each request handled by a service belongs to a trace. The trace id
+is read from the W3C `traceparent` header of the incoming request (or
+generated when missing) and is forwarded, via `headers`, on the calls
+to other services, e.g. acredapi -> claimneuralindex -> claimencoder.
+
+When tracing is enabled, every `citimings.timing` reported while
+handling a request is recorded as a span. At the end of the request,
+the spans are exported in the OpenTelemetry (OTLP/JSON) format to a
+local file (one `ExportTraceServiceRequest` per line) or posted to a
+collector, so a slow review can be followed end-to-end.
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+
+logger = logging.getLogger(__name__)
+
+trace_header = 'traceparent'
+
+enabled = False
+service = 'acred'
+export_path = None
+export_url = None
+
+# offset to convert `time.perf_counter_ns` values into unix epoch nanos
+_epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+_current = contextvars.ContextVar('citrace_current', default=None)
+_export_queue = queue.Queue()
+_exporter = None
+_file_lock = threading.Lock()
+
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+
+def parse_traceparent(value):
+    """Parses a W3C `traceparent` header value
+
+    :param value: header value, e.g.
+      `00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01`
+    :returns: tuple with the trace id and parent span id, or None if
+      the value is missing or malformed
+    :rtype: tuple
+    """
+    parts = (value or '').strip().split('-')
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == '0' * 32 or parts[2] == '0' * 16:
+        return None
+    return parts[1], parts[2]
+
+
+def as_traceparent(trace_id, span_id):
+    return '00-%s-%s-01' % (trace_id, span_id)
+
+
+def configure(service_name, cfg_section={}):
+    """Configures tracing for this process
+
+    :param service_name: value of the `service.name` resource attribute
+      of the exported spans
+    :param cfg_section: a section of the `acred.ini` config, or a dict.
+      Relevant keys are `trace_export_path` and `trace_export_url`;
+      span recording is enabled when either is set
+    :returns: None
+    """
+    global enabled, service, export_path, export_url
+    service = service_name
+    export_path = cfg_section.get('trace_export_path', None) or None
+    export_url = cfg_section.get('trace_export_url', None) or None
+    enabled = export_path is not None or export_url is not None
+    if enabled:
+        logger.info('Exporting spans to %s' % (export_path or export_url))
+
+
+def begin(incoming_headers={}, name='request', service_name=None):
+    """Starts handling a request as part of a trace
+
+    :param incoming_headers: headers of the incoming request; when they
+      include a valid `traceparent`, the request joins that trace
+    :param name: name of the span covering the whole request
+    :param service_name: `service.name` of the exported spans, by
+      default the one passed to `configure`
+    :returns: a token to pass to `end`
+    """
+    parsed = parse_traceparent(incoming_headers.get(trace_header))
+    trace_id, parent_id = parsed if parsed else (new_trace_id(), None)
+    state = {
+        'trace_id': trace_id,
+        'span_id': new_span_id(),
+        'parent_span_id': parent_id,
+        'name': name,
+        'service': service_name,
+        'start_ns': time.perf_counter_ns(),
+        'spans': [],
+        'lock': threading.Lock()
+    }
+    return _current.set(state)
+
+
+def end(token, attributes={}):
+    """Finishes the current request, exporting its spans if enabled
+
+    :param token: value returned by `begin`
+    :param attributes: extra attributes for the request span, e.g. the
+      http status code
+    :returns: None
+    """
+    state = _current.get()
+    try:
+        _current.reset(token)
+    except ValueError:  # token created in a different context
+        _current.set(None)
+    if state is None or not enabled:
+        return
+    root = {
+        'name': state['name'],
+        'span_id': state['span_id'],
+        'parent_span_id': state['parent_span_id'],
+        'start_ns': state['start_ns'],
+        'end_ns': time.perf_counter_ns(),
+        'kind': 2,  # SERVER
+        'attributes': attributes
+    }
+    with state['lock']:
+        spans = list(state['spans'])
+    _enqueue(as_otlp(state['trace_id'], root, spans, state['service']))
+
+
+def current_trace_id():
+    state = _current.get()
+    return state['trace_id'] if state else None
+
+
+def headers():
+    """Headers to propagate the current trace on a call to another service
+
+    :returns: dict with the `traceparent` header, or an empty dict when
+      not handling a request
+    :rtype: dict
+    """
+    state = _current.get()
+    if state is None:
+        return {}
+    return {trace_header: as_traceparent(state['trace_id'], state['span_id'])}
+
+
+def record_span(name, start_ns, end_ns):
+    """Records a finished span in the current trace, see `citimings.timing`
+
+    :param name: name of the phase
+    :param start_ns: `time.perf_counter_ns` when the phase started
+    :param end_ns: `time.perf_counter_ns` when the phase ended
+    :returns: None
+    """
+    if not enabled:
+        return
+    state = _current.get()
+    if state is None:
+        return
+    with state['lock']:
+        state['spans'].append({
+            'name': name,
+            'span_id': new_span_id(),
+            'start_ns': start_ns,
+            'end_ns': end_ns,
+            'kind': 1  # INTERNAL
+        })
+
+
+def _assign_parents(root, spans):
+    """Nests spans under the smallest span enclosing them
+
+    Timings are reported bottom-up, so a phase does not know its parent
+    when it finishes; we recover the nesting from the time intervals.
+    """
+    by_size = sorted(spans, key=lambda s: s['end_ns'] - s['start_ns'])
+    for i, span in enumerate(by_size):
+        span['parent_span_id'] = root['span_id']
+        for cand in by_size[i + 1:]:
+            if (cand['start_ns'] <= span['start_ns'] and
+                    span['end_ns'] <= cand['end_ns']):
+                span['parent_span_id'] = cand['span_id']
+                break
+    return spans
+
+
+def _otlp_attr(key, value):
+    if type(value) is bool:
+        return {'key': key, 'value': {'boolValue': value}}
+    if type(value) is int:
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if type(value) is float:
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def _otlp_span(trace_id, span):
+    result = {
+        'traceId': trace_id,
+        'spanId': span['span_id'],
+        'name': span['name'],
+        'kind': span['kind'],
+        'startTimeUnixNano': str(span['start_ns'] + _epoch_offset_ns),
+        'endTimeUnixNano': str(span['end_ns'] + _epoch_offset_ns),
+        'attributes': [_otlp_attr(k, v)
+                       for k, v in span.get('attributes', {}).items()]
+    }
+    if span.get('parent_span_id'):
+        result['parentSpanId'] = span['parent_span_id']
+    return result
+
+
+def as_otlp(trace_id, root, spans, service_name=None):
+    """Converts the spans of a request into an OTLP/JSON export request
+
+    :param trace_id: hex trace id
+    :param root: the span covering the whole request
+    :param spans: the spans recorded while handling the request
+    :param service_name: `service.name` of the spans, by default the
+      one passed to `configure`
+    :returns: a dict following the `ExportTraceServiceRequest` schema
+    :rtype: dict
+    """
+    all_spans = [root] + _assign_parents(root, spans)
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attr(
+                'service.name', service_name or service)]},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [_otlp_span(trace_id, s) for s in all_spans]
+            }]
+        }]
+    }
+
+
+def _enqueue(otlp):
+    global _exporter
+    _export_queue.put(otlp)
+    if _exporter is None or not _exporter.is_alive():
+        _exporter = threading.Thread(target=_export_loop,
+                                     name='citrace-exporter', daemon=True)
+        _exporter.start()
+
+
+def export(otlp):
+    """Writes or posts an OTLP/JSON export request"""
+    if export_path is not None:
+        os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+        with _file_lock:
+            with open(export_path, 'a', encoding='utf-8') as out_f:
+                out_f.write(json.dumps(otlp) + '\n')
+    if export_url is not None:
+        import requests
+        requests.post(export_url, json=otlp, timeout=2)
+
+
+def _export_loop():
+    while True:
+        otlp = _export_queue.get()
+        try:
+            export(otlp)
+        except Exception as e:
+            logger.warning('Failed to export spans: %s' % e)
+        finally:
+            _export_queue.task_done()
+
+
+def flush():
+    """Blocks until all pending spans have been exported"""
+    _export_queue.join()
+
+
+def register_hooks(app, service_name=None):
+    """Makes a flask `app` join and propagate traces
+
+    :param app: the flask app
+    :param service_name: `service.name` of the spans of the requests
+      handled by `app`, by default the one passed to `configure`
+    :returns: None
+    """
+    from flask import g, request
+
+    @app.before_request
+    def citrace_begin():
+        g.citrace_token = begin(request.headers, name='%s %s' % (
+            request.method, request.path), service_name=service_name)
+
+    @app.after_request
+    def citrace_header(resp):
+        trace_id = current_trace_id()
+        if trace_id is not None:
+            resp.headers['X-Trace-Id'] = trace_id
+        return resp
+
+    @app.teardown_request
+    def citrace_end(exc):
+        token = g.pop('citrace_token', None)
+        if token is not None:
+            end(token, {'error': str(exc)} if exc else {})
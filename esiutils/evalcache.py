@@ -0,0 +1,165 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Persisted results of the self-evaluations run when loading models
+
+Evaluating a model at startup (e.g. on STS-B, FNC-1 or CLEF'19) can
+take minutes. The result of an evaluation only depends on the model
+files and the evaluation settings, so we store it as a json record
+named after the sha256 digest of the model and the settings. On
+startup, a matching record is reused; otherwise the evaluation can run
+in a background thread while the service already handles requests.
+
+The state of each evaluation is available via `status`, which services
+report in their health endpoints.
+"""
+import os
+import json
+import logging
+import threading
+from esiutils import bot_describer, cfgu, hashu, isodate
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_evals = {}
+
+
+def cache_settings(cfg_section):
+    """Reads the evaluation cache settings from a config section
+
+    :param cfg_section: a section of the `acred.ini` config, or a dict.
+      Relevant keys are `eval_cache_dir` and `eval_in_background`
+    :returns: dict with keyword args for `cached_eval`
+    :rtype: dict
+    """
+    return {
+        'cache_dir': cfg_section.get('eval_cache_dir', None),
+        'background': cfgu.get_bool(cfg_section, 'eval_in_background')
+    }
+
+
+def model_digest(paths):
+    """Calculates a single digest for the files defining a model
+
+    :param paths: list of paths to model files, e.g. `pytorch_model.bin`
+      and `config.json`. Missing files are ignored.
+    :returns: a digest for the combination of files
+    :rtype: str
+    """
+    mos = [bot_describer.path_as_media_object(path) for path in paths]
+    return hashu.hash_dict({
+        'sha256Digests': [mo['sha256Digest'] if mo else None for mo in mos]})
+
+
+def record_path(name, digest, eval_cfg, cache_dir):
+    key = hashu.clean_b64(hashu.hash_dict({'digest': digest, 'cfg': eval_cfg}))
+    return os.path.join(cache_dir, '%s-%s.json' % (name, key))
+
+
+def _to_json_val(o):
+    if hasattr(o, 'item'):  # numpy and torch scalars
+        return o.item()
+    return str(o)
+
+
+def read_record(path):
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as in_f:
+            return json.load(in_f)
+    except Exception as e:
+        logger.warning('Ignoring unreadable evaluation record %s: %s' % (
+            path, e))
+        return None
+
+
+def write_record(path, record):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w', encoding='utf-8') as out_f:
+        json.dump(record, out_f, indent=2, default=_to_json_val)
+    os.replace(tmp_path, path)
+
+
+def _set_status(name, **kwargs):
+    with _lock:
+        _evals[name] = {**_evals.get(name, {}), 'name': name, **kwargs}
+
+
+def _run_eval(name, digest, eval_cfg, eval_fn, path):
+    _set_status(name, status='running', dateStarted=isodate.now_utc_timestamp())
+    try:
+        result = eval_fn()
+        record = {
+            '@type': 'ModelEvaluation',
+            'name': name,
+            'modelDigest': digest,
+            'evalConfig': eval_cfg,
+            'dateCreated': isodate.now_utc_timestamp(),
+            'result': result
+        }
+        if path is not None:
+            write_record(path, record)
+            # reload so the status only holds json values
+            record = read_record(path) or record
+        _set_status(name, status='done', record=record)
+        logger.info('Finished evaluation %s' % name)
+    except Exception as e:
+        logger.exception(e)
+        _set_status(name, status='failed', error=str(e))
+
+
+def cached_eval(name, digest, eval_cfg, eval_fn, cache_dir=None,
+                background=False):
+    """Runs a model self-evaluation, unless a matching record exists
+
+    :param name: name of the evaluation, e.g. `fnc1_stance`
+    :param digest: digest of the evaluated model, see `model_digest`
+    :param eval_cfg: dict with the settings affecting the evaluation
+      result, e.g. the number of samples
+    :param eval_fn: function without arguments that performs the
+      evaluation and returns its (json-serializable) result
+    :param cache_dir: folder where records are stored. If None,
+      records are not persisted.
+    :param background: when True and no record exists, run `eval_fn`
+      in a daemon thread and return immediately
+    :returns: the evaluation record, or None if the evaluation is still
+      running in the background or failed
+    :rtype: dict or None
+    """
+    path = None
+    if cache_dir is not None:
+        path = record_path(name, digest, eval_cfg, cache_dir)
+        record = read_record(path)
+        if record is not None and record.get('modelDigest') == digest:
+            logger.info('Reusing evaluation record %s' % path)
+            _set_status(name, status='cached', record=record)
+            return record
+    _set_status(name, status='pending')
+    if background:
+        threading.Thread(
+            target=_run_eval, name='eval-%s' % name, daemon=True,
+            args=(name, digest, eval_cfg, eval_fn, path)).start()
+        return None
+    _run_eval(name, digest, eval_cfg, eval_fn, path)
+    return _evals[name].get('record')
+
+
+def status():
+    """Returns the state of all the evaluations in this process
+
+    :returns: dict from evaluation names to dicts with at least a
+      `status` field, one of `pending`, `running`, `cached`, `done`
+      or `failed`
+    :rtype: dict
+    """
+    with _lock:
+        return {name: dict(st) for name, st in _evals.items()}
+
+
+def is_settled():
+    """True if no evaluation is pending or running in the background"""
+    return all(st['status'] in ['cached', 'done', 'failed']
+               for st in status().values())
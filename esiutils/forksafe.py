@@ -0,0 +1,70 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Utilities for loading models once in a uwsgi master before forking
+
+When `lazy-apps` is disabled, uwsgi imports the app in the master
+process and forks the workers from it, so read-only models and indices
+are shared copy-on-write between workers. For this to work:
+
+ - torch models must be frozen (eval mode, no gradients), so that
+   requests never write to the parameter tensors
+ - no torch inference may run in the master before forking, otherwise
+   the OpenMP thread pool of the master is inherited in a broken state
+   and workers hang on their first inference. Use `run_after_fork` for
+   self-tests and warmups.
+
+See `wsgi/README.md` for the thread-safety audit of the request paths.
+"""
+import logging
+from esiutils import cfgu
+
+logger = logging.getLogger(__name__)
+
+
+def preload_enabled(cfg_section):
+    """Checks whether the `preload` option is enabled in a config section
+
+    :param cfg_section: a section of the `acred.ini` config, or a dict
+    :returns: True if the section specifies `preload = true`
+    :rtype: bool
+    """
+    return cfgu.get_bool(cfg_section, 'preload')
+
+
+def freeze_torch_model(model):
+    """Prepares a torch model to be shared read-only between processes
+
+    :param model: a `torch.nn.Module`
+    :returns: the same model, in eval mode and without gradients
+    :rtype: torch.nn.Module
+    """
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad_(False)
+    return model
+
+
+def in_uwsgi_master():
+    try:
+        import uwsgi
+    except ImportError:
+        return False
+    return uwsgi.worker_id() == 0
+
+
+def run_after_fork(fn):
+    """Runs `fn` in each worker after forking
+
+    When not running in a uwsgi master (e.g. in `lazy-apps` mode or when
+    launched via `runsrv.py`), `fn` is executed immediately.
+
+    :param fn: a function without arguments
+    :returns: None
+    """
+    if in_uwsgi_master():
+        from uwsgidecorators import postfork
+        logger.info('Deferring %s until after fork' % fn.__name__)
+        postfork(fn)
+    else:
+        fn()
@@ -0,0 +1,198 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Liveness and readiness reporting for the acred services
+
+A service is *live* as soon as it can answer http requests. It is
+*ready* once its models and indices are loaded and a warmup inference
+has run, so that load balancers do not route requests to workers which
+are still loading or which would pay the cost of the first inference.
+
+Services call `warmup` for each of their models and `mark_ready` when
+done, then `register_routes` to expose `/health/live` and
+`/health/ready` (also under the `/<app_name>` prefix used by nginx).
+When several services share a process, e.g. the `modelserver` of
+`runsrv.py`, the process is only ready once each of the components
+passed to `expect` has been marked ready. Such a process can also
+`defer_warmups` until the services are wired together.
+"""
+import os
+import time
+import logging
+import threading
+from esiutils import citimings, evalcache, forksafe
+
+logger = logging.getLogger(__name__)
+
+_started = time.time()
+_ready = threading.Event()
+_lock = threading.Lock()
+_warmups = {}
+_expected = set()
+_marked = set()
+_deferred = None  # (warmup_fn, after_fork) tuples, see `defer_warmups`
+
+
+def warmup(name, warmup_fn):
+    """Runs a warmup inference and records its outcome
+
+    :param name: name of the warmed up component
+    :param warmup_fn: function without arguments that performs a
+      representative inference
+    :returns: True if the warmup succeeded
+    :rtype: bool
+    """
+    start = citimings.start()
+    try:
+        warmup_fn()
+        result = {'status': 'done', **citimings.timing(name, start)}
+    except Exception as e:
+        logger.exception(e)
+        result = {'status': 'failed', 'error': str(e),
+                  **citimings.timing(name, start)}
+    with _lock:
+        _warmups[name] = result
+    return result['status'] == 'done'
+
+
+def expect(components):
+    """Requires each of `components` to be marked ready before this
+    process is ready
+
+    :param components: names passed to `mark_ready` by each service
+    :returns: None
+    """
+    with _lock:
+        _expected.update(components)
+
+
+def mark_ready(component=None):
+    """Flags this process as ready, unless a warmup failed
+
+    :param component: name of the service whose models are ready, the
+      process is not ready until all `expect`ed components are
+    :returns: None
+    """
+    with _lock:
+        failed = [name for name, w in _warmups.items()
+                  if w['status'] != 'done']
+        if not failed and component is not None:
+            _marked.add(component)
+        pending = _expected - _marked
+    if failed:
+        logger.error('Not ready, failed warmups %s' % failed)
+        return
+    if pending:
+        logger.info('Waiting for %s to be ready' % sorted(pending))
+        return
+    logger.info('Ready to serve requests')
+    _ready.set()
+
+
+def run_warmups(warmups_fn, after_fork=False):
+    """Runs the warmups of a service, unless they are deferred
+
+    :param warmups_fn: function without arguments which calls `warmup`
+      for each model of the service and then `mark_ready`
+    :param after_fork: whether to run it in each uwsgi worker after
+      forking, see `forksafe.run_after_fork`
+    :returns: None
+    """
+    with _lock:
+        if _deferred is not None:
+            logger.info('Deferring %s' % warmups_fn.__name__)
+            _deferred.append((warmups_fn, after_fork))
+            return
+    _run_warmups(warmups_fn, after_fork)
+
+
+def _run_warmups(warmups_fn, after_fork):
+    if after_fork:
+        forksafe.run_after_fork(warmups_fn)
+    else:
+        warmups_fn()
+
+
+def defer_warmups():
+    """Queues the `run_warmups` of the services imported from now on
+
+    E.g. when a service calls another one in the same process, which is
+    wired in after importing both. Call `run_deferred_warmups` once done.
+    """
+    global _deferred
+    with _lock:
+        if _deferred is None:
+            _deferred = []
+
+
+def run_deferred_warmups():
+    """Runs the warmups queued since `defer_warmups`, in order"""
+    global _deferred
+    with _lock:
+        deferred, _deferred = _deferred or [], None
+    for warmups_fn, after_fork in deferred:
+        _run_warmups(warmups_fn, after_fork)
+
+
+def reset():
+    """Forgets all warmups and the readiness of this process"""
+    global _deferred
+    with _lock:
+        _deferred = None
+        _warmups.clear()
+        _expected.clear()
+        _marked.clear()
+    _ready.clear()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def liveness():
+    return {
+        'status': 'live',
+        'pid': os.getpid(),
+        'uptime_secs': int(time.time() - _started)
+    }
+
+
+def readiness():
+    with _lock:
+        warmups = {name: dict(w) for name, w in _warmups.items()}
+        pending = sorted(_expected - _marked)
+    return {
+        'status': 'ready' if is_ready() else 'not_ready',
+        'pid': os.getpid(),
+        'warmups': warmups,
+        'pending': pending,
+        'evaluations': evalcache.status()
+    }
+
+
+def register_routes(app, app_name):
+    """Adds the health endpoints to a flask `app`
+
+    :param app: the flask app
+    :param app_name: name of the app, routes are registered both at
+      the root and under `/<app_name>`
+    :returns: None
+    """
+    from flask import jsonify
+
+    def health_live():
+        return jsonify(liveness())
+
+    def health_ready():
+        resp = jsonify(readiness())
+        resp.status_code = 200 if is_ready() else 503
+        return resp
+
+    for prefix in ['', '/' + app_name]:
+        app.add_url_rule(prefix + '/health/live', 'health_live',
+                         health_live, methods=['GET'])
+        app.add_url_rule(prefix + '/health/ready', 'health_ready',
+                         health_ready, methods=['GET'])
+    # also report the readiness under the plain health route
+    app.add_url_rule('/' + app_name + '/health', 'health_ready',
+                     health_ready, methods=['GET'])
@@ -0,0 +1,130 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Utility for finding near-duplicate texts
+
+Texts are normalised (case, punctuation, urls, @mentions and a
+leading `RT` are ignored) and represented as a set of word uni- and
+bi-grams. The Jaccard similarity between two such sets is estimated
+via MinHash signatures, which are cheap to compare.
+
+A single word can flip the meaning of a claim while barely changing
+its shingles, e.g. `vaccines do not cause autism` or `taxes rose 20%`
+vs `taxes rose 30%`. So texts are only clustered together when they
+also have the same negation words and numbers, see `guard_tokens`.
+"""
+import re
+import zlib
+import unicodedata
+import numpy as np
+
+default_n_perm = 128
+
+_mersenne_prime = np.uint64((1 << 61) - 1)
+_url_re = re.compile(r'https?://\S+')
+_mention_re = re.compile(r'@\w+')
+_non_word_re = re.compile(r'[\W_]+')
+_perms = {}
+
+# `t` is the remainder of contractions such as `don't` or `isn't`
+negation_words = frozenset([
+    'no', 'not', 'never', 'none', 'nothing', 'nobody', 'nowhere',
+    'neither', 'nor', 'without', 'cannot', 't'])
+
+
+def tokens(text):
+    """Normalised tokens of a text
+
+    :param text: a sentence or short text, e.g. a tweet
+    :returns: list of lower-case word tokens
+    :rtype: list of str
+    """
+    norm = unicodedata.normalize('NFKC', text).casefold()
+    norm = _mention_re.sub(' ', _url_re.sub(' ', norm))
+    toks = _non_word_re.sub(' ', norm).split()
+    if len(toks) > 0 and toks[0] == 'rt':
+        toks = toks[1:]
+    return toks
+
+
+def shingles(text):
+    """Set of word uni- and bi-grams of a text, see `tokens`"""
+    toks = tokens(text)
+    return set(toks) | set(' '.join(bg) for bg in zip(toks, toks[1:]))
+
+
+def guard_tokens(text):
+    """Negation words and numbers of a text, see `tokens`
+
+    Near-duplicates must have the same guard tokens.
+
+    :rtype: frozenset of str
+    """
+    return frozenset(tok for tok in tokens(text)
+                     if tok in negation_words or any(c.isdigit() for c in tok))
+
+
+def _permutations(n_perm):
+    if n_perm not in _perms:
+        rng = np.random.RandomState(n_perm)
+        _perms[n_perm] = (
+            rng.randint(1, 1 << 31, size=n_perm).astype(np.uint64),
+            rng.randint(0, 1 << 31, size=n_perm).astype(np.uint64))
+    return _perms[n_perm]
+
+
+def minhash_signature(shingle_set, n_perm=default_n_perm):
+    """Calculates the MinHash signature of a set of shingles
+
+    :param shingle_set: set of str
+    :param n_perm: number of hash functions in the signature
+    :returns: array with `n_perm` values, or None for an empty set
+    :rtype: numpy.ndarray
+    """
+    if len(shingle_set) == 0:
+        return None
+    hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingle_set],
+                      dtype=np.uint64)
+    a, b = _permutations(n_perm)
+    # (a * h + b) fits in 63 bits since a, b < 2^31 and h < 2^32
+    permuted = (np.outer(hashes, a) + b) % _mersenne_prime
+    return permuted.min(axis=0)
+
+
+def estimate_jaccard(sig_a, sig_b):
+    """Estimates the Jaccard similarity of the sets of two signatures"""
+    if sig_a is None or sig_b is None:
+        return 0.0
+    return float(np.mean(sig_a == sig_b))
+
+
+def cluster(texts, threshold, n_perm=default_n_perm):
+    """Groups near-duplicate texts
+
+    Each text joins the first cluster whose representative (its first
+    text) has the same `guard_tokens` and an estimated Jaccard
+    similarity of at least `threshold`, otherwise it starts a new
+    cluster.
+
+    :param texts: list of str
+    :param threshold: minimum estimated Jaccard similarity in [0, 1]
+    :param n_perm: number of hash functions in the MinHash signatures
+    :returns: list of clusters, each a list of indices in `texts`. The
+      first index in each cluster is its representative. Clusters are
+      sorted by their representative
+    :rtype: list of list of int
+    """
+    clusters, rep_sigs, rep_guards = [], [], []
+    for i, text in enumerate(texts):
+        sig = minhash_signature(shingles(text), n_perm)
+        guards = guard_tokens(text)
+        for c, rep_sig, rep_guard in zip(clusters, rep_sigs, rep_guards):
+            if guards == rep_guard and estimate_jaccard(sig, rep_sig) >= threshold:
+                c.append(i)
+                break
+        else:
+            clusters.append([i])
+            rep_sigs.append(sig)
+            rep_guards.append(guards)
+    return clusters
@@ -0,0 +1,113 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Optional ONNX Runtime inference for the RoBERTa models
+
+When a service section of `acred.ini` sets `inference_backend =
+onnxruntime`, the model is run through an ORT session on the
+`model.onnx` file exported into its saved model folder (see
+`scripts/export_onnx.py`). If the file is missing or `onnxruntime` is
+not installed, the service logs a warning and keeps using torch.
+
+ORT sessions start their own thread pools, so they are only created on
+the first forward pass, i.e. in the uwsgi workers when the model is
+preloaded in the master (see `esiutils.forksafe`).
+"""
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+onnx_fname = 'model.onnx'
+
+
+def onnx_path(model_dir):
+    return os.path.join(model_dir, onnx_fname)
+
+
+def backend(cfg_section):
+    """Name of the inference backend configured in a config section
+
+    :param cfg_section: a section of the `acred.ini` config, or a dict
+    :returns: `torch` (default) or `onnxruntime`
+    :rtype: str
+    """
+    val = str(cfg_section.get('inference_backend', 'torch')).strip().lower()
+    if val not in ['torch', 'onnxruntime']:
+        raise ValueError('Unsupported inference_backend %s' % val)
+    return val
+
+
+def session_options(intra_op_threads=0):
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if intra_op_threads > 0:
+        opts.intra_op_num_threads = intra_op_threads
+    # models are run one forward pass at a time, see `esiutils.scheduler`
+    opts.inter_op_num_threads = 1
+    return opts
+
+
+def create_session(path, intra_op_threads=0):
+    import onnxruntime as ort
+    return ort.InferenceSession(
+        path, sess_options=session_options(intra_op_threads),
+        providers=['CPUExecutionProvider'])
+
+
+def load_session(model_dir, cfg_section):
+    """Prepares the ORT session for a saved model if configured
+
+    :param model_dir: folder of the saved torch model
+    :param cfg_section: a section of the `acred.ini` config, or a dict.
+      Relevant keys are `inference_backend` and `ort_intra_op_threads`
+    :returns: an `OrtSession` dict to pass to `run` or None if torch
+      should be used
+    :rtype: dict
+    """
+    if cfg_section is None or backend(cfg_section) != 'onnxruntime':
+        return None
+    path = onnx_path(model_dir)
+    if not os.path.isfile(path):
+        logger.warning('No %s in %s, falling back to torch' % (
+            onnx_fname, model_dir))
+        return None
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        logger.warning('onnxruntime is not installed, falling back to torch')
+        return None
+    return {
+        '@type': 'OrtSession',
+        'path': path,
+        'intra_op_threads': int(cfg_section.get('ort_intra_op_threads', 0)),
+        'session': None,
+        'lock': threading.Lock()
+    }
+
+
+def _session(ort_session):
+    with ort_session['lock']:
+        if ort_session['session'] is None:
+            ort_session['session'] = create_session(
+                ort_session['path'], ort_session['intra_op_threads'])
+            logger.info('Created ONNX Runtime session for %s' % (
+                ort_session['path']))
+    return ort_session['session']
+
+
+def run(ort_session, **inputs):
+    """Runs a forward pass, returns the first output
+
+    :param ort_session: an `OrtSession` as returned by `load_session`
+    :param inputs: named numpy arrays, e.g. `input_ids`. Inputs which
+      are not used by the exported graph are ignored
+    :rtype: numpy.ndarray
+    """
+    session = _session(ort_session)
+    names = [i.name for i in session.get_inputs()]
+    feeds = {name: inputs[name] for name in names}
+    return session.run(None, feeds)[0]
@@ -0,0 +1,145 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Dimension-reduced search index with full-dimension re-ranking
+
+A PCA projection to `n_components` dims is fitted on the (l2
+normalised) corpus vectors. Searching first scores all vectors in the
+reduced space, which is `dim / n_components` times cheaper, and then
+re-ranks the best `n_candidates` using the full vectors, so the
+returned similarities are exact cosine similarities.
+
+Inner products are preserved up to the variance discarded by the
+projection: for a query `q`, corpus vector `v` and corpus mean `m`,
+`q.v = P(q-m).P(v-m) + v.m + (q.m - m.m)` when `q - m` and `v - m`
+lie in the projected subspace, so the index also stores `v.m` for each
+corpus vector.
+"""
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def fit(vectors, n_components, max_samples=50000, seed=42):
+    """Fits a PCA projection on a sample of `vectors`
+
+    :param vectors: matrix of shape (n, dim)
+    :param n_components: number of dims to keep
+    :param max_samples: maximum number of vectors used for the fit
+    :param seed: seed for sampling the vectors
+    :returns: dict with the `mean` (dim) and the `components`
+      (n_components, dim) sorted by explained variance, and the
+      `explained_variance_ratio` of the kept components
+    :rtype: dict
+    """
+    assert 0 < n_components <= vectors.shape[1], '%s' % n_components
+    sample = vectors
+    if vectors.shape[0] > max_samples:
+        rng = np.random.RandomState(seed)
+        sample = vectors[rng.choice(vectors.shape[0], max_samples,
+                                    replace=False)]
+    sample = np.asarray(sample, dtype=np.float64)
+    mean = sample.mean(axis=0)
+    centered = sample - mean
+    cov = centered.T @ centered / max(1, sample.shape[0] - 1)
+    eigvals, eigvecs = np.linalg.eigh(cov)  # ascending eigenvalues
+    order = np.argsort(eigvals)[::-1][:n_components]
+    total_var = max(float(eigvals.sum()), 1e-12)
+    return {
+        'mean': mean.astype(np.float32),
+        'components': eigvecs[:, order].T.astype(np.float32),
+        'explained_variance_ratio': float(eigvals[order].sum() / total_var)
+    }
+
+
+def project(pca, vectors):
+    """Projects vectors onto the reduced space, shape (n, n_components)"""
+    return ((vectors - pca['mean']) @ pca['components'].T).astype(np.float32)
+
+
+def build(vectors, n_components, **kwargs):
+    """Builds a reduced index for l2 normalised `vectors`
+
+    :returns: a `PCAIndex` dict, see `fit`. It also includes the
+      `reduced` vectors and the `bias` (inner product of each vector
+      with the mean)
+    :rtype: dict
+    """
+    pca = fit(vectors, n_components, **kwargs)
+    return {
+        **pca,
+        'reduced': project(pca, vectors),
+        'bias': (vectors @ pca['mean']).astype(np.float32)
+    }
+
+
+def index_path(index_dir, digest, n_components):
+    return os.path.join(index_dir, '%s.pca%d.npz' % (digest, n_components))
+
+
+def save(pca_index, path):
+    # write to a tmp file first, other processes may be reading
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **{k: np.asarray(v) for k, v in pca_index.items()})
+    os.replace(tmp_path, path)
+
+
+def load(path):
+    with np.load(path) as data:
+        result = {k: data[k] for k in data.files}
+    result['explained_variance_ratio'] = float(
+        result['explained_variance_ratio'])
+    return result
+
+
+def load_or_build(vectors, n_components, index_dir, digest):
+    """Loads the reduced index stored for `digest` or builds and stores it
+
+    :param vectors: l2 normalised corpus vectors
+    :param n_components: number of dims to keep
+    :param index_dir: folder where the index is stored
+    :param digest: digest of the corpus vectors, e.g. sha256 of the tsv
+    :rtype: dict
+    """
+    path = index_path(index_dir, digest, n_components)
+    if os.path.exists(path):
+        logger.info('Loading reduced index from %s' % path)
+        return load(path)
+    pca_index = build(vectors, n_components)
+    os.makedirs(index_dir, exist_ok=True)
+    save(pca_index, path)
+    logger.info('Stored %d-dim index (%.1f%% of variance) in %s' % (
+        n_components, 100 * pca_index['explained_variance_ratio'], path))
+    return pca_index
+
+
+def search(pca_index, vectors, qvecs, topn, n_candidates=100):
+    """Searches the reduced index and re-ranks with the full vectors
+
+    :param pca_index: a `PCAIndex` as returned by `build`
+    :param vectors: the l2 normalised corpus vectors, shape (n, dim)
+    :param qvecs: l2 normalised query vectors, shape (n_q, dim)
+    :param topn: number of results per query
+    :param n_candidates: number of candidates per query re-ranked with
+      the full vectors, at least `topn`
+    :returns: tuple with the cosine similarities and the indices of
+      the `topn` vectors for each query, both of shape (n_q, topn),
+      sorted by descending similarity
+    :rtype: tuple
+    """
+    n_vecs = vectors.shape[0]
+    topn = min(topn, n_vecs)
+    n_cands = min(max(topn, n_candidates), n_vecs)
+    approx = project(pca_index, qvecs) @ pca_index['reduced'].T
+    approx += pca_index['bias']
+    if n_cands < n_vecs:
+        cands = np.argpartition(-approx, n_cands - 1, axis=1)[:, :n_cands]
+    else:
+        cands = np.tile(np.arange(n_vecs), (qvecs.shape[0], 1))
+    # exact similarities for the candidates only
+    sims = np.einsum('qd,qcd->qc', qvecs, vectors[cands])
+    order = np.argsort(-sims, axis=1)[:, :topn]
+    return (np.take_along_axis(sims, order, axis=1),
+            np.take_along_axis(cands, order, axis=1))
@@ -0,0 +1,91 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""In-memory cache of model predictions
+
+Predictions are keyed by (item key, model identifier), e.g. the
+`hashu.calc_str_hash` of a sentence and the `identifier` of the bot
+describing the model, so entries are never reused across models. The
+least recently used entries are evicted once the cache holds more than
+`maxsize` predictions.
+"""
+import threading
+import collections
+from esiutils import cimetrics
+
+
+def create(name, maxsize=100000):
+    """Creates a prediction cache
+
+    :param name: name of the cache, used for the cache metrics
+    :param maxsize: maximum number of cached predictions, 0 disables
+      the cache
+    :returns: a prediction cache dict
+    :rtype: dict
+    """
+    return {
+        'name': name,
+        'maxsize': maxsize,
+        'entries': collections.OrderedDict(),
+        'lock': threading.Lock()
+    }
+
+
+def get_many(cache, keys, model_id):
+    """Looks up the cached predictions for `keys`
+
+    :returns: list aligned with `keys` with the cached prediction or
+      None when missing
+    :rtype: list
+    """
+    result = []
+    with cache['lock']:
+        entries = cache['entries']
+        for key in keys:
+            value = entries.get((key, model_id))
+            if value is not None:
+                entries.move_to_end((key, model_id))
+            result.append(value)
+    for value in result:
+        cimetrics.count_cache(cache['name'], value is not None)
+    return result
+
+
+def put_many(cache, key_values, model_id):
+    """Stores predictions
+
+    :param key_values: list of (key, prediction) tuples
+    :param model_id: identifier of the model making the predictions
+    """
+    if cache['maxsize'] <= 0:
+        return
+    with cache['lock']:
+        entries = cache['entries']
+        for key, value in key_values:
+            entries[(key, model_id)] = value
+            entries.move_to_end((key, model_id))
+        while len(entries) > cache['maxsize']:
+            entries.popitem(last=False)
+
+
+def predict_many(cache, keys, items, model_id, predict_fn):
+    """Returns the predictions for `items`, only predicting cache misses
+
+    :param keys: list of cache keys, aligned with `items`
+    :param items: list of items to predict, e.g. sentences
+    :param model_id: identifier of the model making the predictions
+    :param predict_fn: function that maps the list of missing items onto
+      an aligned list of predictions
+    :returns: list of predictions aligned with `items`
+    :rtype: list
+    """
+    preds = get_many(cache, keys, model_id)
+    miss_idxs = [i for i, pred in enumerate(preds) if pred is None]
+    if len(miss_idxs) > 0:
+        miss_preds = predict_fn([items[i] for i in miss_idxs])
+        assert len(miss_preds) == len(miss_idxs), '%s != %s' % (
+            len(miss_preds), len(miss_idxs))
+        for i, pred in zip(miss_idxs, miss_preds):
+            preds[i] = pred
+        put_many(cache, [(keys[i], preds[i]) for i in miss_idxs], model_id)
+    return preds
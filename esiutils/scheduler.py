@@ -0,0 +1,104 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Shared inference scheduler for processes hosting several models
+
+When the sentence encoder, the stance predictor and the worthiness
+checker are served by a single process (see `runsrv.py -service
+modelserver`), running their forward passes concurrently makes them
+compete for the same torch thread pool. Once `enable`d, `run` lets at
+most `max_concurrent` forward passes run at a time and, whenever a slot
+frees up, hands it to the next model type in round-robin order, so a
+burst of requests for one model cannot starve the others.
+
+While the scheduler is not enabled (the default, e.g. one model per
+process), `run` simply calls the function.
+"""
+import time
+import logging
+import threading
+import collections
+from esiutils import cimetrics
+
+logger = logging.getLogger(__name__)
+
+enabled = False
+
+_cond = threading.Condition()
+_queues = collections.OrderedDict()  # model type -> deque of tickets
+_state = {'running': 0, 'max_concurrent': 1, 'last_type': None}
+
+
+def enable(max_concurrent=1, torch_threads=0):
+    """Enables the scheduler for this process
+
+    :param max_concurrent: number of forward passes that may run at the
+      same time
+    :param torch_threads: size of the torch intra-op thread pool shared
+      by all models, 0 keeps the torch default
+    :returns: None
+    """
+    global enabled
+    if torch_threads > 0:
+        import torch
+        torch.set_num_threads(torch_threads)
+    with _cond:
+        _state['max_concurrent'] = max(1, max_concurrent)
+    enabled = True
+    logger.info('Enabled inference scheduler with %d slots' % max_concurrent)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def _next_ticket():
+    """Head of the first non-empty queue after the last scheduled type"""
+    types = list(_queues.keys())
+    if _state['last_type'] in types:
+        start = types.index(_state['last_type']) + 1
+        types = types[start:] + types[:start]
+    for model_type in types:
+        if _queues[model_type]:
+            return _queues[model_type][0]
+    return None
+
+
+def run(model_type, fn):
+    """Runs a forward pass `fn` when it is the turn of `model_type`
+
+    :param model_type: name of the model, e.g. `stance`
+    :param fn: function without arguments which runs the forward pass
+    :returns: the result of `fn`
+    """
+    if not enabled:
+        return fn()
+    ticket = object()
+    start = time.time()
+    with _cond:
+        queue = _queues.setdefault(model_type, collections.deque())
+        queue.append(ticket)
+        while (_state['running'] >= _state['max_concurrent'] or
+               _next_ticket() is not ticket):
+            _cond.wait()
+        queue.popleft()
+        _state['running'] += 1
+        _state['last_type'] = model_type
+    cimetrics.observe('acred_scheduler_wait_ms', (time.time() - start) * 1000,
+                      {'model': model_type})
+    try:
+        return fn()
+    finally:
+        with _cond:
+            _state['running'] -= 1
+            _cond.notify_all()
+
+
+def queued():
+    """Number of forward passes waiting per model type
+
+    :rtype: dict
+    """
+    with _cond:
+        return {model_type: len(q) for model_type, q in _queues.items()}
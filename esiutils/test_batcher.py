@@ -0,0 +1,63 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the batcher
+"""
+import time
+import threading
+import pytest
+from esiutils import batcher
+
+
+def slow_upper(calls):
+    def fn(items):
+        calls.append(list(items))
+        time.sleep(0.05)
+        return [s.upper() for s in items], [len(s) for s in items]
+    return fn
+
+
+def test_submit_single():
+    calls = []
+    b = batcher.create(slow_upper(calls))
+    assert batcher.submit(b, ['a', 'bc']) == (['A', 'BC'], [1, 2])
+    assert calls == [['a', 'bc']]
+
+
+def test_concurrent_requests_share_batches():
+    calls = []
+    b = batcher.create(slow_upper(calls))
+    results = {}
+
+    def run(i):
+        results[i] = batcher.submit(b, ['s%d' % i, 't%d' % i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(8):
+        assert results[i] == (['S%d' % i, 'T%d' % i], [2, 2])
+    # the first request runs alone, the rest queue while it runs
+    assert len(calls) < 8
+    assert sum(len(c) for c in calls) == 16
+
+
+def test_max_batch_size():
+    calls = []
+    b = batcher.create(slow_upper(calls), max_batch_size=3)
+    b['pending'].extend([
+        {'items': ['a', 'b'], 'done': False, 'result': None, 'error': None},
+        {'items': ['c', 'd'], 'done': False, 'result': None, 'error': None}])
+    assert batcher.submit(b, ['e']) == (['E'], [1])
+    assert calls == [['a', 'b'], ['c', 'd', 'e']]
+
+
+def test_errors_are_raised_in_each_request():
+    def fail(items):
+        raise ValueError('boom')
+    b = batcher.create(fail)
+    with pytest.raises(ValueError):
+        batcher.submit(b, ['a'])
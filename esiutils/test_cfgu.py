@@ -0,0 +1,26 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in cfgu
+"""
+import configparser
+import pytest
+from esiutils import cfgu
+
+
+def test_get_bool_01():
+    assert cfgu.get_bool({'a': 'True '}, 'a')
+    assert cfgu.get_bool({'a': 'on'}, 'a')
+    assert cfgu.get_bool({'a': True}, 'a')
+    assert not cfgu.get_bool({'a': 'false'}, 'a')
+    assert not cfgu.get_bool({}, 'a')
+    assert cfgu.get_bool({}, 'a', default=True)
+    with pytest.raises(ValueError):
+        cfgu.get_bool({'a': 'maybe'}, 'a')
+
+
+def test_get_bool_02():
+    config = configparser.ConfigParser()
+    config.read_string('[sect]\nmetrics = true\npreload = 0\n')
+    assert cfgu.get_bool(config['sect'], 'metrics')
+    assert not cfgu.get_bool(config['sect'], 'preload')
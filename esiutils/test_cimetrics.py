@@ -0,0 +1,92 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in cimetrics
+"""
+import pytest
+from esiutils import cimetrics, citimings
+
+
+@pytest.fixture
+def metrics():
+    cimetrics.reset()
+    cimetrics.enable('testsrv')
+    yield cimetrics
+    cimetrics.disable()
+    cimetrics.reset()
+
+
+def test_disabled_01():
+    cimetrics.reset()
+    cimetrics.disable()
+    cimetrics.observe_phase('phase_a', 10)
+    cimetrics.count_cache('cache_a', True)
+    assert cimetrics.as_prometheus_text() == '\n'
+
+
+def test_configure_01():
+    cimetrics.configure('testsrv', {'metrics': 'false'})
+    assert not cimetrics.enabled
+    cimetrics.configure('testsrv', {'metrics': 'True'})
+    assert cimetrics.enabled
+    assert cimetrics.service == 'testsrv'
+    cimetrics.disable()
+
+
+def test_timing_records_phase_01(metrics):
+    citimings.timing('phase_a', citimings.start())
+    citimings.timing('phase_a', citimings.start())
+    text = metrics.as_prometheus_text()
+    assert '# TYPE acred_phase_duration_ms histogram' in text
+    assert 'acred_phase_duration_ms_count{phase="phase_a",service="testsrv"} 2' in text
+    assert 'acred_phase_duration_ms_bucket{phase="phase_a",service="testsrv",le="+Inf"} 2' in text
+
+
+def test_histogram_buckets_01(metrics):
+    for v in [0.5, 3, 3, 20000]:
+        metrics.observe('test_hist', v, buckets=[1, 5, 10])
+    text = metrics.as_prometheus_text()
+    assert 'test_hist_bucket{service="testsrv",le="1"} 1' in text
+    assert 'test_hist_bucket{service="testsrv",le="5"} 3' in text
+    assert 'test_hist_bucket{service="testsrv",le="10"} 3' in text
+    assert 'test_hist_bucket{service="testsrv",le="+Inf"} 4' in text
+    assert 'test_hist_sum{service="testsrv"} 20006.5' in text
+
+
+def test_counters_01(metrics):
+    metrics.count_cache('docstore', True)
+    metrics.count_cache('docstore', True)
+    metrics.count_cache('docstore', False)
+    metrics.count_upstream_error('claimneuralindex')
+    text = metrics.as_prometheus_text()
+    assert 'acred_cache_requests_total{cache="docstore",result="hit",service="testsrv"} 2' in text
+    assert 'acred_cache_requests_total{cache="docstore",result="miss",service="testsrv"} 1' in text
+    assert 'acred_upstream_errors_total{service="testsrv",upstream="claimneuralindex"} 1' in text
+
+
+def test_service_label_per_app_01(metrics):
+    from flask import Flask
+    apps = {name: Flask(name) for name in ['app_a', 'app_b']}
+    for name, app in apps.items():
+        metrics.register_routes(app, name)
+        app.add_url_rule('/hit', 'hit',
+                         lambda: str(metrics.count_cache('cache_a', True)))
+    apps['app_a'].test_client().get('/hit')
+    apps['app_b'].test_client().get('/hit')
+    apps['app_b'].test_client().get('/hit')
+    text = metrics.as_prometheus_text()
+    assert ('acred_cache_requests_total{cache="cache_a",result="hit",'
+            'service="app_a"} 1') in text
+    assert ('acred_cache_requests_total{cache="cache_a",result="hit",'
+            'service="app_b"} 2') in text
+    # outside requests, the service passed to enable is used
+    metrics.count_cache('cache_a', True)
+    assert 'service="testsrv"' in metrics.as_prometheus_text()
+
+
+def test_timing_records_sub_ms_phase_01(metrics):
+    citimings.timing('phase_a', citimings.start())
+    hist = metrics.histograms('acred_phase_duration_ms')[0]
+    assert hist['buckets'][0] < 1
+    # recorded with sub-ms resolution, not truncated to 0
+    assert 0 < hist['sum'] < 1
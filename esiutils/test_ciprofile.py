@@ -0,0 +1,50 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests the sampling profiler in ciprofile
+"""
+import time
+from esiutils import ciprofile
+
+
+def busy_fn(secs):
+    end = time.perf_counter() + secs
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+
+def test_sampler():
+    sampler = ciprofile.start_sampler(interval_ms=1)
+    busy_fn(0.05)
+    profile = ciprofile.stop_sampler(sampler)
+    assert profile['@type'] == 'Profile'
+    assert profile['samples'] > 0
+    assert profile['samples'] == sum(profile['stacks'].values())
+    assert any('busy_fn (test_ciprofile.py' in stack and
+               'test_sampler (test_ciprofile.py' in stack
+               for stack in profile['stacks'])
+    # outermost frame first
+    stack = next(s for s in profile['stacks'] if 'busy_fn' in s)
+    assert stack.index('test_sampler') < stack.index('busy_fn')
+
+
+def test_store(tmp_path):
+    profile = {'samples': 3, 'stacks': {'a;b': 2, 'a': 1}}
+    fname = ciprofile.store(profile, 'tweet', str(tmp_path))
+    assert fname.startswith('tweet-') and fname.endswith('.folded')
+    assert (tmp_path / fname).read_text() == 'a 1\na;b 2\n'
+
+
+def test_settings_and_admin():
+    prof = ciprofile.settings({})
+    assert prof['sample_every'] == 0
+    assert not ciprofile.should_sample(prof)
+    assert not ciprofile.is_admin({'X-Admin-Token': ''}, prof)
+    prof = ciprofile.settings({'profile_admin_token': 's3cret',
+                               'profile_sample_every': '3'})
+    assert ciprofile.is_admin({'X-Admin-Token': 's3cret'}, prof)
+    assert not ciprofile.is_admin({'X-Admin-Token': 'other'}, prof)
+    assert not ciprofile.is_admin({}, prof)
+    assert sum(ciprofile.should_sample(prof) for i in range(30)) == 10
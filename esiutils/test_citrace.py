@@ -0,0 +1,97 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests trace propagation and span export in citrace
+"""
+import json
+from time import sleep
+from flask import Flask, jsonify
+from esiutils import citrace, citimings
+
+
+def test_parse_traceparent():
+    tid, sid = '0af7651916cd43dd8448eb211c80319c', 'b7ad6b7169203331'
+    assert citrace.parse_traceparent('00-%s-%s-01' % (tid, sid)) == (tid, sid)
+    assert citrace.parse_traceparent(citrace.as_traceparent(tid, sid)) == (tid, sid)
+    assert citrace.parse_traceparent(None) is None
+    assert citrace.parse_traceparent('00-xyz-%s-01' % sid) is None
+    assert citrace.parse_traceparent('00-%s-%s-01' % ('0' * 32, sid)) is None
+
+
+def test_headers_outside_request():
+    assert citrace.headers() == {}
+    assert citrace.current_trace_id() is None
+
+
+def test_timings_as_spans(tmp_path):
+    out_path = tmp_path / 'spans.jsonl'
+    citrace.configure('test', {'trace_export_path': str(out_path)})
+    try:
+        incoming = citrace.as_traceparent('ab' * 16, 'cd' * 8)
+        token = citrace.begin({'traceparent': incoming})
+        assert citrace.current_trace_id() == 'ab' * 16
+        outgoing = citrace.parse_traceparent(citrace.headers()['traceparent'])
+        assert outgoing[0] == 'ab' * 16
+        start = citimings.start()
+        inner_start = citimings.start()
+        sleep(0.002)
+        inner = citimings.timing('inner', inner_start)
+        outer = citimings.timing('outer', start, [inner])
+        assert type(outer['total_ms']) is int
+        assert inner['total_ns'] >= 2000000
+        citrace.end(token)
+        citrace.flush()
+    finally:
+        citrace.configure('test', {})
+    assert citrace.headers() == {}
+
+    lines = out_path.read_text().splitlines()
+    assert len(lines) == 1
+    otlp = json.loads(lines[0])
+    rs = otlp['resourceSpans'][0]
+    assert rs['resource']['attributes'][0]['value']['stringValue'] == 'test'
+    spans = {s['name']: s for s in rs['scopeSpans'][0]['spans']}
+    assert set(spans.keys()) == {'request', 'outer', 'inner'}
+    root = spans['request']
+    assert all(s['traceId'] == 'ab' * 16 for s in spans.values())
+    assert root['parentSpanId'] == 'cd' * 8
+    assert root['spanId'] == outgoing[1]
+    assert spans['outer']['parentSpanId'] == root['spanId']
+    assert spans['inner']['parentSpanId'] == spans['outer']['spanId']
+    inner_ns = (int(spans['inner']['endTimeUnixNano']) -
+                int(spans['inner']['startTimeUnixNano']))
+    assert inner_ns >= 2000000
+
+
+def test_flask_hooks():
+    app = Flask(__name__)
+    citrace.register_hooks(app)
+
+    @app.route('/hdrs')
+    def hdrs():
+        return jsonify(citrace.headers())
+
+    client = app.test_client()
+    resp = client.get('/hdrs', headers={
+        'traceparent': citrace.as_traceparent('12' * 16, '34' * 8)})
+    assert resp.headers['X-Trace-Id'] == '12' * 16
+    assert resp.get_json()['traceparent'].startswith('00-' + '12' * 16)
+    resp = client.get('/hdrs')
+    assert len(resp.headers['X-Trace-Id']) == 32
+    assert resp.headers['X-Trace-Id'] != '12' * 16
+
+
+def test_service_name_per_app(tmp_path):
+    out_path = tmp_path / 'spans.jsonl'
+    citrace.configure('shared', {'trace_export_path': str(out_path)})
+    try:
+        app = Flask(__name__)
+        citrace.register_hooks(app, 'app_a')
+        app.add_url_rule('/ok', 'ok', lambda: 'ok')
+        app.test_client().get('/ok')
+        citrace.flush()
+    finally:
+        citrace.configure('test', {})
+    otlp = json.loads(out_path.read_text().splitlines()[0])
+    resource = otlp['resourceSpans'][0]['resource']
+    assert resource['attributes'][0]['value']['stringValue'] == 'app_a'
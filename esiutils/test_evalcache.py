@@ -0,0 +1,63 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in evalcache
+"""
+import time
+import pytest
+from esiutils import evalcache
+
+
+def test_model_digest_01(tmp_path):
+    model_f = tmp_path / 'model.bin'
+    model_f.write_bytes(b'weights')
+    d1 = evalcache.model_digest([str(model_f), str(tmp_path / 'missing')])
+    model_f.write_bytes(b'other weights')
+    d2 = evalcache.model_digest([str(model_f), str(tmp_path / 'missing')])
+    assert d1 != d2
+
+
+def test_cached_eval_01(tmp_path):
+    calls = []
+
+    def eval_fn():
+        calls.append(1)
+        return {'metrics': {'acc': 0.9}}
+
+    rec1 = evalcache.cached_eval('test_eval', 'digest1', {'samples': '10'},
+                                 eval_fn, cache_dir=str(tmp_path))
+    rec2 = evalcache.cached_eval('test_eval', 'digest1', {'samples': '10'},
+                                 eval_fn, cache_dir=str(tmp_path))
+    assert len(calls) == 1
+    assert rec1 == rec2
+    assert rec2['result'] == {'metrics': {'acc': 0.9}}
+    assert evalcache.status()['test_eval']['status'] == 'cached'
+    # different digest or settings require a new evaluation
+    evalcache.cached_eval('test_eval', 'digest2', {'samples': '10'},
+                          eval_fn, cache_dir=str(tmp_path))
+    evalcache.cached_eval('test_eval', 'digest1', {'samples': '20'},
+                          eval_fn, cache_dir=str(tmp_path))
+    assert len(calls) == 3
+
+
+def test_cached_eval_background_01(tmp_path):
+    def eval_fn():
+        time.sleep(0.05)
+        return {'metrics': {}}
+
+    rec = evalcache.cached_eval('test_bg_eval', 'digest1', {}, eval_fn,
+                                cache_dir=str(tmp_path), background=True)
+    assert rec is None
+    for i in range(100):
+        if evalcache.status()['test_bg_eval']['status'] == 'done':
+            break
+        time.sleep(0.01)
+    assert evalcache.status()['test_bg_eval']['status'] == 'done'
+
+
+def test_cache_settings_01():
+    assert evalcache.cache_settings({}) == {
+        'cache_dir': None, 'background': False}
+    assert evalcache.cache_settings({
+        'eval_cache_dir': 'x', 'eval_in_background': 'True'}) == {
+            'cache_dir': 'x', 'background': True}
@@ -0,0 +1,21 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in forksafe
+"""
+import pytest
+from esiutils import forksafe
+
+
+def test_preload_enabled_01():
+    assert forksafe.preload_enabled({'preload': 'true'})
+    assert forksafe.preload_enabled({'preload': ' Yes '})
+    assert not forksafe.preload_enabled({'preload': 'false'})
+    assert not forksafe.preload_enabled({})
+
+
+def test_run_after_fork_01():
+    # outside of a uwsgi master, the function runs immediately
+    calls = []
+    forksafe.run_after_fork(lambda: calls.append(1))
+    assert calls == [1]
@@ -0,0 +1,82 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in health
+"""
+import pytest
+from flask import Flask
+from esiutils import health
+
+
+@pytest.fixture(autouse=True)
+def reset_health():
+    health.reset()
+    yield
+    health.reset()
+
+
+def test_warmup_01():
+    assert health.warmup('test_ok', lambda: 1 + 1)
+    assert not health.warmup('test_fail', lambda: 1 / 0)
+    warmups = health.readiness()['warmups']
+    assert warmups['test_ok']['status'] == 'done'
+    assert warmups['test_fail']['status'] == 'failed'
+    # a failed warmup prevents readiness
+    health.mark_ready()
+    assert not health.is_ready()
+
+
+def test_mark_ready_01():
+    assert health.warmup('test_ok', lambda: 1 + 1)
+    health.mark_ready()
+    assert health.is_ready()
+    health.reset()
+    assert not health.is_ready()
+    assert health.readiness()['warmups'] == {}
+
+
+def test_register_routes_01():
+    app = Flask(__name__)
+    health.register_routes(app, 'testapp')
+    client = app.test_client()
+    ready_paths = ['/health/ready', '/testapp/health/ready', '/testapp/health']
+    for path in ['/health/live', '/testapp/health/live']:
+        resp = client.get(path)
+        assert resp.status_code == 200
+        assert resp.get_json()['status'] == 'live'
+    for path in ready_paths:
+        resp = client.get(path)
+        assert resp.status_code == 503
+        assert resp.get_json()['status'] == 'not_ready'
+    health.warmup('test_ok', lambda: None)
+    health.mark_ready()
+    for path in ready_paths:
+        resp = client.get(path)
+        assert resp.status_code == 200
+        assert resp.get_json()['status'] == 'ready'
+        assert resp.get_json()['warmups']['test_ok']['status'] == 'done'
+
+
+def test_expect_01():
+    health.expect(['svc_a', 'svc_b'])
+    health.mark_ready('svc_a')
+    assert not health.is_ready()
+    assert health.readiness()['pending'] == ['svc_b']
+    health.mark_ready('svc_b')
+    assert health.is_ready()
+    assert health.readiness()['pending'] == []
+    health.reset()
+    assert health.readiness()['pending'] == []
+
+
+def test_defer_warmups_01():
+    calls = []
+    health.defer_warmups()
+    health.run_warmups(lambda: calls.append('a'))
+    health.run_warmups(lambda: calls.append('b'))
+    assert calls == []
+    health.run_deferred_warmups()
+    assert calls == ['a', 'b']
+    # no longer deferred
+    health.run_warmups(lambda: calls.append('c'))
+    assert calls == ['a', 'b', 'c']
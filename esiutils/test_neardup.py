@@ -0,0 +1,41 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the neardup
+"""
+from esiutils import neardup
+
+
+def test_tokens():
+    assert neardup.tokens('RT @user: Vaccines cause autism!! https://t.co/x') == [
+        'vaccines', 'cause', 'autism']
+
+
+def test_estimate_jaccard():
+    sig_a = neardup.minhash_signature(neardup.shingles('the cat sat on the mat'))
+    sig_b = neardup.minhash_signature(neardup.shingles('The cat sat on the mat.'))
+    sig_c = neardup.minhash_signature(neardup.shingles('vaccines cause autism'))
+    assert neardup.estimate_jaccard(sig_a, sig_b) == 1.0
+    assert neardup.estimate_jaccard(sig_a, sig_c) < 0.2
+    assert neardup.estimate_jaccard(None, sig_c) == 0.0
+
+
+def test_cluster():
+    texts = ['Vaccines cause autism in children',
+             'Taxes rose 20% last year',
+             'RT @bot: vaccines cause autism in children!!',
+             '',
+             '']
+    assert neardup.cluster(texts, 0.9) == [[0, 2], [1], [3], [4]]
+    assert neardup.cluster(texts, 1.01) == [[0], [1], [2], [3], [4]]
+
+
+def test_cluster_keeps_negations_and_numbers_apart():
+    texts = ['The new vaccine is safe for children under five years old',
+             'The new vaccine is not safe for children under five years old',
+             "The new vaccine isn't safe for children under five years old",
+             'The new vaccine is safe for children under 5 years old',
+             'The new vaccine is safe for children under 6 years old']
+    assert neardup.guard_tokens(texts[2]) == frozenset(['t'])
+    assert neardup.cluster(texts, 0.5) == [[0], [1], [2], [3], [4]]
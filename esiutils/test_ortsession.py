@@ -0,0 +1,23 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the ortsession
+"""
+import pytest
+from esiutils import ortsession
+
+
+def test_backend():
+    assert ortsession.backend({}) == 'torch'
+    assert ortsession.backend({'inference_backend': ' ONNXRuntime '}) == 'onnxruntime'
+    with pytest.raises(ValueError):
+        ortsession.backend({'inference_backend': 'tensorflow'})
+
+
+def test_load_session_falls_back_to_torch(tmp_path):
+    assert ortsession.load_session(str(tmp_path), None) is None
+    assert ortsession.load_session(str(tmp_path), {}) is None
+    # configured, but no model.onnx was exported
+    assert ortsession.load_session(
+        str(tmp_path), {'inference_backend': 'onnxruntime'}) is None
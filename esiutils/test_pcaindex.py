@@ -0,0 +1,46 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the pcaindex
+"""
+import numpy as np
+from esiutils import pcaindex
+
+
+def unit_vectors(n, dim, seed=0):
+    vecs = np.random.RandomState(seed).randn(n, dim).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def test_search_reranks_with_full_vectors():
+    vectors = unit_vectors(500, 32)
+    pca_index = pcaindex.build(vectors, 8)
+    assert pca_index['reduced'].shape == (500, 8)
+    qvecs = vectors[:3]
+    sims, ids = pcaindex.search(pca_index, vectors, qvecs, topn=4,
+                                n_candidates=50)
+    assert ids.shape == (3, 4)
+    assert list(ids[:, 0]) == [0, 1, 2]  # each query finds itself
+    assert np.allclose(sims[:, 0], 1.0, atol=1e-5)
+    # similarities are exact and sorted
+    exact = np.sum(qvecs[:, None, :] * vectors[ids], axis=2)
+    assert np.allclose(sims, exact, atol=1e-5)
+    assert np.all(np.diff(sims, axis=1) <= 0)
+
+
+def test_all_dims_is_exact():
+    vectors = unit_vectors(200, 16)
+    pca_index = pcaindex.build(vectors, 16)
+    qvecs = unit_vectors(5, 16, seed=1)
+    _, ids = pcaindex.search(pca_index, vectors, qvecs, topn=5, n_candidates=5)
+    exact_ids = np.argsort(-(qvecs @ vectors.T), axis=1)[:, :5]
+    assert np.array_equal(ids, exact_ids)
+
+
+def test_load_or_build(tmp_path):
+    vectors = unit_vectors(100, 16)
+    built = pcaindex.load_or_build(vectors, 4, str(tmp_path), 'digest')
+    loaded = pcaindex.load_or_build(vectors, 4, str(tmp_path), 'digest')
+    assert np.array_equal(built['reduced'], loaded['reduced'])
+    assert loaded['explained_variance_ratio'] == built['explained_variance_ratio']
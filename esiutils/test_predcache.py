@@ -0,0 +1,54 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the predcache
+"""
+from esiutils import predcache
+
+
+def test_get_put():
+    cache = predcache.create('test')
+    assert predcache.get_many(cache, ['a', 'b'], 'm1') == [None, None]
+    predcache.put_many(cache, [('a', ('CFS', 0.9))], 'm1')
+    assert predcache.get_many(cache, ['a', 'b'], 'm1') == [('CFS', 0.9), None]
+    # predictions are not shared across models
+    assert predcache.get_many(cache, ['a'], 'm2') == [None]
+
+
+def test_evicts_least_recently_used():
+    cache = predcache.create('test', maxsize=2)
+    predcache.put_many(cache, [('a', 1), ('b', 2)], 'm')
+    predcache.get_many(cache, ['a'], 'm')
+    predcache.put_many(cache, [('c', 3)], 'm')
+    assert predcache.get_many(cache, ['a', 'b', 'c'], 'm') == [1, None, 3]
+
+
+def test_disabled():
+    cache = predcache.create('test', maxsize=0)
+    predcache.put_many(cache, [('a', 1)], 'm')
+    assert predcache.get_many(cache, ['a'], 'm') == [None]
+
+
+def test_predict_many_with_batcher():
+    from esiutils import batcher
+    predicted = []
+
+    def predict_fn(sents):
+        predicted.extend(sents)
+        return ['CFS'] * len(sents), [len(s) / 10 for s in sents]
+
+    worth_batcher = batcher.create(predict_fn)
+    cache = predcache.create('test')
+
+    def predict_worthiness(sents):
+        return predcache.predict_many(
+            cache, sents, sents, 'm',
+            lambda miss: list(zip(*batcher.submit(worth_batcher, miss))))
+
+    assert predict_worthiness(['a', 'bb']) == [('CFS', 0.1), ('CFS', 0.2)]
+    # only the new sentence is predicted, results stay aligned
+    assert predict_worthiness(['ccc', 'a']) == [('CFS', 0.3), ('CFS', 0.1)]
+    assert predicted == ['a', 'bb', 'ccc']
+    assert predict_worthiness(['bb']) == [('CFS', 0.2)]
+    assert worth_batcher['n_calls'] == 2
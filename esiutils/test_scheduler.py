@@ -0,0 +1,57 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the scheduler
+"""
+import time
+import threading
+from esiutils import scheduler
+
+
+def test_run_when_disabled():
+    scheduler.disable()
+    assert scheduler.run('encoder', lambda: 42) == 42
+
+
+def wait_until_queued(model_type, n):
+    for _ in range(200):
+        if scheduler.queued().get(model_type, 0) >= n:
+            return
+        time.sleep(0.005)
+    raise AssertionError('Timeout waiting for queued %s' % model_type)
+
+
+def test_round_robin_between_model_types():
+    scheduler.enable(max_concurrent=1)
+    try:
+        order = []
+        release = threading.Event()
+
+        def job(model_type, i, block=False):
+            def fn():
+                if block:
+                    release.wait(5)
+                order.append('%s%d' % (model_type, i))
+            return threading.Thread(
+                target=scheduler.run, args=(model_type, fn))
+
+        threads = [job('worthiness', 0, block=True)]
+        threads[0].start()
+        wait_until_queued('worthiness', 0)
+        time.sleep(0.05)  # first job holds the only slot
+        for i in range(1, 4):
+            threads.append(job('worthiness', i))
+            threads[-1].start()
+            wait_until_queued('worthiness', i)
+        threads.append(job('stance', 0))
+        threads[-1].start()
+        wait_until_queued('stance', 1)
+
+        release.set()
+        for t in threads:
+            t.join(5)
+        assert order == ['worthiness0', 'stance0', 'worthiness1',
+                         'worthiness2', 'worthiness3']
+    finally:
+        scheduler.disable()
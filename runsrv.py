@@ -30,10 +30,75 @@ def run_app(app, debug, config, port):
         logger.error("Failed to run app?" + str(e))
 
 
+def dispatch_by_app_name(apps, default_app):
+    """WSGI app which forwards requests based on their first path segment
+
+    :param apps: dict from app name (e.g. `claimencoder`) to flask app
+    :param default_app: app for other paths, e.g. `/health/ready`
+    """
+    def application(environ, start_response):
+        app_name = environ.get('PATH_INFO', '').lstrip('/').split('/', 1)[0]
+        return apps.get(app_name, default_app)(environ, start_response)
+    return application
+
+
+def model_server_app():
+    """Hosts the claimencoder, claimneuralindex and worthinesschecker in one app
+
+    Each model is loaded once and all forward passes share one torch
+    thread pool via `esiutils.scheduler`. The routes of the three
+    services are unchanged, so clients only need to point their urls
+    (`semencoder_url`, `neuralindex_url`, `stance_pred_url` and
+    `worthinesschecker_url`) at the `modelserver` port.
+
+    The warmups of the services are deferred until the neural index
+    and the stance cascade use the in-process encoder, and the process
+    is only ready once the three services have warmed up their models.
+    Metrics and tracing are configured by the `modelserver` config
+    section, but each service keeps its own `service` label.
+
+    :returns: tuple with the flask app and the config
+    """
+    from flask import Flask
+    from esiutils import scheduler, health, cimetrics, citrace
+    health.expect(['claimencoder', 'claimneuralindex', 'worthinesschecker'])
+    health.defer_warmups()
+    from claimencoder import app as encoder_app, config
+    from claimencoder.claim_encoder import semantic_encoder
+    from claimneuralindex import app as index_app
+    from claimneuralindex import resources as index_resources
+    from worthiness import app as worth_app
+
+    srv_cfg = config['modelserver']
+    # otherwise the section of the last imported service would win
+    cimetrics.disable()
+    cimetrics.configure('modelserver', srv_cfg)
+    citrace.configure('modelserver', srv_cfg)
+    scheduler.enable(int(srv_cfg.get('max_concurrent', 1)),
+                     int(srv_cfg.get('torch_threads', 0)))
+
+    # the neural index no longer needs to call the encoder over http
+    def encoder_fn(sentences):
+        return scheduler.run('encoder', lambda: semantic_encoder.encode(
+            sentences)).detach().tolist()
+    index_resources.vec_space['sentence_encoder_fn'] = encoder_fn
+    if index_resources.stance_cascade is not None:
+        index_resources.stance_cascade['encoder_fn'] = encoder_fn
+    health.run_deferred_warmups()
+
+    app = Flask('modelserver')
+    app.wsgi_app = dispatch_by_app_name({
+        config['claimencoder']['app_name']: encoder_app,
+        config['claimneuralindex']['app_name']: index_app,
+        config['worthinesschecker']['app_name']: worth_app}, encoder_app)
+    return app, config
+
+
 if __name__ == '__main__':        
     parser = argparse.ArgumentParser(description='Run acred services', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('-service', default='acredapi', help='Name of the service', required=False,
-                        choices=['acredapi', 'claimencoder', 'claimneuralindex', 'worthinesschecker'])
+                        choices=['acredapi', 'claimencoder', 'claimneuralindex', 'worthinesschecker',
+                                 'modelserver'])
     args = parser.parse_args()
     logger.info("Running service %s" % args.service)
     if args.service == 'acredapi':
@@ -51,5 +116,9 @@ if __name__ == '__main__':
     elif args.service == 'worthinesschecker':
         from worthiness import app, debug, config
         run_app(app, debug, config, service_port(config, args.service))
+    elif args.service == 'modelserver':
+        from claimencoder import debug
+        app, config = model_server_app()
+        run_app(app, debug, config, service_port(config, args.service))
     else:
         raise ValueError("Unsupported service " + service)
@@ -0,0 +1,76 @@
+#
+# 2020 ExpertSystem
+#
+'''Script for benchmarking the html extraction in `url_scraper.scrape`
+
+Compares the previous extraction, which parsed each page once per
+extractor with `html.parser` plus once more with the `microdata`
+library, against the current single-parse extraction. Pass a folder
+with saved `.html` pages, e.g. obtained via `curl url > page.html`.
+'''
+import argparse
+import os
+import os.path as osp
+import time
+from bs4 import BeautifulSoup
+from semantic_analyzer import url_scraper
+
+
+def extract_multi_parse(html_str):
+    """Extraction as done before, each step parses the page again"""
+    def soup():
+        return BeautifulSoup(html_str, 'html.parser')
+    content = url_scraper.extract_text_from_html(soup())
+    all_meta = {
+        'meta_tags': url_scraper.extract_meta_tags(soup()),
+        'microdata': url_scraper.extract_microdata_from_html(html_str),
+        'json-ld': url_scraper.extract_jsonld_from_html(soup())
+    }
+    title = url_scraper.extract_title(soup(), all_meta)
+    return content, title, all_meta
+
+
+def extract_single_parse(html_str):
+    soup = url_scraper.parse_html(html_str)
+    content = url_scraper.extract_text_from_html(soup)
+    metadata = url_scraper.extract_metadata_from_html(html_str, soup)
+    return content, metadata['title'], metadata
+
+
+def time_extraction(extract_fn, pages, repeat):
+    start = time.time()
+    for i in range(repeat):
+        for page in pages:
+            extract_fn(page)
+    return (time.time() - start) * 1000 / (repeat * len(pages))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark html extraction on a folder of saved pages',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-pagesDir', required=True,
+        help='Path to a folder with saved .html pages')
+    parser.add_argument(
+        '-repeat', type=int, default=3,
+        help='Number of times to extract each page')
+    args = parser.parse_args()
+
+    pages = []
+    for fname in sorted(os.listdir(args.pagesDir)):
+        if not fname.endswith('.html'):
+            continue
+        with open(osp.join(args.pagesDir, fname), encoding='utf-8',
+                  errors='replace') as f:
+            pages.append(f.read())
+    assert len(pages) > 0, 'No .html pages in %s' % args.pagesDir
+    mb = sum(len(p) for p in pages) / (1024 * 1024)
+    print('Extracting %d pages (%.2f MB) using parser %s' % (
+        len(pages), mb, url_scraper.html_parser))
+
+    multi_ms = time_extraction(extract_multi_parse, pages, args.repeat)
+    single_ms = time_extraction(extract_single_parse, pages, args.repeat)
+    print('multi-parse : %.1f ms/page' % multi_ms)
+    print('single-parse: %.1f ms/page' % single_ms)
+    print('speedup     : %.2fx' % (multi_ms / single_ms))
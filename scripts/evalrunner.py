@@ -0,0 +1,199 @@
+#
+# 2020 ExpertSystem
+#
+"""Runner for the evaluation scripts which send a dataset to acred
+
+Evaluating acred on a dataset like coinform250 or FakeNewsNet means
+sending thousands of requests, each taking seconds. This module:
+
+ - sends up to `concurrency` requests at a time, reading the input
+   lazily so the dataset need not fit in memory
+ - retries requests failing with a timeout, a connection error or a 5xx
+   response, with exponential backoff
+ - streams the predictions to a CSV or JSONL file as soon as they are
+   available, in the same order as the input
+ - records the ids of the completed items in a checkpoint file, so an
+   interrupted run resumes where it stopped
+
+Used by `pred_coinfo250.py` and `pred_fakeNewsNet.py`.
+"""
+import os
+import csv
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable(e):
+    """True for errors which may go away if the request is sent again"""
+    if isinstance(e, (requests.exceptions.Timeout,
+                      requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(e, requests.exceptions.HTTPError):
+        resp = e.response
+        return resp is not None and (
+            resp.status_code >= 500 or resp.status_code == 429)
+    return False
+
+
+def call_with_retries(fn, retries=3, backoff_secs=1.0,
+                      retryable_fn=is_retryable):
+    """Calls `fn`, retrying with exponential backoff on retryable errors
+
+    :param fn: function without arguments
+    :param retries: max number of retries after the first attempt
+    :param backoff_secs: wait before the first retry, doubled (with some
+      jitter) on each subsequent retry
+    :param retryable_fn: predicate deciding whether an exception is
+      worth retrying
+    :returns: the result of `fn`
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not retryable_fn(e):
+                raise
+            wait_secs = backoff_secs * (2 ** attempt) * random.uniform(0.8, 1.2)
+            logger.warning('Attempt %d failed (%s), retrying in %.1fs' % (
+                attempt + 1, e, wait_secs))
+            time.sleep(wait_secs)
+            attempt += 1
+
+
+def read_checkpoint(path):
+    """Reads the ids of the items completed in a previous run"""
+    if path is None or not os.path.isfile(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as in_f:
+        return set(line.rstrip('\n') for line in in_f if line.strip())
+
+
+def _read_csv_header(path):
+    with open(path, 'r', encoding='utf-8', newline='') as in_f:
+        return next(csv.reader(in_f), None)
+
+
+def open_writer(out_path, fieldnames=None):
+    """Opens a streaming writer for prediction rows
+
+    The format is chosen from the extension, `.csv` or `.jsonl`. Rows
+    are appended, so an existing file from an interrupted run is kept.
+
+    :param out_path: path of the output file
+    :param fieldnames: optional CSV columns; by default the keys of the
+      first written row (or the header of an existing file)
+    :returns: dict with a `write` function for a list of rows and a
+      `close` function
+    :rtype: dict
+    """
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    exists = os.path.isfile(out_path) and os.path.getsize(out_path) > 0
+    out_f = open(out_path, 'a', encoding='utf-8', newline='')
+    state = {'fieldnames': fieldnames, 'csv_writer': None}
+    if out_path.endswith('.csv') and exists and fieldnames is None:
+        state['fieldnames'] = _read_csv_header(out_path)
+
+    def write(rows):
+        for row in rows:
+            if out_path.endswith('.csv'):
+                if state['csv_writer'] is None:
+                    state['fieldnames'] = state['fieldnames'] or list(row.keys())
+                    state['csv_writer'] = csv.DictWriter(
+                        out_f, fieldnames=state['fieldnames'],
+                        extrasaction='ignore')
+                    if not exists:
+                        state['csv_writer'].writeheader()
+                state['csv_writer'].writerow(row)
+            else:
+                out_f.write(json.dumps(row) + '\n')
+        out_f.flush()
+
+    return {'write': write, 'close': out_f.close}
+
+
+def run(items, process_fn, out_path, checkpoint_path=None, concurrency=4,
+        retries=3, backoff_secs=1.0, fieldnames=None):
+    """Processes dataset items concurrently, streaming the predictions
+
+    :param items: iterable of `(item_id, item)` tuples; ids must be
+      unique str values without newlines
+    :param process_fn: function from an item to a list of prediction
+      rows (dicts). It is called from worker threads and retried when
+      it raises a retryable error, see `is_retryable`
+    :param out_path: `.csv` or `.jsonl` file where rows are appended
+    :param checkpoint_path: file where ids of completed items are
+      appended. Items listed there are skipped. Defaults to
+      `<out_path>.done`
+    :param concurrency: max number of items processed at the same time
+    :param retries: max number of retries per item
+    :param backoff_secs: initial wait between retries
+    :param fieldnames: optional CSV columns, see `open_writer`
+    :returns: dict with the number of `done`, `skipped` and `failed`
+      items and the ids of the failed items
+    :rtype: dict
+    """
+    checkpoint_path = checkpoint_path or out_path + '.done'
+    completed = read_checkpoint(checkpoint_path)
+    if completed:
+        logger.info('Resuming, skipping %d completed items' % len(completed))
+    writer = open_writer(out_path, fieldnames)
+    ckpt_f = open(checkpoint_path, 'a', encoding='utf-8')
+    summary = {'done': 0, 'skipped': 0, 'failed': 0, 'failed_ids': []}
+    # results of items finished out of order, written once their
+    #  predecessors are done so the output follows the input order
+    finished = {}
+    next_idx = [0]
+    lock = threading.Lock()
+
+    def flush_in_order():
+        while next_idx[0] in finished:
+            item_id, rows, error = finished.pop(next_idx[0])
+            next_idx[0] += 1
+            if error is not None:
+                summary['failed'] += 1
+                summary['failed_ids'].append(item_id)
+                continue
+            writer['write'](rows)
+            ckpt_f.write(item_id + '\n')
+            ckpt_f.flush()
+            summary['done'] += 1
+
+    def process(idx, item_id, item):
+        try:
+            rows = call_with_retries(lambda: process_fn(item), retries,
+                                     backoff_secs)
+            result = (item_id, rows, None)
+        except Exception as e:
+            logger.error('Failed to process %s: %s' % (item_id, e))
+            result = (item_id, None, e)
+        with lock:
+            finished[idx] = result
+            flush_in_order()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            idx = 0
+            for item_id, item in items:
+                if item_id in completed:
+                    summary['skipped'] += 1
+                    continue
+                if len(pending) >= concurrency * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(process, idx, item_id, item))
+                idx += 1
+            wait(pending)
+    finally:
+        writer['close']()
+        ckpt_f.close()
+    logger.info('Processed %d items, skipped %d, failed %d' % (
+        summary['done'], summary['skipped'], summary['failed']))
+    return summary
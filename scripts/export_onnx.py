@@ -0,0 +1,166 @@
+#
+# 2020 ExpertSystem
+#
+'''Script for exporting the saved RoBERTa models to ONNX
+
+Writes `model.onnx` into the saved model folder, where it is picked up
+by services configured with `inference_backend = onnxruntime` (see
+`esiutils.ortsession`). After exporting, the torch and ONNX Runtime
+outputs are compared on a few sample inputs and the script fails if
+they differ by more than `-atol`.
+
+Run from the root of the repo, e.g.
+
+    python -m scripts.export_onnx -kind encoder \\
+      -modelDir ../../../models/coinform/semantic_encoder/
+    python -m scripts.export_onnx -kind classifier \\
+      -modelDir ../../../models/coinform/check_worthiness_acc_0.95/
+'''
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import torch
+from transformers import RobertaModel, RobertaForSequenceClassification
+from transformers import RobertaTokenizer
+from esiutils import ortsession
+
+sample_texts = [
+    'The earth is flat.',
+    ' Vaccines do not cause autism, according to a large study of children in Denmark.',
+    'RT @someone: Unemployment fell to 3.5% in September, the lowest since 1969 https://t.co/x',
+    'x']
+
+classifier_meta_fnames = ['fnc1-classifier.json',
+                          'checkworthiness-classifier.json']
+
+
+class PooledEncoder(torch.nn.Module):
+    """`RoBERTa_Finetuned_Encoder.encode` from token ids to embeddings"""
+    def __init__(self, bert_model, pooling_strategy):
+        super(PooledEncoder, self).__init__()
+        self.bert_model = bert_model
+        self.pooling_strategy = pooling_strategy
+
+    def forward(self, input_ids):
+        last_layer, pooled, hidden_layers = self.bert_model(input_ids)
+        if self.pooling_strategy == 'pooled':
+            return pooled
+        strat_name, layer_index = self.pooling_strategy
+        layer = hidden_layers[layer_index]
+        if strat_name == 'reduce_mean_layer':
+            return torch.sum(layer, dim=1) / (layer.shape[1] + 1e-10)
+        return layer
+
+
+class Logits(torch.nn.Module):
+    """`pred_label` of the sequence classifiers, without token types"""
+    def __init__(self, model):
+        super(Logits, self).__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids, attention_mask=attention_mask)[0]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as in_f:
+        return json.load(in_f)
+
+
+def sample_inputs(tokenizer, seq_len):
+    """Padded token ids and attention masks for `sample_texts`"""
+    ids, masks = [], []
+    for text in sample_texts:
+        tok_ids = tokenizer.encode(text, add_special_tokens=True)[:seq_len]
+        masks.append([1] * len(tok_ids) + [0] * (seq_len - len(tok_ids)))
+        ids.append(tok_ids + [tokenizer.pad_token_id] * (seq_len - len(tok_ids)))
+    return torch.tensor(ids), torch.tensor(masks)
+
+
+def load_encoder(model_dir):
+    semenc_config = read_json(os.path.join(model_dir, 'sem_encoder.json'))
+    bert_model = RobertaModel.from_pretrained(
+        model_dir, output_hidden_states=True)
+    strategy = semenc_config['pooling_strategy']
+    if type(strategy) == list:
+        strategy = tuple(strategy)
+    return PooledEncoder(bert_model, strategy), int(semenc_config['seq_len'])
+
+
+def load_classifier(model_dir):
+    meta_paths = [os.path.join(model_dir, fname)
+                  for fname in classifier_meta_fnames]
+    meta_paths = [path for path in meta_paths if os.path.isfile(path)]
+    assert len(meta_paths) > 0, 'No classifier metadata in %s' % model_dir
+    model = RobertaForSequenceClassification.from_pretrained(model_dir)
+    return Logits(model), int(read_json(meta_paths[0])['seq_len'])
+
+
+def export(kind, model_dir, out_path, opset=11, atol=1e-4):
+    """Exports a saved model and checks its parity with torch
+
+    :param kind: `encoder` or `classifier`
+    :param model_dir: folder with the saved model
+    :param out_path: path of the `.onnx` file to write
+    :param opset: ONNX opset version
+    :param atol: maximum absolute difference between the torch and
+      ONNX Runtime outputs
+    :returns: dict with the `max_abs_diff` and whether the export `passed`
+    :rtype: dict
+    """
+    if kind == 'encoder':
+        module, seq_len = load_encoder(model_dir)
+    else:
+        module, seq_len = load_classifier(model_dir)
+    module.eval()
+    tokenizer = RobertaTokenizer.from_pretrained(model_dir)
+    input_ids, att_masks = sample_inputs(tokenizer, seq_len)
+    if kind == 'encoder':
+        args, input_names = (input_ids,), ['input_ids']
+    else:
+        args, input_names = (input_ids, att_masks), ['input_ids', 'attention_mask']
+
+    with torch.no_grad():
+        torch.onnx.export(
+            module, args, out_path, input_names=input_names,
+            output_names=['output'], opset_version=opset,
+            dynamic_axes={name: {0: 'batch'}
+                          for name in input_names + ['output']})
+        expected = module(*args).numpy()
+
+    session = ortsession.create_session(out_path)
+    actual = session.run(None, {name: arg.numpy()
+                                for name, arg in zip(input_names, args)})[0]
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    return {'max_abs_diff': max_abs_diff, 'passed': max_abs_diff <= atol}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Export a saved RoBERTa model to ONNX',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-kind', required=True,
+                        choices=['encoder', 'classifier'],
+                        help='encoder for the claimencoder, classifier for '
+                        'the stance and worthiness models')
+    parser.add_argument('-modelDir', required=True,
+                        help='Folder with the saved model')
+    parser.add_argument('-out', default=None,
+                        help='Path of the onnx file, by default model.onnx '
+                        'in modelDir')
+    parser.add_argument('-opset', type=int, default=11,
+                        help='ONNX opset version')
+    parser.add_argument('-atol', type=float, default=1e-4,
+                        help='Maximum absolute difference with torch')
+    args = parser.parse_args()
+
+    out_path = args.out or ortsession.onnx_path(args.modelDir)
+    result = export(args.kind, args.modelDir, out_path, args.opset, args.atol)
+    print('Exported %s, max abs diff with torch %.2e' % (
+        out_path, result['max_abs_diff']))
+    if not result['passed']:
+        os.remove(out_path)
+        sys.exit('Parity check failed (atol %s), removed %s' % (
+            args.atol, out_path))
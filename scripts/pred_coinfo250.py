@@ -15,8 +15,7 @@ import json
 import os
 import os.path as osp
 import requests
-import traceback
-import pandas as pd
+import evalrunner
 
 
 def ensure_req_tweet_content(req):
@@ -55,20 +54,19 @@ def exec_req(i, req, args):
     resp = requests.post(args.credpred_url, json=req,
                          verify=False,
                          timeout=args.req_timeout)
-    result = []
-    if resp.ok:
-        respd = resp.json()
-        result = [{
-            'tweet_id': request['tweet_id'],
-            'ratingValue': r['reviewRating']['ratingValue'],
-            'confidence': r['reviewRating']['confidence'],
-            'label': acred_as_coinfo_label(r)
-        } for request, r in zip(req['tweets'], respd)]
-        resp_f = 'coinform250_%s.json' % i
-        with open('%s/%s' % (args.outDir, resp_f), 'w') as outf:
-            json.dump(respd, outf)
-    else:
-        print("Failed: %s %s" % (str(resp), resp.text))            
+    if not resp.ok:
+        print("Failed: %s %s" % (str(resp), resp.text))
+    resp.raise_for_status()
+    respd = resp.json()
+    result = [{
+        'tweet_id': request['tweet_id'],
+        'ratingValue': r['reviewRating']['ratingValue'],
+        'confidence': r['reviewRating']['confidence'],
+        'label': acred_as_coinfo_label(r)
+    } for request, r in zip(req['tweets'], respd)]
+    resp_f = 'coinform250_%s.json' % i
+    with open('%s/%s' % (args.outDir, resp_f), 'w') as outf:
+        json.dump(respd, outf)
 
     print('Processed in %ss.' % (time.time() - start))
     return result
@@ -117,6 +115,15 @@ if __name__ == '__main__':
         '-req_timeout',
         type=int, default=90,
         help='Seconds to wait for a response')
+    parser.add_argument(
+        '-concurrency', type=int, default=4,
+        help='Number of requests sent to acred at the same time')
+    parser.add_argument(
+        '-retries', type=int, default=3,
+        help='Times to retry a request after a timeout or server error')
+    parser.add_argument(
+        '-restart', action='store_true',
+        help='Discard the predictions of a previous (interrupted) run')
 
     args = parser.parse_args()
 
@@ -131,13 +138,18 @@ if __name__ == '__main__':
     
     print('Reviewing credibility of %s tweets using batchSize %s' % (len(tweets), args.batchSize))
 
-    preds = []
-    for i, req in enumerate(as_acred_requests(tweets, args.batchSize)):
-        try:
-            preds.extend(exec_req(i, req, args))
-        except Exception as e:
-            print('Error executing request %s %s %s' % (i, req, str(e)))
-            print(traceback.format_exc())
-
-    pd.DataFrame(preds).to_csv('%s/%s.csv' % (args.outDir, 'predictions'), index=False)
+    pred_path = '%s/%s.csv' % (args.outDir, 'predictions')
+    if args.restart:
+        for path in [pred_path, pred_path + '.done']:
+            if osp.isfile(path):
+                os.remove(path)
+    summary = evalrunner.run(
+        ((req['batch_id'], (i, req)) for i, req in enumerate(
+            as_acred_requests(tweets, args.batchSize))),
+        lambda i_req: exec_req(i_req[0], i_req[1], args),
+        pred_path, concurrency=args.concurrency, retries=args.retries,
+        fieldnames=['tweet_id', 'ratingValue', 'confidence', 'label'])
+    if summary['failed'] > 0:
+        print('Failed batches %s, run again to retry them' % (
+            summary['failed_ids']))
     print('Finished in %.3fs' % (time.time() - all_start))
@@ -17,11 +17,10 @@ import json
 import os
 import os.path as osp
 import requests
-import traceback
-import pandas as pd
 import logging
 import sys
 import datetime
+import evalrunner
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +48,18 @@ def arg_parser():
     parser.add_argument(
         '-output_dir', type=str,
         help='Path to a Name of the co-inform collection where to store the analyzed documents')
+    parser.add_argument(
+        '-req_timeout', type=int, default=120,
+        help='Seconds to wait for a response')
+    parser.add_argument(
+        '-concurrency', type=int, default=4,
+        help='Number of articles sent to acred at the same time')
+    parser.add_argument(
+        '-retries', type=int, default=3,
+        help='Times to retry a request after a timeout or server error')
+    parser.add_argument(
+        '-restart', action='store_true',
+        help='Discard the predictions of a previous (interrupted) run')
     return parser
 
 def _setup_logging():
@@ -61,12 +72,12 @@ def _setup_logging():
     root_logger.addHandler(lsh)
 
 
-def gen_data_feature_files(based_dirs, data_feature):
+def gen_data_feature_files(base_dirs, data_feature):
     for base_dir in base_dirs:
         for item_dir in os.listdir(base_dir):
             if data_feature == 'news_articles':
                 yield item_dir, '%s/%s/news content.json' % (base_dir, item_dir)
-            elif data_features == 'tweets':
+            elif data_feature == 'tweets':
                 tweet_dir = '%s/%s/tweets' % (base_dir, item_dir)
                 if not os.path.exists(tweet_dir):
                     continue
@@ -177,7 +188,8 @@ def review_article(ditem, args):
     req = {
         'webpages': [ditem]
     }
-    resp = requests.post(url, verify=False, json=req)
+    resp = requests.post(url, verify=False, json=req,
+                         timeout=args.req_timeout)
     resp.raise_for_status()
     respd = resp.json()
     assert type(respd) is list
@@ -211,7 +223,28 @@ def acred_rating_as_fakeNewsNet_label(rating):
         return  'real'
     else:
         return 'fake'
-        
+
+
+def predict_item(item_id, json_path, args):
+    if not os.path.exists(json_path):
+        return [{
+            'item_id': item_id, 'label': 'not_verifiable',
+            'explanation': 'Missing FakeNewsNet input json'}]
+    with open(json_path, 'r', encoding='utf-8') as in_file:
+        fnn_content = json.load(in_file)
+    in_doc = {
+        **fnn_doc_as_article(fnn_content),
+        'id': item_id
+    }
+    review = review_article(in_doc, args)
+    return [{
+        'item_id': item_id,
+        'label': acred_rating_as_fakeNewsNet_label(review['reviewRating']),
+        'acred_label': acred_rating_as_acred_label(review['reviewRating']),
+        'explanation': review['text']
+    }]
+
+
 if __name__ == '__main__':
     parser = arg_parser()
     _setup_logging()
@@ -227,32 +260,23 @@ if __name__ == '__main__':
     base_dirs = ['%s/%s/%s' % (args.fakeNewsNetFolder, args.news_source, news_label)
                  for news_label in ['fake', 'real']]
     print('base_dirs %s' % base_dirs)
-    preds = []
-    for item_id, json_path in gen_data_feature_files(base_dirs, args.data_feature):
-        if not os.path.exists(json_path):
-            preds.append({
-                'item_id': item_id, 'label': 'not_verifiable',
-                'explanation': 'Missing FakeNewsNet input json'})
-            continue
-        with open(json_path, 'r', encoding='utf-8') as in_file:
-            fnn_content = json.load(in_file)
-            in_doc = {
-                **fnn_doc_as_article(fnn_content),
-                'id': item_id
-            }
-            review = review_article(in_doc, args)
-            print('review keys', list(review.keys()))
-            preds.append({
-                'item_id': item_id,
-                'label': acred_rating_as_fakeNewsNet_label(review['reviewRating']),
-                'acred_label': acred_rating_as_acred_label(review['reviewRating']),
-                'explanation': review['text']
-            })
-            
     path = '%s/predictions.csv' % (args.output_dir)
-    pd.DataFrame(preds).to_csv(path)
-    
+    if args.restart:
+        for p in [path, path + '.done']:
+            if osp.isfile(p):
+                os.remove(p)
+    summary = evalrunner.run(
+        ((item_id, (item_id, json_path)) for item_id, json_path in
+         gen_data_feature_files(base_dirs, args.data_feature)),
+        lambda id_path: predict_item(id_path[0], id_path[1], args),
+        path, concurrency=args.concurrency, retries=args.retries,
+        fieldnames=['item_id', 'label', 'acred_label', 'explanation'])
+    if summary['failed'] > 0:
+        print('Failed items %s, run again to retry them' % (
+            summary['failed_ids']))
+
     end = time.time()
     timing = "%s s" % (end - start)
     print('Processed %s folders from %s. Stored in %s. Timings: %s' % (
-        len(preds), base_dirs, args.output_dir, timing))
+        summary['done'] + summary['skipped'], base_dirs, args.output_dir,
+        timing))
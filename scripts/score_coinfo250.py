@@ -49,6 +49,10 @@ if __name__ == '__main__':
     assert gold_df.shape[0] == preds_df.shape[0], 'Cannot score %s predictions for %s tweets. %s' % (
         preds_df.shape[0], gold_df.shape[0], 'Maybe prediction failed for some reason? Check your logs.')
 
+    # predictions are in input order, unless a resumed run retried some
+    #  failed batches at the end
+    preds_df = preds_df.set_index('tweet_id').reindex(gold_df.id).reset_index()
+
     goldl = gold_df.label.tolist()
     predl = preds_df.label.tolist()
     
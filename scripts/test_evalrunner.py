@@ -0,0 +1,68 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in evalrunner
+"""
+import json
+import time
+import random
+import pytest
+import requests
+import evalrunner
+
+
+def slow_square(x):
+    time.sleep(random.uniform(0, 0.01))
+    return [{'id': str(x), 'square': x * x}]
+
+
+def test_run_in_order(tmp_path):
+    out_path = str(tmp_path / 'preds.csv')
+    items = ((str(i), i) for i in range(20))
+    summary = evalrunner.run(items, slow_square, out_path, concurrency=4)
+    assert summary['done'] == 20
+    lines = open(out_path).read().splitlines()
+    assert lines[0] == 'id,square'
+    assert lines[1:] == ['%d,%d' % (i, i * i) for i in range(20)]
+    assert evalrunner.read_checkpoint(out_path + '.done') == set(
+        str(i) for i in range(20))
+
+
+def test_resume_after_failure(tmp_path):
+    out_path = str(tmp_path / 'preds.jsonl')
+    calls = []
+
+    def fail_on_7(x):
+        calls.append(x)
+        if x == 7:
+            raise ValueError('not retryable')
+        return slow_square(x)
+
+    summary = evalrunner.run([(str(i), i) for i in range(10)], fail_on_7,
+                             out_path, concurrency=3)
+    assert summary['failed_ids'] == ['7']
+    assert calls.count(7) == 1  # ValueError is not retried
+    calls.clear()
+    summary = evalrunner.run([(str(i), i) for i in range(10)], slow_square,
+                             out_path, concurrency=3)
+    assert summary == {'done': 1, 'skipped': 9, 'failed': 0, 'failed_ids': []}
+    rows = [json.loads(line) for line in open(out_path)]
+    assert sorted(int(r['id']) for r in rows) == list(range(10))
+
+
+def test_call_with_retries():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise requests.exceptions.Timeout('timeout')
+        return 'ok'
+
+    assert evalrunner.call_with_retries(flaky, retries=3,
+                                        backoff_secs=0.001) == 'ok'
+    assert len(attempts) == 3
+    attempts.clear()
+    with pytest.raises(requests.exceptions.Timeout):
+        evalrunner.call_with_retries(flaky, retries=1, backoff_secs=0.001)
+    assert len(attempts) == 2
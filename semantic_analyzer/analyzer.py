@@ -9,7 +9,7 @@ from semantic_analyzer import url_scraper
 from datetime import datetime
 import requests
 import langdetect
-from esiutils import dictu, citimings
+from esiutils import dictu, citimings, cimetrics
 
 
 logger = logging.getLogger(__name__)
@@ -200,6 +200,7 @@ def try_translate_from(title, content, lang_orig, cfg):
                 'translatedDocument': 'automatic'}
     except Exception as e:
         logger.error("Failed to translate", e)
+        cimetrics.count_upstream_error('translation')
         return {'title': title,
                 'content': content,
                 'lang': lang_orig,
@@ -285,7 +286,7 @@ def analyze_doc(doc, cfg):
     assert type(doc) is dict, str(type(doc))
     if 'content' not in doc:
         assert 'url' in doc, 'Expecting at least a url to resolve doc'
-        scraped = url_scraper.scrape(doc['url'])
+        scraped = url_scraper.scrape(doc['url'], cfg=cfg)
         doc = {**doc,
                **scraped}
 
@@ -302,6 +303,66 @@ def analyze_doc(doc, cfg):
         result['claims_content'] = cce.calc_claim_content(result, cfg)
     return result
 
+def analyze_docs(docs, cfg):
+    """Semantically analyses a batch of partial `docs`
+
+    Same as calling `analyze_doc` on each doc, but each stage is
+    performed for all docs before moving on to the next stage. In
+    particular, the urls of docs without `content` are fetched
+    concurrently.
+
+    :param docs: list of partial docs, see `analyze_doc`
+    :param cfg: config options, see `analyze_doc`
+    :returns: a tuple with (i) the list of analyzed docs, in the same
+      order as `docs` and (ii) a timing object with a sub timing for
+      each stage
+    :rtype: tuple
+    """
+    start = citimings.start()
+    for doc in docs:
+        assert type(doc) is dict, str(type(doc))
+
+    start_scrape = citimings.start()
+    to_scrape = [doc['url'] for doc in docs if 'content' not in doc]
+    url_scraper.fetch_urls(to_scrape, cfg)
+    docs = [doc if 'content' in doc
+            else {**doc, **url_scraper.scrape(doc['url'], cfg=cfg)}
+            for doc in docs]
+    subts = [citimings.timing('url_scraping', start_scrape)]
+
+    elaboration_ms = [0] * len(docs)
+
+    def timed_stage(phase, fn, items):
+        stage_start = citimings.start()
+        result = []
+        for i, item in enumerate(items):
+            item_start = citimings.start()
+            result.append(fn(item))
+            elaboration_ms[i] += citimings.timing(
+                phase, item_start)['total_ms']
+        subts.append(citimings.timing(phase, stage_start))
+        return result
+
+    docs = timed_stage('translation',
+                       lambda doc: try_translate(doc, cfg), docs)
+    analyzer_fn = get_analyzer_fn(cfg)
+    sem_analyses = timed_stage(
+        'semantic_analysis',
+        lambda doc: analyzer_fn(doc['content'], doc['title'], cfg), docs)
+    results = [merge_semantic_analysis(doc, sem_analysis)
+               for doc, sem_analysis in zip(docs, sem_analyses)]
+    for result, ms in zip(results, elaboration_ms):
+        result['elaboration_elapsedtime'] = ms
+    if cfg.get('expand_claims', False):
+        import semantic_analyzer.claim_content_expander as cce
+        claims_contents = timed_stage(
+            'claim_expansion',
+            lambda result: cce.calc_claim_content(result, cfg), results)
+        for result, claims_content in zip(results, claims_contents):
+            result['claims_content'] = claims_content
+    return results, citimings.timing('analyze_docs', start, subts)
+
+
 def get_analyzer_fn(cfg):
     analyzer_name = cfg.get('analyzer_name', 'nltk')
     if analyzer_name == 'ciapiclient':
@@ -1,8 +1,14 @@
 import re
+import bisect
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+fact_tax_hl_re = re.compile(r'fact_\w+_tax_hl')
+tax_hl_re = re.compile(r'taxonomy_(\w|_)+_tax_hl')
+ent_hl_re = re.compile(r'(\w|_)+_hl')
+
 
 def is_full_match(regex, s):
     match = re.search(regex, s)
@@ -11,19 +17,19 @@ def is_full_match(regex, s):
     return False
 
 
+@functools.lru_cache(maxsize=4096)
 def is_fact_tax_hl_field(name):
-    regex = 'fact_\w+_tax_hl'
-    return is_full_match(regex, name)
+    return fact_tax_hl_re.fullmatch(name) is not None
 
 
+@functools.lru_cache(maxsize=4096)
 def is_tax_hl_field(name):
-    regex = 'taxonomy_(\w|_)+_tax_hl'
-    return is_full_match(regex, name)
+    return tax_hl_re.fullmatch(name) is not None
 
 
+@functools.lru_cache(maxsize=4096)
 def is_ent_hl_field(name):
-    regex = '(\w|_)+_hl'
-    return is_full_match(regex, name) and not (
+    return ent_hl_re.fullmatch(name) is not None and not (
         is_fact_tax_hl_field(name) or is_tax_hl_field(name))
 
 
@@ -63,6 +69,48 @@ def index_ent_spans(doc):
     return index
 
 
+def as_span_index(ent_index):
+    """Converts an entity index into a span index sorted by span begin
+
+    :param ent_index: dict from spans to entity values, as returned by
+      `index_ent_spans`
+    :returns: a span index, which allows to find the entities within
+      a span in O(log n) via `find_ents_in_span`
+    :rtype: dict
+    """
+    spans = sorted(ent_index.keys())
+    return {
+        'begins': [b for b, e in spans],
+        'spans': spans,
+        'ents': [ent_index[span] for span in spans]
+    }
+
+
+def is_span_index(index):
+    return 'begins' in index and 'spans' in index
+
+
+def find_ents_in_span(span_index, outer):
+    """Finds the entity spans contained within `outer`
+
+    :param span_index: as returned by `as_span_index`
+    :param outer: a (begin, end) span
+    :returns: list of (span, entity values) tuples
+    :rtype: list
+    """
+    assert valid_span(outer), str(outer)
+    ob, oe = outer
+    spans = span_index['spans']
+    result = []
+    i = bisect.bisect_left(span_index['begins'], ob)
+    # spans sorted by begin, so no later span can start within outer
+    while i < len(spans) and spans[i][0] <= oe:
+        if in_span(outer, spans[i]):
+            result.append((spans[i], span_index['ents'][i]))
+        i += 1
+    return result
+
+
 def valid_span(s):
     assert type(s) is tuple, type(s)
     assert len(s) == 2, str(s)
@@ -131,10 +179,11 @@ def as_ent_replacement(text, ent_span, ents, cfg):
 
 
 def contextualise_sentence(sentence, span, ent_index, cfg):
+    if not is_span_index(ent_index):
+        ent_index = as_span_index(ent_index)
     ents_in_span = {
         relative_span(ent_span, span): ents
-        for ent_span, ents in ent_index.items()
-        if in_span(span, ent_span)}
+        for ent_span, ents in find_ents_in_span(ent_index, span)}
     replacements = {
         span: replacement
         for span, ents in ents_in_span.items()
@@ -179,8 +228,8 @@ def calc_claim_content(doc, cfg):
     """
     full_content = doc.get('title', '') + '\n\n' + doc.get('content', '')
     hl_fact_fields = [f for f in doc if is_fact_tax_hl_field(f)]
-    ent_index = index_ent_spans(doc)
-    logger.debug('Found %s entity spans in doc' % len(ent_index))
+    ent_index = as_span_index(index_ent_spans(doc))
+    logger.debug('Found %s entity spans in doc' % len(ent_index['spans']))
     result = [{
         'fact_field': hl_span['field'],
         'value': hl_span['value'],
@@ -6,6 +6,7 @@
 import nltk.data
 import nltk
 import logging
+import functools
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +17,14 @@ except Exception as e:
 
 tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
 
+@functools.lru_cache(maxsize=1024)
+def _split_sentences(text):
+    return tuple(tokenizer.tokenize(text))
+
+
 def nltk_sent_detector_fn(title, content):
     try:
-        return tokenizer.tokenize('%s. %s' % (title, content))
+        return list(_split_sentences('%s. %s' % (title, content)))
     except Exception as e:
         logger.error('', e)
         return [title]
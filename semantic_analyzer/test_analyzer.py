@@ -0,0 +1,37 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in analyzer
+"""
+import pytest
+from semantic_analyzer import analyzer
+
+
+def test_analyze_docs_01(monkeypatch):
+    # docs without content are fetched in one batch, using the cfg
+    fetched, scraped = [], []
+    monkeypatch.setattr(analyzer.url_scraper, 'fetch_urls',
+                        lambda urls, cfg: fetched.append((urls, cfg)))
+
+    def fake_scrape(url, include_raw_content=False, cfg={}):
+        scraped.append((url, cfg))
+        return {'resolved_url': url + '/full', 'title': 'T',
+                'content': 'Scraped content'}
+
+    monkeypatch.setattr(analyzer.url_scraper, 'scrape', fake_scrape)
+    monkeypatch.setattr(analyzer, 'get_analyzer_fn',
+                        lambda cfg: lambda content, title, cfg: None)
+    cfg = {'url_fetch_timeout': 0.5}
+    docs = [{'id': 'a', 'url': 'http://a.com', 'title': 'A',
+             'content': 'Given content'},
+            {'id': 'b', 'url': 'http://b.com'}]
+    results, timing = analyzer.analyze_docs(docs, cfg)
+    assert fetched == [(['http://b.com'], cfg)]
+    assert scraped == [('http://b.com', cfg)]
+    assert [r['id'] for r in results] == ['a', 'b']
+    assert results[0]['content'] == 'Given content'
+    assert results[1]['resolved_url'] == 'http://b.com/full'
+    assert all(r['status'] == 'done' for r in results)
+    assert timing['phase'] == 'analyze_docs'
+    assert [t['phase'] for t in timing['sub_timings']] == [
+        'url_scraping', 'translation', 'semantic_analysis']
@@ -0,0 +1,44 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in claim_content_expander
+"""
+import random
+import pytest
+from semantic_analyzer import claim_content_expander as cce
+
+
+def test_hl_field_classification_01():
+    assert cce.is_fact_tax_hl_field('fact_politics_tax_hl')
+    assert cce.is_tax_hl_field('taxonomy_iptc_tax_hl')
+    assert cce.is_ent_hl_field('people_hl')
+    assert not cce.is_ent_hl_field('fact_politics_tax_hl')
+    assert not cce.is_ent_hl_field('taxonomy_iptc_tax_hl')
+    assert not cce.is_ent_hl_field('people_ss')
+
+
+def test_find_ents_in_span_01():
+    # same results as a linear scan over the entity index
+    random.seed(42)
+    ent_index = {}
+    for i in range(200):
+        b = random.randint(0, 1000)
+        ent_index[(b, b + random.randint(0, 20))] = ['ent%d' % i]
+    span_index = cce.as_span_index(ent_index)
+    for outer in [(0, 50), (100, 400), (990, 1020), (500, 500)]:
+        expected = sorted((span, ents) for span, ents in ent_index.items()
+                          if cce.in_span(outer, span))
+        assert cce.find_ents_in_span(span_index, outer) == expected
+
+
+def test_calc_claim_content_01():
+    doc = {
+        'title': 'Title',
+        'content': 'Barack Obama was born in Hawaii. He was president.',
+        'people_hl': ['Barack Obama|7-18|40-41'],
+        'fact_politics_tax_hl': ['claim|40-56']
+    }
+    result = cce.calc_claim_content(doc, {})
+    assert len(result) == 1
+    assert result[0]['content'] == 'He was president.'
+    assert result[0]['contextual_content'] == 'Barack Obama was president.'
@@ -0,0 +1,145 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in url_fetcher
+"""
+import contextvars
+import pytest
+from semantic_analyzer import url_fetcher
+
+
+class FakeStreamedResponse:
+    def __init__(self, body, url='http://example.com/page', encoding='utf-8',
+                 location=None, status_code=200):
+        self.body = body
+        self.url = url
+        self.encoding = encoding
+        self.headers = {'location': location} if location else {}
+        self.is_redirect = location is not None
+        self.status_code = status_code
+        self.closed = False
+
+    @property
+    def apparent_encoding(self):
+        raise RuntimeError('The content for this response was already consumed')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise url_fetcher.requests.HTTPError('%s Error' % self.status_code)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i+chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def test_is_shortened_url_01():
+    assert url_fetcher.is_shortened_url('https://t.co/abc123')
+    assert url_fetcher.is_shortened_url('http://www.bit.ly/xyz')
+    assert not url_fetcher.is_shortened_url('https://www.bbc.co.uk/news')
+
+
+def test_read_capped_body_01():
+    resp = FakeStreamedResponse(b'a' * 100)
+    assert url_fetcher.read_capped_body(resp, 1000) == 'a' * 100
+    assert resp.closed
+
+
+def test_read_capped_body_02():
+    # body larger than cap gets truncated
+    resp = FakeStreamedResponse(b'b' * (200 * 1024))
+    body = url_fetcher.read_capped_body(resp, 1000)
+    assert body == 'b' * 1000
+
+
+def test_read_capped_body_03():
+    # without a charset the body is decoded as utf-8
+    resp = FakeStreamedResponse('café'.encode('utf-8'), encoding=None)
+    assert url_fetcher.read_capped_body(resp, 1000) == 'café'
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        return self.responses[url]
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    url_fetcher.clear_caches()
+    session = FakeSession({})
+    monkeypatch.setattr(url_fetcher, 'get_session', lambda cfg: session)
+    yield session
+    url_fetcher.clear_caches()
+
+
+def test_fetch_url_01(fake_session):
+    # redirects are followed hop by hop and cached for short links
+    target = 'https://example.com/article'
+    fake_session.responses = {
+        'https://t.co/abc': FakeStreamedResponse(b'', location=target),
+        target: FakeStreamedResponse(b'hello', url=target)}
+    result = url_fetcher.fetch_url('https://t.co/abc')
+    assert result == {'resolved_url': target, 'raw_content': 'hello'}
+    assert fake_session.requested == ['https://t.co/abc', target]
+    assert all(r.closed for r in fake_session.responses.values())
+    assert url_fetcher._redirects['https://t.co/abc'] == target
+
+
+def test_fetch_url_02(fake_session):
+    # failures close the response and are cached for error_ttl seconds
+    url = 'https://example.com/missing'
+    resp = FakeStreamedResponse(b'not found', url=url, status_code=404)
+    fake_session.responses = {url: resp}
+    result = url_fetcher.fetch_url(url)
+    assert resp.closed
+    assert result['raw_content'] == ''
+    assert '404' in result['url_error']
+    assert url_fetcher.fetch_url(url) == result
+    assert fake_session.requested == [url]
+    # expired failures are fetched again
+    url_fetcher.clear_caches()
+    url_fetcher.fetch_url(url, {'url_fetch_error_ttl': -1})
+    url_fetcher.fetch_url(url, {'url_fetch_error_ttl': -1})
+    assert fake_session.requested == [url] * 3
+
+
+def test_domain_semaphore_01():
+    a = url_fetcher.domain_semaphore('https://Example.com/a')
+    assert a is url_fetcher.domain_semaphore('http://example.com/b')
+    assert len(url_fetcher._domain_sems) == url_fetcher.n_domain_stripes
+
+
+def test_fetch_urls_01():
+    # results preserve order and errors have the same shape
+    urls = ['notascheme://foo/1', 'notascheme://bar/2', 'notascheme://foo/3']
+    results = url_fetcher.fetch_urls(urls)
+    assert [r['resolved_url'] for r in results] == urls
+    for r in results:
+        assert r['raw_content'] == ''
+        assert 'url_error' in r
+
+
+def test_fetch_urls_02():
+    assert url_fetcher.fetch_urls([]) == []
+
+
+def test_fetch_urls_03(monkeypatch):
+    # fetches run in the context of the caller, e.g. its trace
+    var = contextvars.ContextVar('test_var', default=None)
+    var.set('caller')
+    monkeypatch.setattr(url_fetcher, 'fetch_url', lambda url, cfg: var.get())
+    assert url_fetcher.fetch_urls(['http://a.com', 'http://b.com']) == [
+        'caller', 'caller']
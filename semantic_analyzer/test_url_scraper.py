@@ -0,0 +1,55 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in url_scraper
+"""
+import json
+import pytest
+from semantic_analyzer import url_scraper
+
+
+html_01 = '''<html><head><title>A title</title>
+<meta property="og:title" content="OG title"/>
+<meta name="description" content="filtered"/>
+<script type="application/ld+json">
+{"@type": "NewsArticle", "datePublished": "2020-01-01"}
+</script></head>
+<body>
+<div itemscope itemtype="http://schema.org/Article" itemid="art1">
+  <span itemprop="headline">Head <b>line</b></span>
+  <a itemprop="url" href="http://example.com/a">link</a>
+  <div itemprop="author" itemscope itemtype="http://schema.org/Person">
+    <meta itemprop="name" content="Jane"/>
+  </div>
+  <div itemscope itemtype="http://schema.org/Thing">
+    <span itemprop="name">Unlinked</span>
+  </div>
+</div>
+<article><p>First paragraph.</p><p>Second paragraph.</p></article>
+</body></html>'''
+
+
+def test_extract_microdata_from_soup_01():
+    # same items as the html5lib based microdata library
+    expected = url_scraper.extract_microdata_from_html(html_01)
+    soup = url_scraper.parse_html(html_01)
+    actual = url_scraper.extract_microdata_from_soup(soup)
+    assert json.dumps(actual) == json.dumps(expected)
+    assert len(actual) == 2
+
+
+def test_extract_metadata_from_html_01():
+    meta = url_scraper.extract_metadata_from_html(html_01)
+    assert meta['title'] == 'A title'
+    assert meta['meta_tags'] == {'og:title': 'OG title'}
+    assert meta['json-ld'] == [
+        {'@type': 'NewsArticle', 'datePublished': '2020-01-01'}]
+    assert url_scraper.find_pubDate(meta) == '2020-01-01'
+
+
+def test_extract_text_from_html_01():
+    # accepts both raw html and a parsed tree
+    soup = url_scraper.parse_html(html_01)
+    expected = 'First paragraph. Second paragraph.'
+    assert url_scraper.extract_text_from_html(soup) == expected
+    assert url_scraper.extract_text_from_html(html_01) == expected
@@ -162,7 +162,7 @@ def claims_by_ciapi_from_html(scraped_page, unresolved_url, tweetID, cfg):
 def analyzed_doc(url, cfg):
     logger.info("Scraping " + url)
     start = citimings.start()
-    scraped = url_scraper.scrape(url)
+    scraped = url_scraper.scrape(url, cfg=cfg)
     scraped_t = citimings.timing('url_scraping', start)
 
     resolved_url = scraped['resolved_url']
@@ -174,8 +174,9 @@ def analyzed_doc(url, cfg):
     ci_collections = cfg.get(
         'relsents_in_colls',
         ['pilot-se', 'pilot-gr', 'pilot-at', 'factcheckers', 'fc-dev'])
-    assert cisearch_available
-    preidx_doc = cisearch.find_preindexed_doc_by_url(resolved_url, ci_collections)
+    assert gcssearch_available
+    preidx_doc = gcssearch.find_preindexed_doc_by_url(
+        resolved_url, ci_collections, cfg)
     preidx_doc_t = citimings.timing('retrieve_preindexed', start2)
     if preidx_doc is not None:
         logger.info(
@@ -200,6 +201,8 @@ def build_in_linked_info(tweetID, urls, cfg):
     # why extract claims here? let predictor assess credibility of doc
     # so no need to extract sentences here
     in_linked_doc = []
+    # resolve all urls concurrently, `analyzed_doc` reuses fetched pages
+    url_scraper.fetch_urls(urls, cfg)
     for url in urls:
         start = citimings.start()
         try:
@@ -0,0 +1,248 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""url_fetcher: concurrent fetching of the urls mentioned in a request
+
+Fetches share a pooled `requests.Session`, run in a thread pool, and
+are limited per domain so we never hammer a single host. Redirect
+chains for url shorteners (t.co, bit.ly, ...) are cached, so resolving
+the same short link again only costs a single request for the target
+page. Redirects are followed one hop at a time, so each request is
+limited by the domain it is sent to, rather than by the domain of the
+short link. Response bodies are read in streaming mode and truncated at
+a configurable size. Failed fetches are also cached, but only for
+`url_fetch_error_ttl` seconds.
+"""
+import time
+import zlib
+import contextvars
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from esiutils import cimetrics
+
+logger = logging.getLogger(__name__)
+
+default_cfg = {
+    'url_fetch_timeout': 1.5,
+    'url_fetch_max_workers': 8,
+    'url_fetch_per_domain': 2,
+    'url_fetch_max_bytes': 2 * 1024 * 1024,
+    'url_fetch_cache_size': 128,
+    'url_fetch_redirect_cache_size': 1024,
+    'url_fetch_error_ttl': 60.0
+}
+
+# per-domain limits use a fixed number of semaphores, domains which
+#  hash to the same stripe share its limit
+n_domain_stripes = 256
+max_redirects = 10
+
+shortener_domains = {
+    't.co', 'bit.ly', 'buff.ly', 'goo.gl', 'ow.ly', 'tinyurl.com',
+    'dlvr.it', 'fb.me', 'is.gd', 'trib.al', 'ift.tt', 'youtu.be'
+}
+
+_session = None
+_session_lock = threading.Lock()
+_domain_sems = []
+_domain_sems_lock = threading.Lock()
+_fetched = collections.OrderedDict()
+_failed = collections.OrderedDict()  # url -> (expiry time, result)
+_redirects = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cfg_val(cfg, key):
+    return type(default_cfg[key])(cfg.get(key, default_cfg[key]))
+
+
+def get_session(cfg={}):
+    """Returns the `requests.Session` shared by all fetches in this process
+
+    :param cfg: config options, only used to size the connection pool on
+      first call
+    :returns: a pooled http session
+    :rtype: requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = _cfg_val(cfg, 'url_fetch_max_workers')
+            adapter = HTTPAdapter(pool_connections=pool_size,
+                                  pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def domain_semaphore(url, cfg={}):
+    """Returns the semaphore limiting concurrent fetches for the url's domain
+
+    Semaphores are striped by the hash of the domain, so memory does not
+    grow with the number of domains seen. The limit per domain always
+    holds, but unrelated domains may occasionally share a stripe.
+    """
+    domain = urlparse(url).netloc.lower()
+    with _domain_sems_lock:
+        if len(_domain_sems) == 0:
+            _domain_sems.extend(
+                threading.BoundedSemaphore(_cfg_val(cfg, 'url_fetch_per_domain'))
+                for _ in range(n_domain_stripes))
+    return _domain_sems[zlib.crc32(domain.encode('utf-8')) % n_domain_stripes]
+
+
+def is_shortened_url(url):
+    domain = urlparse(url).netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain in shortener_domains
+
+
+def _lru_get(odict, key):
+    with _cache_lock:
+        if key not in odict:
+            return None
+        odict.move_to_end(key)
+        return odict[key]
+
+
+def _lru_put(odict, key, value, maxsize):
+    with _cache_lock:
+        odict[key] = value
+        odict.move_to_end(key)
+        while len(odict) > maxsize:
+            odict.popitem(last=False)
+
+
+def read_capped_body(resp, max_bytes):
+    """Reads the body of a streamed response up to `max_bytes`
+
+    :param resp: a `requests.Response` obtained with `stream=True`
+    :param max_bytes: maximum number of bytes to read
+    :returns: the decoded (possibly truncated) body
+    :rtype: str
+    """
+    chunks = []
+    size = 0
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            logger.info('Truncating body of %s at %d bytes' % (
+                resp.url, max_bytes))
+            break
+    resp.close()
+    body = b''.join(chunks)[:max_bytes]
+    # the stream is consumed, so `apparent_encoding` is no longer available
+    return body.decode(resp.encoding or 'utf-8', errors='replace')
+
+
+def _do_fetch(url, cfg):
+    target = _lru_get(_redirects, url) or url
+    for _ in range(max_redirects + 1):
+        with domain_semaphore(target, cfg):
+            resp = get_session(cfg).get(
+                target, timeout=_cfg_val(cfg, 'url_fetch_timeout'),
+                stream=True, allow_redirects=False)
+            with resp:
+                if resp.is_redirect:
+                    target = urljoin(target, resp.headers['location'])
+                    continue
+                resp.raise_for_status()
+                raw_content = read_capped_body(
+                    resp, _cfg_val(cfg, 'url_fetch_max_bytes'))
+        break
+    else:
+        raise requests.TooManyRedirects('Exceeded %d redirects' % max_redirects)
+    if is_shortened_url(url) and target != url:
+        _lru_put(_redirects, url, target,
+                 _cfg_val(cfg, 'url_fetch_redirect_cache_size'))
+    return {
+        "resolved_url": target,
+        "raw_content": raw_content
+    }
+
+
+def _cached_failure(url):
+    with _cache_lock:
+        expiry, result = _failed.get(url, (0, None))
+        if expiry < time.time():
+            _failed.pop(url, None)
+            return None
+        return result
+
+
+def fetch_url(url, cfg={}):
+    """Tries to fetch a url
+
+    Successful fetches are cached, so a url prefetched via `fetch_urls`
+    is not requested again. Failed fetches are cached for
+    `url_fetch_error_ttl` seconds, so a dead or slow link does not wait
+    out the timeout for every step of a review.
+
+    :param url: possibly unresolved url
+    :param cfg: config options, see `default_cfg`
+    :returns: a dict with keys 'resolved_url' and 'raw_content'. If the
+      fetch failed, 'raw_content' is empty and 'url_error' describes
+      the problem
+    :rtype: dict
+    """
+    cached = _lru_get(_fetched, url) or _cached_failure(url)
+    cimetrics.count_cache('url_fetch', cached is not None)
+    if cached is not None:
+        return cached
+    logger.info("Resolving " + url)
+    try:
+        result = _do_fetch(url, cfg)
+        _lru_put(_fetched, url, result, _cfg_val(cfg, 'url_fetch_cache_size'))
+        return result
+    except Exception as e:
+        logger.error('Error fetching %s %s' % (url, e))
+        cimetrics.count_upstream_error('url_fetch')
+        result = {
+            "resolved_url": url,
+            "raw_content": "",
+            "url_error": str(e)
+        }
+        expiry = time.time() + _cfg_val(cfg, 'url_fetch_error_ttl')
+        _lru_put(_failed, url, (expiry, result),
+                 _cfg_val(cfg, 'url_fetch_cache_size'))
+        return result
+
+
+def fetch_urls(urls, cfg={}):
+    """Fetches a list of urls concurrently
+
+    :param urls: list of possibly unresolved urls
+    :param cfg: config options, see `default_cfg`
+    :returns: list of fetch results in the same order as `urls`, see
+      `fetch_url`
+    :rtype: list of dict
+    """
+    # each fetch runs in a copy of the caller's context, so it is
+    #  recorded as part of the current trace (see `esiutils.citrace`)
+    if len(urls) == 0:
+        return []
+    if len(urls) == 1:
+        return [fetch_url(urls[0], cfg)]
+    cimetrics.observe_batch_size('fetch_urls', len(urls))
+    n_workers = min(len(urls), _cfg_val(cfg, 'url_fetch_max_workers'))
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(contextvars.copy_context().run,
+                                   fetch_url, url, cfg)
+                   for url in urls]
+        return [future.result() for future in futures]
+
+
+def clear_caches():
+    with _cache_lock:
+        _fetched.clear()
+        _failed.clear()
+        _redirects.clear()
@@ -1,5 +1,4 @@
 import sys
-import requests
 import logging
 from bs4 import BeautifulSoup
 import argparse
@@ -7,7 +6,7 @@ import time
 from datetime import datetime
 import json
 from urllib.parse import urlparse
-import functools
+from semantic_analyzer import url_fetcher
 
 
 """ url_scraper: extracts text and metadata from a given url
@@ -23,33 +22,50 @@ def millis_from(start):
     return ms
 
 
-@functools.lru_cache(maxsize=128)
-def fetch_url(url):
+def fetch_url(url, cfg={}):
     """Tries to fetch a url
 
     :param url: possibly unresolved url
+    :param cfg: optional config options, see `url_fetcher.default_cfg`
     :returns: a dict with keys 'resolved_url' and 'raw_content'
     :rtype: dict
     """
-    logger.info("Resolving " + url)
-    try:
-        resp = requests.get(url, timeout=1.5)
-        resp.raise_for_status()
-        return {
-            "resolved_url": resp.url,
-            "raw_content": resp.text
-        }
-    except Exception as e:
-        logger.error('Error fetching %s' % url, e)
-        return {
-            "resolved_url": url,
-            "raw_content": "",
-            "url_error": str(e)
-        }
+    return url_fetcher.fetch_url(url, cfg)
+
+
+def fetch_urls(urls, cfg={}):
+    """Fetches a list of urls concurrently, see `url_fetcher.fetch_urls`
+    """
+    return url_fetcher.fetch_urls(urls, cfg)
+
+
+try:
+    import lxml  # noqa: F401
+    html_parser = 'lxml'
+except ImportError:
+    logger.info('lxml not available, falling back to html.parser')
+    html_parser = 'html.parser'
+
+
+def parse_html(html_str):
+    """Parses an html string, using lxml when it is available
+
+    :param html_str: the raw html content
+    :returns: a parsed tree which can be passed to any of the
+      `extract_xxx` functions in this module
+    :rtype: BeautifulSoup
+    """
+    return BeautifulSoup(html_str, html_parser)
 
 
-def extract_text_from_html(html_str):
-    soup = BeautifulSoup(html_str, 'html.parser')
+def _as_soup(html_or_soup):
+    if isinstance(html_or_soup, BeautifulSoup):
+        return html_or_soup
+    return parse_html(html_or_soup)
+
+
+def extract_text_from_html(html_or_soup):
+    soup = _as_soup(html_or_soup)
     article_matches = soup.find_all('article')  # , {'role': 'article'}
     logger.info("Found %d article elements" % len(article_matches))
     if len(article_matches) > 0:
@@ -64,8 +80,8 @@ def extract_text_from_html(html_str):
     return " ".join(parafs).encode("utf-8", errors="ignore").decode()
 
 
-def extract_title(html_str, all_meta):
-    soup = BeautifulSoup(html_str, 'html.parser')
+def extract_title(html_or_soup, all_meta):
+    soup = _as_soup(html_or_soup)
     try:
         return soup.title.string
     except Exception as e:
@@ -110,6 +126,101 @@ def extract_microdata_from_html(html_str):
         return [{'extraction_error': str(e)}]
 
 
+# tag -> attribute holding the value of an itemprop, as in the microdata lib
+md_property_attrs = {
+    'meta': 'content', 'audio': 'src', 'embed': 'src', 'iframe': 'src',
+    'img': 'src', 'source': 'src', 'video': 'src', 'a': 'href',
+    'area': 'href', 'link': 'href', 'object': 'data', 'time': 'datetime'
+}
+
+
+def _md_new_item(elt):
+    item = {}
+    itemtype = elt.get('itemtype')
+    if itemtype:
+        item['type'] = itemtype.split(' ')
+    itemid = elt.get('itemid')
+    if itemid:
+        item['id'] = itemid
+    item['properties'] = {}
+    return item
+
+
+def _md_set(item, names, value):
+    for name in names.split(' '):
+        item['properties'].setdefault(name, []).append(value)
+
+
+def _md_text(elt):
+    if elt.name is None:
+        return str(elt)
+    if elt.name == 'script':
+        return ''
+    return ''.join(_md_text(child) for child in elt.children)
+
+
+def _md_value(elt):
+    attr = md_property_attrs.get(elt.name)
+    if attr:
+        return elt.get(attr, '')
+    return elt.get('content') or _md_text(elt)
+
+
+def _md_extract(elt, item):
+    """Assigns the itemprops below `elt` to `item`
+
+    :returns: elements with an itemscope unrelated to `item`
+    :rtype: list
+    """
+    unlinked = []
+    for child in elt.children:
+        if child.name is None:
+            continue
+        itemprop = child.get('itemprop')
+        itemscope = child.has_attr('itemscope')
+        if itemprop and itemscope:
+            for name in itemprop.split(' '):
+                nested = _md_new_item(child)
+                unlinked.extend(_md_extract(child, nested))
+                _md_set(item, name, nested)
+        elif itemprop:
+            _md_set(item, itemprop, _md_value(child))
+            unlinked.extend(_md_extract(child, item))
+        elif itemscope:
+            unlinked.append(child)
+        else:
+            unlinked.extend(_md_extract(child, item))
+    return unlinked
+
+
+def _md_find_items(elt):
+    if elt.name is None:
+        return []
+    if elt.has_attr('itemscope'):
+        item = _md_new_item(elt)
+        items = [item]
+        for unlinked in _md_extract(elt, item):
+            items.extend(_md_find_items(unlinked))
+        return items
+    return [item
+            for child in elt.children
+            for item in _md_find_items(child)]
+
+
+def extract_microdata_from_soup(soup):
+    """Extracts microdata items from an already parsed html tree
+
+    Produces the same dicts as `extract_microdata_from_html`, but
+    avoids re-parsing the page with html5lib.
+    """
+    try:
+        return [item
+                for child in soup.children
+                for item in _md_find_items(child)]
+    except Exception as e:
+        return [{'extraction_error': str(e)}]
+
+
 def try_parse_json(s):
     try:
         return json.loads(s)
@@ -118,16 +229,16 @@ def try_parse_json(s):
         return {}
 
 
-def extract_jsonld_from_html(html_str):
-    soup = BeautifulSoup(html_str, 'html.parser')
+def extract_jsonld_from_html(html_or_soup):
+    soup = _as_soup(html_or_soup)
     jlds = soup.find_all('script', {'type': 'application/ld+json'})
     contents = [jld.text for jld in jlds]
     return [try_parse_json(c) for c in contents]
 
 
-def extract_meta_tags(html_str):
+def extract_meta_tags(html_or_soup):
     prop_prefixes = ['article:', 'og:', 'twitter:', 'fb:']
-    soup = BeautifulSoup(html_str, 'html.parser')
+    soup = _as_soup(html_or_soup)
     result = {}
     filtered_props = []
     for meta in soup.find_all('meta'):
@@ -149,13 +260,24 @@ def extract_meta_tags(html_str):
     return result
 
 
-def extract_metadata_from_html(html_str):
+def extract_metadata_from_html(html_str, soup=None):
+    """Extracts metadata from an html string
+
+    :param html_str: the raw html content
+    :param soup: optional, the already parsed `html_str`. If not given,
+      the `html_str` will be parsed.
+    :returns: dict with the `title`, `meta_tags`, `microdata` and
+      `json-ld` found in the page
+    :rtype: dict
+    """
+    if soup is None:
+        soup = parse_html(html_str)
     all_meta = {
-        'meta_tags': extract_meta_tags(html_str),
-        'microdata': extract_microdata_from_html(html_str),
-        'json-ld': extract_jsonld_from_html(html_str)
+        'meta_tags': extract_meta_tags(soup),
+        'microdata': extract_microdata_from_soup(soup),
+        'json-ld': extract_jsonld_from_html(soup)
     }
-    title = extract_title(html_str, all_meta)
+    title = extract_title(soup, all_meta)
     if title is None:
         title = ''    
     return {
@@ -216,15 +338,16 @@ def url_domain(url):
         logger.error("Failed to extract netloc from url")
 
 
-def scrape(url, include_raw_content=False):
+def scrape(url, include_raw_content=False, cfg={}):
     logger.info("fetching " + url)
     start = datetime.now()
-    fetched = fetch_url(url)
+    fetched = fetch_url(url, cfg)
     logger.info("Resolved to " + fetched['resolved_url'])
     raw_content = fetched['raw_content']
     # logger.info("raw_content " + fetched['raw_content'])
-    content = extract_text_from_html(raw_content)
-    metadata = extract_metadata_from_html(raw_content)
+    soup = parse_html(raw_content)
+    content = extract_text_from_html(soup)
+    metadata = extract_metadata_from_html(raw_content, soup)
     result = {
         **fetched,
         **extract_top_level_meta(metadata),
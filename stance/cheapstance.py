@@ -0,0 +1,234 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Lightweight stance classifier, used as first stage of a cascade
+
+A multinomial logistic regression over features derived from the
+semantic encodings (as provided by the `claimencoder`) of a claim and
+a document body. It is orders of magnitude cheaper than the RoBERTa
+FNC-1 classifier in `stancepred`, so `stancepred.predict_stances_cascade`
+only escalates the pairs for which this model is not confident enough.
+
+The model is stored as plain json (no pickles) so it can be shipped
+next to the saved FNC-1 model. Train one via
+
+    python -m stance.cheapstance -semencoderUrl http://localhost:8071/... \\
+      -trainBodies data/fnc1/train_bodies.csv \\
+      -trainStances data/fnc1/train_stances.csv \\
+      -out models/fnc1-cheap-stance.json
+"""
+import json
+import logging
+import numpy as np
+from esiutils import cfgu
+
+logger = logging.getLogger(__name__)
+
+
+def pair_features(claim_vecs, body_vecs):
+    """Features for a list of claim, body pairs given their encodings
+
+    :param claim_vecs: array-like of shape (n, dim)
+    :param body_vecs: array-like of shape (n, dim)
+    :returns: array of shape (n, 4 * dim + 1) with the normalised claim
+      and body vectors, their absolute difference, their element-wise
+      product and their cosine similarity
+    :rtype: numpy.ndarray
+    """
+    u = _l2_normalise(np.asarray(claim_vecs, dtype=np.float32))
+    v = _l2_normalise(np.asarray(body_vecs, dtype=np.float32))
+    cosims = np.sum(u * v, axis=1, keepdims=True)
+    return np.hstack([u, v, np.abs(u - v), u * v, cosims])
+
+
+def _l2_normalise(vecs):
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.where(norms == 0, 1.0, norms)
+
+
+def encode_pairs(encoder_fn, claim_bod_pairs, text2vec=None):
+    """Calculates the `pair_features` for a list of claim, body tuples
+
+    :param encoder_fn: function that maps a list of str onto a list of
+      embeddings, e.g. the `sentence_encoder_fn` of a vec space
+    :param claim_bod_pairs: list of (claim, body) str tuples
+    :param text2vec: optional dict with the encodings which are already
+      available, e.g. of the bodies in the claim index. Only the other
+      texts are encoded with `encoder_fn`
+    :rtype: numpy.ndarray
+    """
+    claims = [claim for claim, _ in claim_bod_pairs]
+    bodies = [body for _, body in claim_bod_pairs]
+    text2vec = dict(text2vec or {})
+    # claims are usually repeated, so only encode distinct texts
+    texts = [text for text in dict.fromkeys(claims + bodies)
+             if text not in text2vec]
+    if len(texts) > 0:
+        text2vec.update(zip(texts, encoder_fn(texts)))
+    return pair_features([text2vec[c] for c in claims],
+                         [text2vec[b] for b in bodies])
+
+
+def train(features, labels, C=1.0, max_iter=1000):
+    """Trains a `CheapStanceModel`
+
+    :param features: array of shape (n, n_features), see `pair_features`
+    :param labels: list of n stance labels, e.g. `agree`
+    :param C: inverse regularisation strength
+    :param max_iter: maximum number of solver iterations
+    :returns: a `CheapStanceModel` dict
+    :rtype: dict
+    """
+    from sklearn.linear_model import LogisticRegression
+    clf = LogisticRegression(C=C, max_iter=max_iter)
+    clf.fit(features, labels)
+    return {
+        '@type': 'CheapStanceModel',
+        'stances': [str(s) for s in clf.classes_],
+        'n_features': int(features.shape[1]),
+        'coef': clf.coef_.tolist(),
+        'intercept': clf.intercept_.tolist()
+    }
+
+
+def predict_proba(model, features):
+    """Stance probabilities for a batch of features
+
+    :param model: a `CheapStanceModel`
+    :param features: array of shape (n, n_features)
+    :returns: array of shape (n, n_stances), columns are aligned with
+      `model['stances']`
+    :rtype: numpy.ndarray
+    """
+    features = np.atleast_2d(features)
+    assert features.shape[1] == model['n_features'], '%s != %s' % (
+        features.shape[1], model['n_features'])
+    logits = features @ np.asarray(model['coef']).T + np.asarray(
+        model['intercept'])
+    if logits.shape[1] == 1:  # binary models only store the positive class
+        p1 = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+        return np.stack([1.0 - p1, p1], axis=1)
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exps = np.exp(logits)
+    return exps / exps.sum(axis=1, keepdims=True)
+
+
+def predict(model, features, min_conf):
+    """Predicts stances and whether they need to be escalated
+
+    :param model: a `CheapStanceModel`
+    :param features: array of shape (n, n_features)
+    :param min_conf: minimum confidence in [0, 1] for a prediction to
+      be accepted without escalation
+    :returns: a triple of aligned lists: the stance labels, their
+      confidences and a bool per prediction which is True when the
+      confidence is below `min_conf`
+    :rtype: tuple
+    """
+    probs = predict_proba(model, features)
+    labids = probs.argmax(axis=1)
+    labels = [model['stances'][i] for i in labids]
+    confs = [float(p) for p in probs.max(axis=1)]
+    return labels, confs, [conf < min_conf for conf in confs]
+
+
+def predict_cascade(cascade, claim_bod_pairs, predict_fn, text2vec=None):
+    """Predicts stances with the cheap model, escalating uncertain pairs
+
+    :param cascade: a cascade dict, see `load_cascade`
+    :param claim_bod_pairs: list of (claim, body) str tuples
+    :param predict_fn: function to predict the stances of the escalated
+      pairs, returns a tuple with the aligned labels and confidences
+    :param text2vec: optional dict of available encodings, see `encode_pairs`
+    :returns: a triple with the aligned lists of labels and confidences
+      and the number of escalated pairs
+    :rtype: tuple
+    """
+    features = encode_pairs(cascade['encoder_fn'], claim_bod_pairs, text2vec)
+    labels, confs, escalate = predict(
+        cascade['model'], features, cascade['min_conf'])
+    esc_idxs = [i for i, esc in enumerate(escalate) if esc]
+    if len(esc_idxs) > 0:
+        esc_labels, esc_confs = predict_fn(
+            [claim_bod_pairs[i] for i in esc_idxs])
+        for i, label, conf in zip(esc_idxs, esc_labels, esc_confs):
+            labels[i], confs[i] = label, conf
+    return labels, confs, len(esc_idxs)
+
+
+def load_cascade(cfg, encoder_fn):
+    """Loads the stance cascade if configured
+
+    :param cfg: the `stance` section of the config. Relevant keys are
+      `cascade` (whether to enable it), `cascade_model_path` (a saved
+      `cheapstance` model) and `cascade_min_conf`
+    :param encoder_fn: function that maps a list of str onto a list of
+      embeddings, consistent with the one used to train the cheap model
+    :returns: a cascade dict or None if the cascade is not enabled
+    :rtype: dict
+    """
+    if not cfgu.get_bool(cfg, 'cascade'):
+        return None
+    return {
+        'model': load(cfg['cascade_model_path']),
+        'model_path': cfg['cascade_model_path'],
+        'min_conf': float(cfg.get('cascade_min_conf', 0.9)),
+        'encoder_fn': encoder_fn
+    }
+
+
+def save(model, path):
+    with open(path, 'w', encoding='utf-8') as out_f:
+        json.dump(model, out_f)
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as in_f:
+        model = json.load(in_f)
+    assert model.get('@type') == 'CheapStanceModel', path
+    return model
+
+
+def read_fnc1_pairs(bodies_path, stances_path):
+    """Reads FNC-1 claim, body pairs and their stance labels
+
+    :returns: tuple with a list of (headline, body) tuples and an aligned
+      list of stance labels
+    :rtype: tuple
+    """
+    import pandas as pd
+    bodies = pd.read_csv(bodies_path).set_index('Body ID')['articleBody']
+    stances_df = pd.read_csv(stances_path)
+    pairs = [(row['Headline'], bodies[row['Body ID']])
+             for _, row in stances_df.iterrows()]
+    return pairs, stances_df['Stance'].tolist()
+
+
+if __name__ == '__main__':
+    import argparse
+    from claimneuralindex import claim_neural_index
+    parser = argparse.ArgumentParser(
+        description='Train the lightweight first stage of the stance cascade',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-semencoderUrl', required=True,
+                        help='Url of the semantic encoder service')
+    parser.add_argument('-trainBodies', required=True,
+                        help='Path to the FNC-1 train bodies csv')
+    parser.add_argument('-trainStances', required=True,
+                        help='Path to the FNC-1 train stances csv')
+    parser.add_argument('-out', required=True,
+                        help='Path of the json file to write the model to')
+    parser.add_argument('-C', type=float, default=1.0,
+                        help='Inverse regularisation strength')
+    parser.add_argument('-batchSize', type=int, default=256,
+                        help='Number of pairs encoded per request')
+    args = parser.parse_args()
+
+    encoder_fn = claim_neural_index.semantic_sent_encoder(args.semencoderUrl)
+    pairs, labels = read_fnc1_pairs(args.trainBodies, args.trainStances)
+    features = np.vstack([
+        encode_pairs(encoder_fn, pairs[i:i + args.batchSize])
+        for i in range(0, len(pairs), args.batchSize)])
+    model = train(features, labels, C=args.C)
+    save(model, args.out)
+    print('Trained on %d pairs, saved to %s' % (len(pairs), args.out))
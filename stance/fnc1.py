@@ -16,7 +16,7 @@ import time
 import copy
 from scipy import stats
 from sklearn import metrics
-from stance import stancepred
+from stance import stancepred, cheapstance
 import logging
 
 logger = logging.getLogger(__name__)
@@ -52,11 +52,15 @@ class FNC1Dataset(torch.utils.data.Dataset):
     #return self.sts_df.iterrows()
 
 
-def test_model(tok_model, cfg):
+def test_model(tok_model, cfg, cascade=None):
     """Tests a stance predictor model using FNC-1
 
     :param tok_model: a stance predictor model as returned by `stancepred.load_saved_fnc1_model`
     :param cfg: config options
+    :param cascade: optional cascade as returned by `cheapstance.load_cascade`.
+      When provided, the metrics also include the accuracy of the cheap
+      first stage (`cheap_acc`), of the cascade (`cascade_acc`) and the
+      fraction of pairs escalated to `tok_model` (`escalation_rate`)
     :returns: a review for the model describing its accuracy on the tested dataset
     :rtype: dict
     """
@@ -119,17 +123,30 @@ def test_model(tok_model, cfg):
                               token_type_ids=type_ids if use_tok_type else None)
             assert len(model_out) == 1
             logits = model_out[0]
+            pred_ids = torch.argmax(logits, dim=1).tolist()
 
-            return stance_ids.tolist(), torch.argmax(logits, dim=1).tolist()
+            if cascade is None:
+                return stance_ids.tolist(), pred_ids, None, None
+            cheap_labels, _, escalate = cheapstance.predict(
+                cascade['model'],
+                cheapstance.encode_pairs(cascade['encoder_fn'], inputs),
+                cascade['min_conf'])
+            cheap_ids = [stance2i[label] for label in cheap_labels]
+            return stance_ids.tolist(), pred_ids, cheap_ids, escalate
 
         # run epoch:
         model.eval()   # Set model to evaluate mode (important for Dropout layers)
       
         _label_ids, _pred_ids = [], []
+        _cheap_ids, _escalate = [], []
         for fnc1_itembatch in dataloaders[phase]: # Iterate over data in epoch
-            batch_labels, batch_preds = run_step(fnc1_itembatch)
+            batch_labels, batch_preds, batch_cheap, batch_esc = run_step(
+                fnc1_itembatch)
             _label_ids += batch_labels
             _pred_ids += batch_preds
+            if cascade is not None:
+                _cheap_ids += batch_cheap
+                _escalate += batch_esc
       
         assert len(_label_ids) == len(_pred_ids), "%s %s" % (len(_label_ids), len(_pred_ids))
         epoch_acc = metrics.accuracy_score(_label_ids, _pred_ids)
@@ -138,12 +155,20 @@ def test_model(tok_model, cfg):
         epoch_recall = metrics.recall_score(_label_ids, _pred_ids, average='micro')
         logger.info('{} acc={:.4f}, f1={:.4f}, p={:.4f}, r={:.4f}, n={}'.format(
             phase, epoch_acc, epoch_f1, epoch_prec, epoch_recall, len(_label_ids)))
-        return {"metrics": {
+        result = {"metrics": {
                     "acc": epoch_acc,
                     "f1_weighted": epoch_f1,
                     "prec_micro": epoch_prec,
                     "recall_micro": epoch_recall,
-                    "n": len(_label_ids)}} # run_epoch
+                    "n": len(_label_ids)}}
+        if cascade is not None:
+            result['metrics'].update(cascade_metrics(
+                _label_ids, _pred_ids, _cheap_ids, _escalate))
+            logger.info('{} cascade acc={:.4f}, cheap acc={:.4f}, escalated={:.4f}'.format(
+                phase, result['metrics']['cascade_acc'],
+                result['metrics']['cheap_acc'],
+                result['metrics']['escalation_rate']))
+        return result # run_epoch
 
     phase = 'val'
     epoch_result = run_epoch(phase)
@@ -154,4 +179,24 @@ def test_model(tok_model, cfg):
     logger.info('acc: {:.4f}'.format(epoch_result['metrics']['acc']))
 
     return epoch_result
-    
+
+
+def cascade_metrics(label_ids, pred_ids, cheap_ids, escalate):
+    """Metrics for a stance cascade given aligned predictions
+
+    :param label_ids: list of gold stance ids
+    :param pred_ids: list of stance ids predicted by the full model
+    :param cheap_ids: list of stance ids predicted by the cheap model
+    :param escalate: list of bool, whether the cheap prediction was
+      escalated to the full model
+    :returns: dict with `cascade_acc`, `cheap_acc` and `escalation_rate`
+    :rtype: dict
+    """
+    cascade_ids = [pred if esc else cheap
+                   for pred, cheap, esc in zip(pred_ids, cheap_ids, escalate)]
+    n = len(label_ids)
+    return {
+        "cascade_acc": metrics.accuracy_score(label_ids, cascade_ids) if n else 0.0,
+        "cheap_acc": metrics.accuracy_score(label_ids, cheap_ids) if n else 0.0,
+        "escalation_rate": sum(escalate) / n if n else 0.0
+    }
@@ -10,7 +10,8 @@ from transformers import RobertaTokenizer
 import torch
 import json
 import numpy as np
-from esiutils import bot_describer, dictu, hashu
+from esiutils import bot_describer, dictu, hashu, ortsession
+from stance import cheapstance
 
 
 logger = logging.getLogger(__name__)
@@ -23,7 +24,15 @@ sentStanceReviewer_schema = {
     'itemref_keys': ['isBasedOn']
 }
 
-def load_saved_fnc1_model(in_dir):
+def load_saved_fnc1_model(in_dir, backend_cfg=None):
+    """Loads a saved FNC-1 stance classifier
+
+    :param in_dir: folder with the saved model
+    :param backend_cfg: optional config section selecting the
+      `inference_backend`, see `esiutils.ortsession.load_session`
+    :returns: a tokmodmeta dict
+    :rtype: dict
+    """
     model = RobertaForSequenceClassification.from_pretrained(in_dir)
     if torch.cuda.is_available():
         model = model.cuda()
@@ -31,15 +40,20 @@ def load_saved_fnc1_model(in_dir):
     model_meta = {}
     with open(os.path.join(in_dir, 'fnc1-classifier.json')) as in_f:
         model_meta = json.load(in_f)
+    ort_session = ortsession.load_session(in_dir, backend_cfg)
+    model_info = stance_reviewer(
+        model_meta, in_dir,
+        'torch' if ort_session is None else 'onnxruntime')
     return {
         'tokenizer': tokenizer,
         'model': model,
         'model_meta': model_meta,
-        'model_info': stance_reviewer(model_meta, in_dir)
+        'model_info': model_info,
+        'ort_session': ort_session
     }
 
 
-def stance_reviewer(model_meta, in_dir):
+def stance_reviewer(model_meta, in_dir, inference_backend='torch'):
     result = {
         '@context': 'http://coinform.eu',
         '@type': 'SentStanceReviewer',
@@ -65,6 +79,10 @@ def stance_reviewer(model_meta, in_dir):
                 os.path.join(in_dir, 'pytorch_model.bin'))
         }
     }
+    if inference_backend != 'torch':
+        # part of the identifier, as predictions differ between backends
+        result['executionEnvironment']['inferenceBackend'] = inference_backend
+        result['launchConfiguration']['inferenceBackend'] = inference_backend
     result['identifier'] = calc_stance_reviewer_id(result)
     return result
 
@@ -179,6 +197,12 @@ def pred_label(inputs, tok_model, strategy="pooled", seq_len=50,
     input_ids, att_masks, type_ids = tokenize_batch(
         inputs, tok_model, debug=debug, max_len=seq_len)
 
+    if tok_model.get('ort_session') is not None:
+        return torch.from_numpy(ortsession.run(
+            tok_model['ort_session'],
+            input_ids=input_ids.cpu().numpy(),
+            attention_mask=att_masks.cpu().numpy()))
+
     model = tok_model['model']
     model.eval()  # needed to deactivate any Dropout layers
 
@@ -213,6 +237,28 @@ def predict_stances(tokmodmeta, claim_bod_pairs):
     return labels, confs
 
 
+def predict_stances_cascade(tokmodmeta, cascade, claim_bod_pairs,
+                            predict_fn=None, text2vec=None):
+    """Predicts stances using a cheap model first, escalating uncertain pairs
+
+    :param tokmodmeta: the RoBERTa FNC-1 model, see `load_saved_fnc1_model`
+    :param cascade: a cascade dict, see `cheapstance.load_cascade`
+    :param claim_bod_pairs: list of (claim, body) str tuples
+    :param predict_fn: optional function to predict the escalated pairs,
+      by default `predict_stances` with `tokmodmeta`
+    :param text2vec: optional dict with the encodings of claims and
+      bodies which are already available, see `cheapstance.encode_pairs`
+    :returns: a triple with the aligned lists of labels and confidences
+      (as for `predict_stances`) and the number of pairs which were
+      escalated to the RoBERTa model
+    :rtype: tuple
+    """
+    predict_fn = predict_fn or (
+        lambda pairs: predict_stances(tokmodmeta, pairs))
+    return cheapstance.predict_cascade(
+        cascade, claim_bod_pairs, predict_fn, text2vec)
+
+
 def predict_stance(tokmodmeta, claim, doc_bodies):
     """Predict stance labels for a `claim` and one or more `doc_bodies`
 
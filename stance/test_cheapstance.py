@@ -0,0 +1,125 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the cheapstance classifier
+"""
+import numpy as np
+from stance import cheapstance
+
+
+def toy_encoder(texts):
+    # texts mentioning the same topic get similar encodings
+    return [[1.0, 0.1, 0.0] if 'vaccine' in t else [0.0, 0.2, 1.0]
+            for t in texts]
+
+
+def toy_pairs():
+    pairs = [('vaccine causes x', 'vaccine study'),
+             ('vaccine causes x', 'football results'),
+             ('football team won', 'football results'),
+             ('football team won', 'vaccine study')] * 5
+    labels = ['discuss', 'unrelated', 'discuss', 'unrelated'] * 5
+    return pairs, labels
+
+
+def test_pair_features():
+    feats = cheapstance.pair_features([[3.0, 4.0]], [[3.0, 4.0]])
+    assert feats.shape == (1, 9)
+    assert np.isclose(feats[0, -1], 1.0)  # cosine similarity
+
+
+def test_train_predict_and_save(tmp_path):
+    pairs, labels = toy_pairs()
+    feats = cheapstance.encode_pairs(toy_encoder, pairs)
+    model = cheapstance.train(feats, labels, C=10.0)
+    path = str(tmp_path / 'cheap.json')
+    cheapstance.save(model, path)
+    model = cheapstance.load(path)
+
+    probs = cheapstance.predict_proba(model, feats)
+    assert probs.shape == (len(pairs), 2)
+    assert np.allclose(probs.sum(axis=1), 1.0)
+
+    pred_labels, confs, escalate = cheapstance.predict(model, feats, 0.5)
+    assert pred_labels == labels
+    assert not any(escalate)
+    _, _, escalate = cheapstance.predict(model, feats, 1.0)
+    assert all(escalate)
+
+
+def test_encode_pairs_reuses_known_vectors():
+    encoded = []
+
+    def encoder(texts):
+        encoded.extend(texts)
+        return toy_encoder(texts)
+
+    pairs, _ = toy_pairs()
+    known = {'vaccine study': [1.0, 0.1, 0.0], 'football results': [0.0, 0.2, 1.0]}
+    feats = cheapstance.encode_pairs(encoder, pairs, known)
+    assert sorted(encoded) == ['football team won', 'vaccine causes x']
+    assert np.allclose(feats, cheapstance.encode_pairs(toy_encoder, pairs))
+    encoded.clear()
+    cheapstance.encode_pairs(encoder, pairs[:1], {
+        **known, 'vaccine causes x': [1.0, 0.0, 0.0]})
+    assert encoded == []
+
+
+def test_predict_cascade():
+    pairs, labels = toy_pairs()
+    model = cheapstance.train(
+        cheapstance.encode_pairs(toy_encoder, pairs), labels, C=10.0)
+    escalated = []
+
+    def predict_fn(esc_pairs):
+        escalated.extend(esc_pairs)
+        return ['agree'] * len(esc_pairs), [1.0] * len(esc_pairs)
+
+    cascade = {'model': model, 'min_conf': 0.0, 'encoder_fn': toy_encoder}
+    assert cheapstance.predict_cascade(cascade, pairs, predict_fn)[0] == labels
+    assert escalated == []
+
+    cascade['min_conf'] = 1.0
+    pred_labels, confs, n_escalated = cheapstance.predict_cascade(
+        cascade, pairs[:2], predict_fn)
+    assert pred_labels == ['agree', 'agree']
+    assert confs == [1.0, 1.0]
+    assert n_escalated == 2
+    assert escalated == pairs[:2]
+
+
+def test_predict_cascade_known_vectors():
+    pairs, labels = toy_pairs()
+    model = cheapstance.train(
+        cheapstance.encode_pairs(toy_encoder, pairs), labels, C=10.0)
+
+    def predict_fn(esc_pairs):
+        return ['disagree'] * len(esc_pairs), [0.99] * len(esc_pairs)
+
+    def no_encoder(texts):
+        raise AssertionError('all texts are known: %s' % texts)
+
+    text2vec = {text: vec for pair in pairs for text, vec in zip(
+        pair, toy_encoder(list(pair)))}
+    cascade = {'model': model, 'min_conf': 0.0, 'encoder_fn': no_encoder}
+    pred_labels, _, n_escalated = cheapstance.predict_cascade(
+        cascade, pairs, predict_fn, text2vec)
+    assert pred_labels == labels
+    assert n_escalated == 0
+    cascade['min_conf'] = 1.01
+    pred_labels, _, n_escalated = cheapstance.predict_cascade(
+        cascade, pairs[:3], predict_fn, text2vec)
+    assert pred_labels == ['disagree'] * 3
+    assert n_escalated == 3
+
+
+def test_load_cascade(tmp_path):
+    assert cheapstance.load_cascade({}, None) is None
+    assert cheapstance.load_cascade({'cascade': 'false'}, None) is None
+    path = str(tmp_path / 'cheap.json')
+    cheapstance.save({'@type': 'CheapStanceModel'}, path)
+    cascade = cheapstance.load_cascade(
+        {'cascade': 'true', 'cascade_model_path': path}, 'encoder_fn')
+    assert cascade['min_conf'] == 0.9
+    assert cascade['encoder_fn'] == 'encoder_fn'
@@ -0,0 +1,24 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""
+Unit Tests for the fnc1 evaluation
+"""
+import pytest
+
+pytest.importorskip('torch')
+from stance import fnc1
+
+
+def test_cascade_metrics():
+    label_ids = [0, 1, 2, 3]
+    pred_ids = [0, 1, 2, 0]
+    cheap_ids = [0, 3, 3, 3]
+    escalate = [False, True, False, False]
+    assert fnc1.cascade_metrics(label_ids, pred_ids, cheap_ids, escalate) == {
+        'cascade_acc': 0.75,
+        'cheap_acc': 0.5,
+        'escalation_rate': 0.25
+    }
+    assert fnc1.cascade_metrics([], [], [], []) == {
+        'cascade_acc': 0.0, 'cheap_acc': 0.0, 'escalation_rate': 0.0}
@@ -4,6 +4,9 @@
 """
 Unit Tests for the website_credrev
 """
+import pytest
+transformers = pytest.importorskip('transformers')
+pytest.importorskip('torch')
 from transformers import RobertaTokenizer
 from stance import stancepred
 
@@ -25,3 +28,10 @@ def test_pad_encode_02():
     assert len(tokids) == 128
 
 
+def test_stance_reviewer_id_per_backend(tmp_path):
+    meta = {'stance2i': {'agree': 0}, 'seq_len': 32}
+    torch_bot = stancepred.stance_reviewer(meta, str(tmp_path))
+    ort_bot = stancepred.stance_reviewer(meta, str(tmp_path), 'onnxruntime')
+    assert 'inferenceBackend' not in torch_bot['executionEnvironment']
+    assert ort_bot['executionEnvironment']['inferenceBackend'] == 'onnxruntime'
+    assert torch_bot['identifier'] != ort_bot['identifier']
@@ -0,0 +1,55 @@
+#
+# Copyright (c) 2020 Expert System Iberia
+#
+"""Tests methods in runsrv
+"""
+import pytest
+import requests
+from flask import Flask
+import runsrv
+
+
+def named_app(name):
+    app = Flask(name)
+    app.add_url_rule('/<path:path>', 'echo', lambda path: name)
+    app.add_url_rule('/', 'root', lambda: name)
+    return app
+
+
+def test_dispatch_by_app_name_01():
+    apps = {name: named_app(name) for name in ['app_a', 'app_b']}
+    default_app = named_app('default')
+    server = Flask('server')
+    server.wsgi_app = runsrv.dispatch_by_app_name(apps, default_app)
+    client = server.test_client()
+    assert client.get('/app_a/encode').get_data(as_text=True) == 'app_a'
+    assert client.get('/app_b').get_data(as_text=True) == 'app_b'
+    assert client.get('/app_b/x/y').get_data(as_text=True) == 'app_b'
+    # other paths, including prefixes of app names, go to the default app
+    assert client.get('/health/ready').get_data(as_text=True) == 'default'
+    assert client.get('/app_ab/x').get_data(as_text=True) == 'default'
+    assert client.get('/').get_data(as_text=True) == 'default'
+
+
+def test_model_server_app_cascade(tmp_path):
+    # boots the modelserver on tiny models, with the stance cascade
+    #  encoding in-process during the warmups
+    pytest.importorskip('torch')
+    pytest.importorskip('transformers')
+    from benchmarks import stack
+    srv = stack.start_modelserver(str(tmp_path), cascade=True)
+    try:
+        urls = srv['urls']
+        ready = requests.get(urls['claimencoder'] + '/health/ready').json()
+        assert ready['status'] == 'ready'
+        assert ready['pending'] == []
+        assert ready['warmups']['predict_stance']['status'] == 'done'
+        resp = requests.post(urls['claimneuralindex'] + '/predict_stance', json={
+            'qclaim': 'Vaccines cause autism',
+            'doc_bodies': ['A study found no link between vaccines and autism.']})
+        assert resp.status_code == 200, resp.text
+        assert len(resp.json()['labels']) == 1
+        metrics = requests.get(urls['claimneuralindex'] + '/metrics').text
+        assert 'service="claimneuralindex"' in metrics
+    finally:
+        stack.stop_stack(srv)
@@ -1,18 +1,77 @@
 # This file is used to load all the resources required by this module
 # ideally this should be done only once
 from worthiness import config, worthinesspred, clef19
+from esiutils import forksafe, evalcache, health, hashu, batcher, predcache, scheduler
 import logging
+import os
 
 
 logger = logging.getLogger(__name__)
 
+# when enabled, resources are loaded read-only so they can be shared
+#  by uwsgi workers forked from the master, see wsgi/README.md
+preload = forksafe.preload_enabled(config['worthinesschecker'])
+
 ##  Load the worthiness checker
 # e.g. 'C:/models/coinform/saved_checkworthiness_classifier_acc_0.95'
 check_worthiness_model_path = config['worthinesschecker']['check_worthiness_model_path']
 logger.info('Loading saved check-worthiness model from %s' % (
     check_worthiness_model_path))
-worthiness_tokmodmeta = worthinesspred.load_saved_cw_model(check_worthiness_model_path)
+worthiness_tokmodmeta = worthinesspred.load_saved_cw_model(
+    check_worthiness_model_path, config['worthinesschecker'])
 logger.info('Check_worthiness model loaded %s' % (
     worthiness_tokmodmeta['model_meta']))
+if preload:
+    forksafe.freeze_torch_model(worthiness_tokmodmeta['model'])
+
+# predictions are cached per sentence hash and model identifier, and
+#  misses from concurrent requests are predicted in shared batches
+worthiness_cache = predcache.create(
+    'worthiness',
+    int(config['worthinesschecker'].get('prediction_cache_size', 100000)))
+worthiness_batcher = batcher.create(
+    lambda sents: scheduler.run('worthiness', lambda: worthinesspred.cw_pred_batched(
+        worthiness_tokmodmeta, sents)),
+    max_batch_size=int(config['worthinesschecker'].get('coalesce_max_batch', 256)),
+    max_wait_ms=float(config['worthinesschecker'].get('coalesce_wait_ms', 0)))
+
+
+def predict_worthiness(sents):
+    """Predicts the worthiness of `sents`, reusing cached predictions
+
+    :param sents: list of str
+    :returns: a triple with the aligned lists of labels, confidences and
+      sentence ids (see `hashu.calc_str_hash`)
+    :rtype: tuple
+    """
+    ids = [hashu.calc_str_hash(sent) for sent in sents]
+    preds = predcache.predict_many(
+        worthiness_cache, ids, sents,
+        worthiness_tokmodmeta['model_info']['identifier'],
+        # the batcher returns the labels and confidences as aligned lists
+        lambda miss_sents: list(zip(*batcher.submit(
+            worthiness_batcher, miss_sents))))
+    return [p[0] for p in preds], [p[1] for p in preds], ids
+
+
+def test_worthiness_model():
+    worth_cfg = config['worthinesschecker']
+    evalcache.cached_eval(
+        'clef19_worthiness',
+        evalcache.model_digest([
+            os.path.join(check_worthiness_model_path, fname)
+            for fname in ['pytorch_model.bin', 'config.json',
+                          'checkworthiness-classifier.json']]),
+        {k: v for k, v in worth_cfg.items() if k.startswith('clef')},
+        lambda: clef19.test_model(worthiness_tokmodmeta, worth_cfg),
+        **evalcache.cache_settings(worth_cfg))
+
+
+def warmup():
+    health.warmup('predict_worthiness', lambda: worthinesspred.cw_pred_batched(
+        worthiness_tokmodmeta, ['A sentence to warm up the model.']))
+    health.mark_ready('worthinesschecker')
+    test_worthiness_model()
+
 
-clef19.test_model(worthiness_tokmodmeta, config['worthinesschecker'])
+health.run_warmups(warmup, after_fork=preload)
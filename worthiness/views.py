@@ -9,7 +9,7 @@ import werkzeug
 from flask import json, jsonify, request, make_response
 from worthiness import worthinesspred
 from worthiness import app, config, resources
-from esiutils import citimings, hashu, bot_describer, dictu
+from esiutils import citimings, bot_describer, dictu, health, cimetrics, citrace
 
 
 logger = logging.getLogger(__name__)
@@ -45,12 +45,12 @@ def predict_worthiness():
         if type(q_sents) is not list:
             raise ValueError("Type %s not accepted. Valid formats: string or list" % type(req_json['sentences']))
 
+        cimetrics.observe_batch_size('predict_worthiness', len(q_sents))
         if len(q_sents) == 0:
             label, conf, ids = [], [], []
         else:
-            label, conf = worthinesspred.cw_pred_batched(tokmodmeta, q_sents)
+            label, conf, ids = resources.predict_worthiness(q_sents)
             logger.debug('predicted %s labels and %s confidences' % (len(label),  len(conf)))
-            ids = [hashu.calc_str_hash(ids) for ids in q_sents]
 
         return jsonify({
             'worthiness_checked_sentences': {
@@ -74,3 +74,9 @@ def predict_worthiness():
         resp.status_code = 500
         return resp
 
+
+health.register_routes(app, app_name)
+cimetrics.configure(app_name, config['worthinesschecker'])
+cimetrics.register_routes(app, app_name)
+citrace.configure(app_name, config['worthinesschecker'])
+citrace.register_hooks(app, app_name)
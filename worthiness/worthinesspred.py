@@ -11,7 +11,7 @@ from transformers import RobertaTokenizer
 import torch
 import json
 import numpy as np
-from esiutils import bot_describer, dictu, hashu
+from esiutils import bot_describer, dictu, hashu, ortsession
 
 logger = logging.getLogger(__name__)
 
@@ -23,22 +23,35 @@ sentWorthReviewer_schema = {
 }
 
 
-def load_saved_cw_model(in_dir):
+def load_saved_cw_model(in_dir, backend_cfg=None):
+    """Loads a saved check-worthiness classifier
+
+    :param in_dir: folder with the saved model
+    :param backend_cfg: optional config section selecting the
+      `inference_backend`, see `esiutils.ortsession.load_session`
+    :returns: a tokmodmeta dict
+    :rtype: dict
+    """
     model = RobertaForSequenceClassification.from_pretrained(in_dir)
     if torch.cuda.is_available():
         model = model.cuda()
     tokenizer = RobertaTokenizer.from_pretrained(in_dir)
     with open(os.path.join(in_dir, 'checkworthiness-classifier.json')) as in_f:
         model_meta = json.load(in_f)
+    ort_session = ortsession.load_session(in_dir, backend_cfg)
+    model_info = worth_reviewer(
+        model_meta, in_dir,
+        'torch' if ort_session is None else 'onnxruntime')
     return {
         'tokenizer': tokenizer,
         'model': model,
         'model_meta': model_meta,
-        'model_info': worth_reviewer(model_meta, in_dir)
+        'model_info': model_info,
+        'ort_session': ort_session
     }
 
 
-def worth_reviewer(model_meta, in_dir):
+def worth_reviewer(model_meta, in_dir, inference_backend='torch'):
     result = {
         '@context': 'http://coinform.eu',
         '@type': 'SentCheckWorthinessReviewer',
@@ -64,6 +77,10 @@ def worth_reviewer(model_meta, in_dir):
                 os.path.join(in_dir, 'pytorch_model.bin'))
         }
     }
+    if inference_backend != 'torch':
+        # part of the identifier, as predictions differ between backends
+        result['executionEnvironment']['inferenceBackend'] = inference_backend
+        result['launchConfiguration']['inferenceBackend'] = inference_backend
     result['identifier'] = calc_worth_reviewer_id(result)
     return result
 
@@ -163,6 +180,12 @@ def pred_label(inputs, tok_model, strategy="pooled", seq_len=50,
     input_ids, att_masks = tokenize_batch(
         inputs, tok_model, debug=debug, max_len=seq_len)
 
+    if tok_model.get('ort_session') is not None:
+        return torch.from_numpy(ortsession.run(
+            tok_model['ort_session'],
+            input_ids=input_ids.cpu().numpy(),
+            attention_mask=att_masks.cpu().numpy()))
+
     model = tok_model['model']
     model.eval()  # needed to deactivate any Dropout layers
 